@@ -1,9 +1,30 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import io
+import mmap
+import os
 import random
 import tempfile
 import threading
-from multiprocessing import Process
-from time import sleep
+from multiprocessing import Process, Value
+from time import sleep, time
+
+# duty cycle of the cpu load (seconds) and the slice of it between two checks of the time
+CPU_PERIOD = 0.1
+CPU_SLICE = 0.001
+CPU_KERNEL_BLOCK = '\0' * 64 * 1024
+
+# memory is allocated in blocks, each page of them written (bytes); step of the profile (seconds)
+MEMORY_BLOCK = 16 * 1024 * 1024
+MEMORY_PAGE = 4096
+MEMORY_STEP = 0.1
+
+# access of the sustained io, size of an operation and alignment for direct io (bytes)
+IO_SEQUENTIAL = 'sequential'
+IO_RANDOM = 'random'
+IO_ACCESS = [IO_SEQUENTIAL, IO_RANDOM]
+IO_BLOCK = 1024 * 1024
+IO_ALIGN = 4096
 
 
 class RessourceUser(object):
@@ -14,20 +35,26 @@ class RessourceUser(object):
 
         # default values
         self.cores = 1
+        self.cpu_utilisation = 1.0
         self.ram = 50
+        self.ram_profile = None
+        self.ram_churn = False
         self.file_size = 50
         self.file_count = 2
+        self.io_load = {}
 
     def start(self, wall_time, is_blocking=True):
         self.wall_time = wall_time
 
         # start threads
         self.workload_threads.append(
-            WorkloadThread(self.__use_cpu, self.cores))
+            WorkloadThread(self.__use_cpu, self.cores, self.cpu_utilisation))
         self.workload_threads.append(
-            WorkloadThread(self.__use_memory, self.ram))
+            WorkloadThread(self.__use_memory, self.ram, self.ram_profile,
+                               self.ram_churn, self.wall_time))
         self.workload_threads.append(
-            WorkloadThread(self.__use_io, self.file_size, self.file_count))
+            WorkloadThread(self.__use_io, self.file_size, self.file_count,
+                               **self.io_load))
 
         for t in self.workload_threads:
             t.start()
@@ -45,51 +72,220 @@ class RessourceUser(object):
             # non-blocking
             self.timer_thread.start()
 
+    def get_statistics(self):
+        # statistics of the workloads - as far as measured
+        stats = {}
+        for t in self.workload_threads:
+            stats.update(t.stats)
+        return stats
+
     # ------ SETTER ------
 
-    def use_cpu(self, cores):
+    def use_cpu(self, cores, utilisation=1.0):
+        # cores may be fractional (e.g. 2.5), utilisation is the load of each core (0..1)
         self.cores = cores
+        self.cpu_utilisation = utilisation
 
-    def use_memory(self, ram):
+    def use_memory(self, ram, profile=None, churn=False):
+        # profile: [(fraction of the walltime, MB)] - the ram is held during the whole walltime
+        # if there is none (see memory_profile); churn: blocks are freed and allocated again
         self.ram = ram
-
-    def use_io(self, file_size, file_count):
+        self.ram_profile = profile
+        self.ram_churn = churn
+
+    def use_io(self, file_size, file_count, bandwidth=None, iops=None, access=IO_SEQUENTIAL,
+               read_ratio=0.0, fsync=False, direct=False, workers=1):
+        # sustained io on file_count files of file_size MB: bandwidth (MB/s) and iops are the
+        # targets (unthrottled if none), access sequential or random, read_ratio the fraction of
+        # reads, fsync after each write, direct bypasses the page cache (O_DIRECT)
+        for name, value in (('bandwidth', bandwidth), ('iops', iops)):
+            if value is not None and value < 0:
+                raise ValueError("io %s must not be negative: %s" % (name, value))
+        if workers < 1:
+            raise ValueError("io workers must be at least 1: %s" % workers)
         self.file_size = file_size
         self.file_count = file_count
+        self.io_load = {'bandwidth': bandwidth, 'iops': iops, 'access': access,
+                        'read_ratio': read_ratio, 'fsync': fsync, 'direct': direct,
+                        'workers': workers}
 
     # ------ WORKLOAD METHODS ------
 
     @staticmethod
-    def __use_memory(thread, ram_size):
+    def __use_memory(thread, ram_size, profile, churn, wall_time):
         print("RAM start")
-        data = bytearray(ram_size * 1024 * 1024)
-        thread.wait_on_terminate()
-        print("RAM end")
+        if not profile:
+            profile = [(0.0, ram_size)]
+
+        blocks = []
+        churned = 0
+        start = time()
+
+        while not thread.should_terminate.isSet():
+            fraction = (time() - start) / wall_time if wall_time else 1.0
+            target = int(profile_value(profile, fraction) * 1024 * 1024)
+
+            while len(blocks) * MEMORY_BLOCK < target:
+                blocks.append(RessourceUser.__touched_block())
+            while blocks and (len(blocks) - 1) * MEMORY_BLOCK >= target:
+                blocks.pop()
+
+            if churn and blocks:
+                for i in range(max(1, len(blocks) // 10)):
+                    blocks[random.randrange(len(blocks))] = RessourceUser.__touched_block()
+                    churned += MEMORY_BLOCK
+
+            thread.should_terminate.wait(MEMORY_STEP)
+
+        rss = read_rss()
+        del blocks[:]
+        thread.stats['memory'] = {'target_peak_mb': max(mb for _, mb in profile),
+                                  'peak_rss_mb': rss.get('VmHWM'),
+                                  'rss_mb': rss.get('VmRSS'),
+                                  'churned_mb': churned // (1024 * 1024)}
+        print("RAM end (peak rss %s MB)" % rss.get('VmHWM'))
 
     @staticmethod
-    def __use_io(thread, file_size, file_count):
+    def __touched_block():
+        # a page is only committed when it is written
+        block = bytearray(MEMORY_BLOCK)
+        block[::MEMORY_PAGE] = '\1' * (MEMORY_BLOCK // MEMORY_PAGE)
+        return block
+
+    @staticmethod
+    def __use_io(thread, file_size, file_count, bandwidth=None, iops=None, access=IO_SEQUENTIAL,
+                 read_ratio=0.0, fsync=False, direct=False, workers=1):
         print("IO start")
+        if access not in IO_ACCESS:
+            raise ValueError("unknown io access: %s" % access)
         temp_files = []
+        size = file_size * 1024 * 1024
 
         for i in range(file_count):
             temp = tempfile.NamedTemporaryFile()
-            temp.write(bytearray(file_size * 1024 * 1024))
+            chunk = bytearray(min(IO_BLOCK, size))
+            for offset in xrange(0, size, IO_BLOCK):
+                temp.write(chunk[:size - offset])
             temp.flush()
             temp_files.append(temp)
 
-        thread.wait_on_terminate()
+        if not temp_files or not size:
+            thread.wait_on_terminate()
+            print("IO end")
+            return
+
+        # size of an operation and operations per second
+        block = int(bandwidth * 1024 * 1024 / iops) if bandwidth and iops else IO_BLOCK
+        # at least a page - with a lower bandwidth per operation, the iops are kept and the
+        # bandwidth exceeded
+        block = max(IO_ALIGN, block)
+        rate = float(iops) if iops else (bandwidth * 1024.0 * 1024.0 / block if bandwidth else None)
+        if direct and not hasattr(os, 'O_DIRECT'):
+            print("direct io not supported - using the page cache")
+            direct = False
+        if direct:
+            block = max(IO_ALIGN, block // IO_ALIGN * IO_ALIGN)
+        block = min(block, size)
+
+        counters = {'read': 0, 'written': 0, 'ops': 0}
+        lock = threading.Lock()
+        paths = [temp.name for temp in temp_files]
+        threads = [threading.Thread(target=RessourceUser.__io_worker,
+                                    args=(thread, paths, size, block, rate / workers if rate else None,
+                                          access, read_ratio, fsync, direct, counters, lock))
+                   for i in range(workers)]
+        start = time()
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
 
+        elapsed = time() - start
         for tmp in temp_files:
             tmp.close()
-        print("IO end")
+
+        mb = (counters['read'] + counters['written']) / (1024.0 * 1024.0)
+        thread.stats['io'] = {'target_mb_per_s': bandwidth,
+                              'mb_per_s': mb / elapsed if elapsed else None,
+                              'target_iops': rate,
+                              'iops': counters['ops'] / elapsed if elapsed else None,
+                              'read_mb': counters['read'] // (1024 * 1024),
+                              'written_mb': counters['written'] // (1024 * 1024),
+                              'block': block,
+                              'direct': direct}
+        print("IO end (%.1f MB/s, %.1f iops)" % (thread.stats['io']['mb_per_s'] or 0, thread.stats['io']['iops'] or 0))
+
+    @staticmethod
+    def __io_worker(thread, paths, size, block, rate, access, read_ratio, fsync, direct, counters, lock):
+        # anonymous memory maps are page aligned - as required by direct io
+        buf = mmap.mmap(-1, block)
+        files = []
+        for path in paths:
+            flags = os.O_RDWR
+            if direct:
+                flags |= os.O_DIRECT
+            try:
+                fd = os.open(path, flags)
+            except OSError, e:
+                # e.g. not supported by the file system
+                print("direct io on %s failed (%s) - using the page cache" % (path, e))
+                fd = os.open(path, os.O_RDWR)
+            files.append(io.FileIO(fd, 'r+'))
+
+        blocks = size // block
+        read = written = ops = 0
+        position = 0
+        start = time()
+
+        while not thread.should_terminate.isSet():
+            if access == IO_RANDOM:
+                f = random.choice(files)
+                f.seek(random.randrange(blocks) * block)
+            else:
+                f = files[position // blocks % len(files)]
+                f.seek(position % blocks * block)
+                position += 1
+
+            if random.random() < read_ratio:
+                read += f.readinto(buf) or 0
+            else:
+                written += f.write(buf) or 0
+                if fsync:
+                    os.fsync(f.fileno())
+            ops += 1
+
+            if rate:
+                delay = start + ops / rate - time()
+                if delay > 0:
+                    thread.should_terminate.wait(delay)
+
+        for f in files:
+            f.close()
+        buf.close()
+        with lock:
+            counters['read'] += read
+            counters['written'] += written
+            counters['ops'] += ops
 
     @staticmethod
-    def __use_cpu(thread, cores):
+    def __use_cpu(thread, cores, utilisation):
         print("CPU start")
+        batch = RessourceUser.__calibrate_cpu()
+
+        # one process per (partial) core with the duty cycle of its share
+        duties = [utilisation] * int(cores)
+        if cores > int(cores):
+            duties.append(utilisation * (cores - int(cores)))
+
         procs = []
+        cpu_times = []
+        start = time()
 
-        for c in range(cores):
-            p = Process(target=RessourceUser.__cpu_calculator)
+        for duty in duties:
+            cpu_time = Value('d', 0.0)
+            p = Process(target=RessourceUser.__cpu_calculator, args=(duty, batch, cpu_time))
+            cpu_times.append(cpu_time)
             procs.append(p)
             p.start()
 
@@ -97,14 +293,49 @@ class RessourceUser(object):
 
         for p in procs:
             p.terminate()
-        print("CPU end")
+        for p in procs:
+            p.join()
+
+        elapsed = time() - start
+        cpu_seconds = sum(v.value for v in cpu_times)
+        target_cpu_seconds = cores * utilisation * elapsed
+        thread.stats['cpu'] = {'cores': cores,
+                               'utilisation': utilisation,
+                               'cpu_seconds': cpu_seconds,
+                               'target_cpu_seconds': target_cpu_seconds}
+        print("CPU end (%.2f cpu seconds, target %.2f)" % (cpu_seconds, target_cpu_seconds))
 
     @staticmethod
-    def __cpu_calculator():
+    def __cpu_kernel(count):
+        # C-backed kernel - hashing a block keeps a core busy without python loop overhead
+        for i in xrange(count):
+            hashlib.sha1(CPU_KERNEL_BLOCK).digest()
+
+    @staticmethod
+    def __calibrate_cpu(duration=0.05):
+        # number of kernel calls taking one slice of a duty cycle
+        count = 0
+        start = time()
+        while time() - start < duration:
+            RessourceUser.__cpu_kernel(1)
+            count += 1
+        return max(1, int(count * CPU_SLICE / duration))
+
+    @staticmethod
+    def __cpu_calculator(duty, batch, cpu_time):
+        # busy for the duty share of each period, idle for the rest of it
         while True:
-            for k in xrange(1024 * 1024):
-                r = random.randint(0, 9)
-                i = r + r
+            period_start = time()
+            busy_end = period_start + duty * CPU_PERIOD
+            while time() < busy_end:
+                RessourceUser.__cpu_kernel(batch)
+
+            times = os.times()
+            cpu_time.value = times[0] + times[1]
+
+            idle = period_start + CPU_PERIOD - time()
+            if idle > 0:
+                sleep(idle)
 
     # ------ THREAD CONTROL ------
 
@@ -125,10 +356,46 @@ class RessourceUser(object):
             t.join()
 
 
+def memory_profile(ram, ramp=0.0, release=0.0, spikes=()):
+    # profile of the memory used over the walltime: ramp up to ram (during the fraction ramp
+    # of the walltime), plateau, release (during the last fraction release) and spikes -
+    # [(fraction of the walltime, MB, fraction of the walltime it lasts)]
+    points = [(0.0, 0 if ramp else ram), (ramp, ram), (1.0 - release, ram), (1.0, 0 if release else ram)]
+    for at, mb, width in spikes:
+        points.extend([(at - width / 2.0, ram), (at, mb), (at + width / 2.0, ram)])
+    return sorted(points)
+
+
+def profile_value(profile, fraction):
+    # linear interpolation between the points of the profile
+    points = sorted(profile)
+    if fraction <= points[0][0]:
+        return points[0][1]
+    for (f0, v0), (f1, v1) in zip(points, points[1:]):
+        if fraction <= f1:
+            return v0 + (v1 - v0) * (fraction - f0) / (f1 - f0) if f1 > f0 else v1
+    return points[-1][1]
+
+
+def read_rss():
+    # resident memory of the process (MB) - current (VmRSS) and peak (VmHWM), linux only
+    rss = {}
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    rss[key] = int(value.split()[0]) // 1024
+    except IOError:
+        pass
+    return rss
+
+
 class WorkloadThread(threading.Thread):
     def __init__(self, function, *args, **kwargs):
         super(WorkloadThread, self).__init__()
         self.should_terminate = threading.Event()
+        self.stats = {}
 
         self.function = function
         self.args = args
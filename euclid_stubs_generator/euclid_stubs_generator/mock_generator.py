@@ -1,7 +1,9 @@
+import inspect
 import os
 import pickle
 
-from euclid_stubs_generator.stubs_template import create_product_id, create_file_name, create_xml_output
+from euclid_stubs_generator.stubs_template import create_product_id, create_file_name, create_xml_output, \
+    open_output, write_data_file, DATA_WRITE_STREAM, DATA_WRITE_MODES
 from euclid_stubs_generator.utils import mkdir_p, write_all_text, read_template
 
 
@@ -11,8 +13,11 @@ class MockGenerator:
     __EXTENSION = '.dat'
     __MOCK_SCRIPT_NAME = 'mock_script.py'
 
-    def __init__(self, output_folder):
+    def __init__(self, output_folder, data_write_mode=DATA_WRITE_STREAM):
+        if data_write_mode not in DATA_WRITE_MODES:
+            raise ValueError("unknown data write mode: %s" % data_write_mode)
         self.output_folder = output_folder
+        self.data_write_mode = data_write_mode
         self.work_dir = os.path.join(self.output_folder, self.__WORK_DIR)
         self.data_dir = os.path.join(self.work_dir, self.__DATA_DIR)
 
@@ -36,12 +41,11 @@ class MockGenerator:
 
         # create xml
         if write_files:
-            with open(xml_path, 'w') as outfile:
+            with open_output(xml_path, 'w') as outfile:
                 outfile.write(xml_output.toprettyxml(indent="    ", encoding="utf-8"))
 
             # data file
-            with open(data_path, 'wb') as outfile:
-                outfile.write(bytearray(data_size))
+            write_data_file(data_path, data_size, self.data_write_mode)
 
         return {file_name: {
             'extension': self.__EXTENSION,
@@ -65,5 +69,7 @@ class MockGenerator:
 
         # add files to script
         template = read_template('mock_script_template.py')
-        output = template.render(mocks=pickle.dumps(mock_files))
+        output = template.render(mocks=pickle.dumps(mock_files),
+                                 data_writer=inspect.getsource(open_output)+'\n\n'+inspect.getsource(write_data_file),
+                                 data_write_mode=self.data_write_mode)
         write_all_text(output_file_name, output)
@@ -10,6 +10,8 @@ files = {}
 
 __DATA_DIR = 'data'
 
+DATA_WRITE_MODES = ['sparse', 'prealloc', 'stream']
+
 META_DATA_XML = """<?xml version="1.0" encoding="UTF-8"?>
 <TestDataFiles>
     <Id>%s</Id>
@@ -44,18 +46,23 @@ def create_file_name(output_name):
     return "FN_" + output_name + "_" + str(uuid.uuid4())
 
 
+# shared with the test stubs (stubs_template.open_output and write_data_file)
+{{data_writer}}
+
 def parse_cmd_args():
     parser = argparse.ArgumentParser(
             description="Utility generating mock data for executables.")
     parser.add_argument("--destdir", default=".",
                         help="Directory to write the mock data into.")
+    parser.add_argument("--datamode", choices=DATA_WRITE_MODES, default="{{data_write_mode}}",
+                        help="Mode of writing the data files (sparse, prealloc or stream).")
     args = parser.parse_args()
     args.destdir = os.path.expandvars(args.destdir)
 
     return args
 
 
-def generate_files(output_files, output_folder):
+def generate_files(output_files, output_folder, data_write_mode='stream'):
     # prepare output folder
     mkdir_p(os.path.join(output_folder, __DATA_DIR))
 
@@ -75,14 +82,13 @@ def generate_files(output_files, output_folder):
         print("writing %s..." % xml_file_name,)
         xml_path = os.path.join(output_folder, xml_file_name)
 
-        with open(xml_path, 'w') as outfile:
+        with open_output(xml_path, 'w') as outfile:
             outfile.write(xml_data)
 
         print("writing data file %s..." % data_file_name)
         data_path = os.path.join(output_folder, __DATA_DIR, data_file_name)
 
-        with open(data_path, 'w') as outfile:
-            outfile.write(bytearray(data_size))
+        write_data_file(data_path, data_size, data_write_mode)
 
 
 if __name__ == '__main__':
@@ -91,5 +97,5 @@ if __name__ == '__main__':
     args = parse_cmd_args()
 
     read_data()
-    generate_files(files, args.destdir)
+    generate_files(files, args.destdir, args.datamode)
     print("all files (%s) generated!" % len(files.keys()))
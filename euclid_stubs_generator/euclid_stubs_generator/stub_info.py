@@ -13,12 +13,23 @@ class StubInfo:
         self.nodeType = nodeType
         self.isParallelSplit = isParallelSplit
         self.cores = int()
+        # load of each core (0..1)
+        self.cpu_utilisation = 1.0
         self.ram = int()
+        # [(fraction of the walltime, MB)] - ram held during the whole walltime if None
+        self.ram_profile = None
+        self.ram_churn = False
+        # arguments of the io load (see use_io of the stubs) - no io if None
+        self.io_load = None
         self.walltime = int()
         self.outputfiles = list()
         self.inputfiles = list()
         # todo: set right split part
         self.split_parts = 2
+        # mode of writing the data files: sparse, prealloc or stream
+        self.data_write_mode = 'stream'
+        # pattern of reading the input data files: full, sampled or random
+        self.read_pattern = 'full'
 
     def __eq__(self, other):
         return self.command == other.command
@@ -1,6 +1,7 @@
 import os
 import unittest
 
+from euclid_stubs_generator import stubs_template
 from euclid_stubs_generator.stub_info import StubInfo, NodeType
 from euclid_stubs_generator.mock_generator import MockGenerator
 from euclid_stubs_generator.stubs_generator import StubsGenerator
@@ -87,6 +88,21 @@ class BasicTest(unittest.TestCase):
 
         assert result == 0
 
+    def test_h_outputs_replaced(self):
+        # outputs linked to other files (e.g. in the result cache) are replaced, not written through
+        cached = os.path.join(self.output_folder, 'cached.dat')
+        linked = os.path.join(self.output_folder, 'linked.dat')
+        for path in (cached, linked):
+            if os.path.lexists(path):
+                os.remove(path)
+        stubs_template.write_data_file(cached, 10)
+        os.link(cached, linked)
+
+        stubs_template.write_data_file(linked, 20)
+        stubs_template.write_list_file(linked, ['a', 'b'])
+        assert os.path.getsize(cached) == 10
+        assert not os.path.samefile(cached, linked)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+'''
+Runs the steps of a bundle - a nested dataflow or an iteration of a parallel split
+submitted as a single job - one after the other on the compute node.
+
+The steps are read from the plan (a json file written by the pipeline runner) and each
+step is invoked like a job submitted on its own - with the workdir, its logdir and the
+paths of its inputs and outputs as arguments. Execution stops at the first step that
+fails. The timing of the steps is written to the timing file in any case.
+
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def parse_cmd_args():
+    parser = argparse.ArgumentParser(description="Runs the steps of a bundle one after the other.")
+    parser.add_argument("--workdir", help="Workdir.", default=".")
+    parser.add_argument("--logdir", help="Logdir.", default="./logdir")
+    parser.add_argument("--bundle_plan", help="Path to the plan of the bundle - relative to the workdir.")
+    parser.add_argument("--bundle_timing", help="Path to the file to write the timing to - relative to the workdir.")
+    # the inputs and outputs of the bundle are passed as well - they are covered by the plan
+    args, _ = parser.parse_known_args()
+    return args
+
+
+def step_command(step, workdir, logdir):
+    cmd=[step['command'], "--workdir=%s"%workdir, "--logdir=%s"%os.path.join(logdir, step['name'])]
+    for port, path in sorted(step['inputs'].iteritems()):
+        cmd.append("--%s=%s"%(port, path))
+    for port, path in sorted(step['outputs'].iteritems()):
+        cmd.append("--%s=%s"%(port, path))
+    return cmd
+
+
+def run_step(step, workdir, logdir):
+    for path in step['outputs'].itervalues():
+        outdir=os.path.dirname(os.path.join(workdir, path))
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+    start=time.time()
+    try:
+        exitcode=subprocess.call(step_command(step, workdir, logdir), cwd=workdir)
+    except OSError as e:
+        sys.stderr.write("Step %s could not be started: %s\n"%(step['name'], e))
+        exitcode=-1
+    end=time.time()
+    return {'name':step['name'], 'command':step['command'], 'start':start, 'end':end,
+            'time':end-start, 'exitcode':exitcode}
+
+
+def write_timing(path, timing):
+    parentdir=os.path.dirname(path)
+    if parentdir and not os.path.exists(parentdir):
+        os.makedirs(parentdir)
+    with open(path, 'w') as timingfile:
+        json.dump({'steps':timing}, timingfile, indent=2)
+
+
+def main():
+    args = parse_cmd_args()
+    with open(os.path.join(args.workdir, args.bundle_plan), 'r') as planfile:
+        plan=json.load(planfile)
+    timing=[]
+    exitcode=0
+    for step in plan['steps']:
+        result=run_step(step, args.workdir, args.logdir)
+        timing.append(result)
+        sys.stdout.write("Step %s finished with exit code %i after %.1f seconds.\n"%(step['name'], result['exitcode'], result['time']))
+        if result['exitcode']!=0:
+            exitcode=result['exitcode'] if result['exitcode']>0 else 1
+            break
+    write_timing(os.path.join(args.workdir, args.bundle_timing), timing)
+    return exitcode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
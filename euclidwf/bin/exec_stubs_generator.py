@@ -6,7 +6,6 @@ Created on Apr 25, 2015
 '''
 import argparse
 import os
-import pickle
 import shutil
 import stat
 import uuid
@@ -15,7 +14,7 @@ from shutil import copytree, ignore_patterns, rmtree
 from os.path import dirname, join, isdir, isfile
 
 from euclidwf.framework.taskdefs import TYPE_LISTFILE
-from euclidwf.utilities import exec_loader
+from euclidwf.utilities import exec_loader, listfile
 import euclidwf
 
 
@@ -23,7 +22,7 @@ def parse_cmd_args():
     parser = argparse.ArgumentParser(description="Utility generating test stubs for executables.")
     parser.add_argument("--pkgdefs", help="Path to folder that contains the package definitions (package repository).")
     parser.add_argument("--destdir", help="Directory to write the test stubs to.")
-    parser.add_argument("--xml", dest='xml', action='store_true', help="Specify flag to generate xml output (otherwise text is produced; note that lists are always pickled).")
+    parser.add_argument("--xml", dest='xml', action='store_true', help="Specify flag to generate xml output (otherwise text is produced; note that lists are always written as list files).")
     args = parser.parse_args()
     args.pkgdefs=os.path.expandvars(args.pkgdefs)
     args.destdir=os.path.expandvars(args.destdir)
@@ -84,8 +83,7 @@ class TestExecListOutput(object):
         for i in range(OUTPUTLISTLENGTH):
             outputlist.append("%s_%i" % (relpath, i + 1))
 
-        with open(listoutpath, "w") as listfile:
-            pickle.dump(outputlist, listfile)
+        listfile.write_list(listoutpath, outputlist)
         
         for i in range(OUTPUTLISTLENGTH):        
             with open("%s_%i" % (abspath, i + 1), 'w') as outfile:
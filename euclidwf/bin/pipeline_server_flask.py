@@ -8,7 +8,7 @@ import optparse
 
 from euclidwf.server import server_views_flask
 from euclidwf.server.server_model import RunServerConfiguration
-from euclidwf.utilities import config_loader
+from euclidwf.utilities import config_loader, sftp_pool
 
 
 STATIC_FILES='STATIC_FILES'
@@ -26,9 +26,11 @@ def start_server(args):
     configure(app, cfgfile)
     if args.appconfig:
         configure_app(args.appconfig)    
+        reactor.callWhenRunning(server_views_flask.resume_runs)
     resource = WSGIResource(reactor, reactor.getThreadPool(), app)
     site = Site(resource)
     reactor.listenTCP(port, site, interface="0.0.0.0")
+    reactor.addSystemEventTrigger('before', 'shutdown', sftp_pool.close_all)
     reactor.run()
 
 
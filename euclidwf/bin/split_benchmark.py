@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+Measures the time to refine a wide parallel split: the iterations of the split are
+inserted into the graph as seen by the traverser (with the ready, refine and data
+decorators) - two tasks per iteration, each connected to the inputs of the split.
+
+Example:
+    python split_benchmark.py --width 10000 --repeat 3
+
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import argparse
+import time
+
+from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK, Graph, Endpoint
+from pydron.interpreter import graphdecorator
+
+from euclidwf.framework.graph_tasks import ExecTask, ParallelSplitTask
+from euclidwf.framework.taskdefs import Package
+
+
+def parse_cmd_args():
+    parser = argparse.ArgumentParser(description="Measures the refinement of a wide parallel split.")
+    parser.add_argument("--width", help="Number of iterations of the split.", type=int, default=10000)
+    parser.add_argument("--repeat", help="Number of measurements - the best is reported.", type=int, default=3)
+    return parser.parse_args()
+
+
+def body_graph():
+    pkg=Package('benchpkg')
+    step1=ExecTask('step1', pkg, ('a','b'), ('c',))
+    step2=ExecTask('step2', pkg, ('c',), ('d',))
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        C(START_TICK, 'context', 2, 'context'),
+        T(1, step1, {'name':'step1', 'path':'step1'}),
+        C(1, 'c', 2, 'c'),
+        T(2, step2, {'name':'step2', 'path':'step2'}),
+        C(2, 'd', FINAL_TICK, 'd'),
+    )
+
+
+def refine(width):
+    '''
+    Refines a split of the given width.
+    :returns: the graph and the seconds spent refining the split.
+    '''
+    g=graphdecorator.ReadyDecorator(graphdecorator.RefineDecorator(graphdecorator.DataGraphDecorator(Graph())))
+    task=ParallelSplitTask(body_graph(), 'a', 'd_list', 'ps')
+    tick=START_TICK+1
+    g.add_task(tick, task, {'name':'ps', 'path':'ps'})
+    for port in ('a','b','context'):
+        g.connect(Endpoint(START_TICK, port), Endpoint(tick, port))
+    g.connect(Endpoint(tick, 'd_list'), Endpoint(FINAL_TICK, 'd_list'))
+    inputs=['item%i'%i for i in range(width)]
+    start=time.time()
+    task.adjust_graph(g, tick, inputs)
+    return g, time.time()-start
+
+
+if __name__ == '__main__':
+    args=parse_cmd_args()
+    seconds=[]
+    for _ in range(args.repeat):
+        g, elapsed=refine(args.width)
+        seconds.append(elapsed)
+    print("Refined a parallel split of %i iterations into %i tasks."%(args.width, len(g.get_all_ticks())))
+    print("Seconds: best %.3f, all %s"%(min(seconds), ", ".join("%.3f"%s for s in seconds)))
@@ -0,0 +1,185 @@
+'''
+Admission of jobs to the DRM.
+
+All pipeline runs of the server process share a single :data:`controller`. It
+caps the number of jobs in flight (submitted to the DRM and not yet finished)
+overall as well as per run. Jobs beyond these caps are queued locally. Whenever
+a slot becomes free, it is given to the run with the fewest jobs in flight
+relative to its weight - so that capacity is divided fairly among the runs.
+Within a run, jobs with higher priority are admitted first, in order of their
+request otherwise.
+'''
+import heapq
+import itertools
+import logging
+
+from twisted.internet import defer
+
+logger = logging.getLogger(__name__)
+
+
+class _RunState(object):
+
+    def __init__(self, runid, weight, max_jobs, seq):
+        self.runid=runid
+        self.weight=weight
+        self.max_jobs=max_jobs
+        self.seq=seq
+        self.queue=[]  # heap of [-priority, seq, job, deferred]
+        self.in_flight=0
+        self.admitted=0
+        self.closed=False
+
+    def todict(self):
+        return {'weight':self.weight, 'maxJobs':self.max_jobs, 'inFlight':self.in_flight,
+                'queued':len(self.queue), 'admitted':self.admitted, 'closed':self.closed}
+
+
+class AdmissionController(object):
+    """
+    Decides when jobs may be submitted to the DRM.
+    """
+
+    def __init__(self, max_jobs=None, max_jobs_per_run=None):
+        """
+        :param max_jobs: maximum number of jobs in flight overall - None for no limit.
+        :param max_jobs_per_run: maximum number of jobs in flight per run - None for no limit.
+        """
+        self.max_jobs=max_jobs
+        self.max_jobs_per_run=max_jobs_per_run
+        self.in_flight=0
+        self._runs={}
+        self._seq=itertools.count()
+
+
+    def configure(self, max_jobs=None, max_jobs_per_run=None):
+        self.max_jobs=max_jobs
+        self.max_jobs_per_run=max_jobs_per_run
+        self._dispatch()
+
+
+    def register_run(self, runid, weight=1.0, max_jobs=None):
+        '''
+        Registers a run - with its weight relative to other runs and optionally
+        a cap on its jobs in flight lower than the one configured for all runs.
+        '''
+        if runid in self._runs:
+            run=self._runs[runid]
+            run.weight=weight
+            run.max_jobs=max_jobs
+            run.closed=False
+        else:
+            self._runs[runid]=_RunState(runid, weight, max_jobs, next(self._seq))
+
+
+    def unregister_run(self, runid):
+        '''
+        Removes the run - cancelling the requests still queued for it. The slots of its
+        jobs in flight are kept until they are released: the jobs may still be running
+        on the DRM.
+        '''
+        if runid not in self._runs:
+            return
+        run=self._runs[runid]
+        run.closed=True
+        for entry in list(run.queue):
+            entry[3].cancel()
+        if not run.in_flight:
+            del self._runs[runid]
+        self._dispatch()
+
+
+    def request(self, runid, job, priority=0):
+        '''
+        Requests admission for the job.
+        :returns: Deferred fired with the job as soon as it may be submitted. Cancelling
+        the deferred withdraws the request.
+        '''
+        if runid not in self._runs:
+            self.register_run(runid)
+        run=self._runs[runid]
+
+        def cancel(d):
+            run.queue=[e for e in run.queue if e[3] is not d]
+            heapq.heapify(run.queue)
+
+        d=defer.Deferred(cancel)
+        heapq.heappush(run.queue, [-priority, next(self._seq), job, d])
+        self._dispatch()
+        return d
+
+
+    def update_priorities(self, runid, priority, selected=None):
+        '''
+        Re-evaluates the priorities of the jobs queued for the run.
+        :param priority: function returning the priority for a job.
+        :param selected: function selecting the jobs to re-evaluate - all if None.
+        '''
+        if runid not in self._runs:
+            return
+        run=self._runs[runid]
+        changed=False
+        for entry in run.queue:
+            if selected is None or selected(entry[2]):
+                entry[0]=-priority(entry[2])
+                changed=True
+        if changed:
+            heapq.heapify(run.queue)
+
+
+    def release(self, runid):
+        '''
+        Signals that a job admitted for the run is no longer in flight.
+        '''
+        if runid in self._runs:
+            run=self._runs[runid]
+            run.in_flight-=1
+            self.in_flight-=1
+            if run.closed and not run.in_flight:
+                del self._runs[runid]
+        self._dispatch()
+
+
+    def capacity(self):
+        '''
+        Returns the number of jobs a run may have in flight at most - None if not limited.
+        '''
+        caps=[cap for cap in (self.max_jobs, self.max_jobs_per_run) if cap]
+        return min(caps) if caps else None
+
+
+    def get_state(self):
+        return {'maxJobs':self.max_jobs, 'maxJobsPerRun':self.max_jobs_per_run,
+                'inFlight':self.in_flight, 'queued':sum(len(run.queue) for run in self._runs.itervalues()),
+                'runs':{str(runid):run.todict() for runid, run in self._runs.iteritems()}}
+
+
+    def _dispatch(self):
+        admitted=[]
+        while self.max_jobs is None or self.in_flight<self.max_jobs:
+            run=self._next_run()
+            if run is None:
+                break
+            _, _, job, d=heapq.heappop(run.queue)
+            run.in_flight+=1
+            run.admitted+=1
+            self.in_flight+=1
+            admitted.append((job, d))
+        for job, d in admitted:
+            logger.debug("Job %r admitted."%job)
+            d.callback(job)
+
+
+    def _next_run(self):
+        candidates=[run for run in self._runs.itervalues() if run.queue and self._below_cap(run)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda run: (run.in_flight/float(run.weight), run.seq))
+
+
+    def _below_cap(self, run):
+        caps=[cap for cap in (self.max_jobs_per_run, run.max_jobs) if cap]
+        return not caps or run.in_flight<min(caps)
+
+
+controller=AdmissionController()
@@ -0,0 +1,205 @@
+'''
+Checkpoints of pipeline runs - allow to resume a run after a restart of the server.
+
+The progress of a run is appended to a log file in the local cache as it is made: the
+refinements of parallel splits (the list the split has been refined with), the jobs
+submitted to the DRM (with their job id) and the jobs completed (with the paths of their
+outputs). Since the dataflow graph built from the pipeline specification and the ticks
+assigned while refining it are deterministic, a run can be resumed from the log: the
+refinements are replayed, the jobs completed are not submitted again and the jobs still
+in flight are checked for their status again instead of being submitted.
+
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import base64
+import datetime
+import json
+import logging
+import os
+import pickle
+
+from pydron.dataflow.graph import Tick
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR='checkpoints'
+CHECKPOINT_EXT='.jsonl'
+
+EVENT_RUN='run'
+EVENT_RESUMED='resumed'
+EVENT_REFINED='refined'
+EVENT_SUBMITTED='submitted'
+EVENT_COMPLETED='completed'
+EVENT_FINISHED='finished'
+
+TIME_FORMAT="%Y-%m-%dT%H:%M:%S.%f"
+
+
+def checkpoint_path(localcache, runid):
+    return os.path.join(localcache, CHECKPOINT_DIR, "%s%s"%(runid, CHECKPOINT_EXT))
+
+
+def create(configuration, runid, rundata, resume=False):
+    '''
+    Returns the checkpoint of the run - a new one unless the run is resumed.
+    :param rundata: the run configuration (without credentials) stored with the checkpoint.
+    '''
+    path=checkpoint_path(configuration.localcache, runid)
+    if resume and os.path.exists(path):
+        checkpoint=Checkpoint(path)
+        checkpoint.record_resumed()
+        return checkpoint
+    checkpoint=Checkpoint(path, truncate=True)
+    checkpoint.record_run(rundata)
+    return checkpoint
+
+
+def find_unfinished(localcache):
+    '''
+    Returns the checkpoints of the runs that have not finished - e.g. since the server has been stopped.
+    '''
+    checkpointdir=os.path.join(localcache, CHECKPOINT_DIR)
+    if not os.path.isdir(checkpointdir):
+        return []
+    checkpoints=[]
+    for fname in sorted(os.listdir(checkpointdir)):
+        if not fname.endswith(CHECKPOINT_EXT):
+            continue
+        checkpoint=Checkpoint(os.path.join(checkpointdir, fname))
+        if checkpoint.rundata and not checkpoint.finished:
+            checkpoints.append(checkpoint)
+    return checkpoints
+
+
+def tick_to_str(tick):
+    return repr(tick).strip("()")
+
+
+def str_to_tick(s):
+    return Tick.parse_tick(str(s))
+
+
+class Checkpoint(object):
+    """
+    Append-only log of the progress of a run and the state restored from it.
+    """
+
+    def __init__(self, path, truncate=False):
+        self.path=path
+        self.rundata=None
+        self.finished=None
+        self.refined={}
+        self.submitted={}
+        self.completed={}
+        if truncate:
+            parentdir=os.path.dirname(path)
+            if parentdir and not os.path.exists(parentdir):
+                os.makedirs(parentdir)
+            open(path, 'w').close()
+        else:
+            self._load()
+
+
+    def record_run(self, rundata):
+        self.rundata=rundata
+        self._append({'event':EVENT_RUN, 'run':rundata})
+
+
+    def record_resumed(self):
+        self.finished=None
+        self._append({'event':EVENT_RESUMED})
+
+
+    def record_refined(self, tick, input_list):
+        input_list=list(input_list) # may be a list file (see euclidwf.utilities.listfile)
+        self.refined[tick]=input_list
+        self._append({'event':EVENT_REFINED, 'tick':tick_to_str(tick),
+                      'list':base64.b64encode(pickle.dumps(input_list))})
+
+
+    def record_submitted(self, job):
+        entry={'pid':job.pid, 'outputs':job.outputs, 'submit_time':_timestr(job.submit_time)}
+        self.submitted[job.tick]=entry
+        self._append(dict(entry, event=EVENT_SUBMITTED, tick=tick_to_str(job.tick)))
+
+
+    def record_completed(self, job):
+        entry={'pid':job.pid, 'outputs':job.outputs, 'status':job.status,
+               'submit_time':_timestr(job.submit_time), 'end_time':_timestr(job.end_time)}
+        self.completed[job.tick]=entry
+        self.submitted.pop(job.tick, None)
+        self._append(dict(entry, event=EVENT_COMPLETED, tick=tick_to_str(job.tick)))
+
+
+    def record_finished(self, status):
+        self.finished=status
+        self._append({'event':EVENT_FINISHED, 'status':status})
+
+
+    def get_refined(self, tick):
+        return self.refined.get(tick)
+
+
+    def get_completed(self, tick):
+        return self.completed.get(tick)
+
+
+    def get_submitted(self, tick):
+        return self.submitted.get(tick)
+
+
+    def _append(self, event):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(event)+"\n")
+        except IOError as e:
+            logger.warn("Event could not be written to checkpoint %s: %s"%(self.path, e))
+
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    event=json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete if the server has been killed while writing it
+                    logger.warn("Incomplete entry in checkpoint %s ignored."%self.path)
+                    continue
+                self._apply(event)
+
+
+    def _apply(self, event):
+        kind=event['event']
+        if kind==EVENT_RUN:
+            self.rundata=event['run']
+        elif kind==EVENT_RESUMED:
+            self.finished=None
+        elif kind==EVENT_FINISHED:
+            self.finished=event['status']
+        elif kind==EVENT_REFINED:
+            self.refined[str_to_tick(event['tick'])]=pickle.loads(base64.b64decode(event['list']))
+        elif kind==EVENT_SUBMITTED:
+            self.submitted[str_to_tick(event['tick'])]=_restore(event)
+        elif kind==EVENT_COMPLETED:
+            tick=str_to_tick(event['tick'])
+            self.completed[tick]=_restore(event)
+            self.submitted.pop(tick, None)
+
+
+def _timestr(dt):
+    return dt.strftime(TIME_FORMAT) if dt else None
+
+
+def _restore(event):
+    entry={'pid':str(event['pid']) if event['pid'] is not None else None,
+           'outputs':{str(k):str(v) for k,v in event['outputs'].iteritems()}}
+    for key in ('submit_time', 'end_time'):
+        if event.get(key):
+            entry[key]=datetime.datetime.strptime(event[key], TIME_FORMAT)
+    if 'status' in event:
+        entry['status']=str(event['status'])
+    return entry
@@ -0,0 +1,154 @@
+'''
+Estimates the critical path of a pipeline run from the walltimes declared for
+the executables.
+
+The bottom level of a task is the walltime on the longest path from the task
+(including the task itself) to the FINAL_TICK. Tasks with a high bottom level
+are on the critical path of the remaining processing: submitting them first
+shortens the makespan whenever there are more ready jobs than slots available
+on the DRM (see :mod:`admission`).
+
+Tasks still to be refined are accounted for with the critical path of their body
+graph - the number of iterations of a parallel split does not matter since the
+iterations run in parallel. When a parallel split has been refined, only the tasks it
+has been refined into and its ancestors are updated; the bottom levels of the tasks
+added otherwise (e.g. by the refinement of a nested graph) are computed when needed.
+'''
+import logging
+
+from pydron.dataflow.graph import START_TICK, FINAL_TICK
+
+from euclidwf.framework.graph_tasks import ExecTask, NestedGraphTask, ParallelSplitTask,\
+    BundleTask
+from euclidwf.utilities.exec_loader import load_executable
+
+logger = logging.getLogger(__name__)
+
+
+def bottom_levels(g, walltime):
+    '''
+    Computes the bottom level of all tasks of the graph.
+    :param walltime: function returning the walltime (in seconds) for a task.
+    :returns: dictionary with the bottom level (in seconds) per tick.
+    '''
+    levels={}
+    # connections always point to younger ticks - hence, descending tick order is a
+    # reverse topological order.
+    for tick in sorted(g.get_all_ticks(), reverse=True):
+        successors=[levels.get(dest.tick, 0.0) for _, dest in g.get_out_connections(tick)]
+        levels[tick]=walltime(g.get_task(tick))+(max(successors) if successors else 0.0)
+    return levels
+
+
+def _ancestors(g, ticks):
+    '''
+    Returns the ticks of all the tasks with a path to one of the given tasks (not among them).
+    '''
+    ticks=set(ticks)
+    ancestors=set()
+    pending=list(ticks)
+    while pending:
+        for source, _ in g.get_in_connections(pending.pop()):
+            if source.tick != START_TICK and source.tick not in ticks and source.tick not in ancestors:
+                ancestors.add(source.tick)
+                pending.append(source.tick)
+    return ancestors
+
+
+class CriticalPathEstimator(object):
+    """
+    Keeps the bottom levels of the tasks of a graph - to be updated whenever
+    the graph has been refined.
+    """
+
+    def __init__(self):
+        self._graph=None
+        self._levels=None
+        self._walltimes={}
+
+
+    def update(self, g, tick=None):
+        '''
+        Updates the bottom levels - of all the tasks or, if the tick of a task just refined
+        is given, of the tasks it has been refined into and of its ancestors.
+        :returns: the ticks whose bottom level has been updated.
+        '''
+        self._graph=g
+        if tick is None or self._levels is None:
+            self._levels=bottom_levels(g, self.walltime)
+            return set(self._levels)
+        self._levels.pop(tick, None)
+        descendants=g.get_descendant_ticks(tick)
+        for t in reversed(descendants):
+            self._bottom_level(g, t)
+        ancestors=_ancestors(g, descendants)
+        for t in sorted(ancestors, reverse=True):
+            self._bottom_level(g, t)
+        return set(descendants) | ancestors
+
+
+    def has_estimate(self):
+        return self._levels is not None
+
+
+    def priority(self, tick):
+        '''
+        Returns the bottom level of the task - 0 if unknown.
+        '''
+        if not self._levels:
+            return 0.0
+        if tick not in self._levels:
+            try:
+                return self._bottom_level(self._graph, tick)
+            except KeyError:
+                return 0.0
+        return self._levels[tick]
+
+
+    def _bottom_level(self, g, tick):
+        '''
+        (Re)computes the bottom level of the task - from the bottom levels of its successors,
+        those not known yet are computed first.
+        '''
+        stack=[tick]
+        while stack:
+            t=stack[-1]
+            successors=[dest.tick for _, dest in g.get_out_connections(t) if dest.tick != FINAL_TICK]
+            missing=[s for s in successors if s not in self._levels]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            self._levels[t]=self.walltime(g.get_task(t))+max([self._levels[s] for s in successors] or [0.0])
+        return self._levels[tick]
+
+
+    def walltime(self, task):
+        '''
+        Returns the walltime in seconds declared for the task - for tasks to be refined,
+        the walltime on the critical path of their body graph.
+        '''
+        if isinstance(task, ExecTask):
+            key=(task.command, task.package.pkgname)
+            if key not in self._walltimes:
+                self._walltimes[key]=self._exec_walltime(task)
+            return self._walltimes[key]
+        elif isinstance(task, BundleTask):
+            # the steps of a bundle are executed one after the other
+            return sum(self.walltime(task.body_graph.get_task(t)) for t in task.steps())
+        elif isinstance(task, (NestedGraphTask, ParallelSplitTask)):
+            key=id(task.body_graph)
+            if key not in self._walltimes:
+                levels=bottom_levels(task.body_graph, self.walltime)
+                self._walltimes[key]=max(levels.values()) if levels else 0.0
+            return self._walltimes[key]
+        return 0.0
+
+
+    def _exec_walltime(self, task):
+        try:
+            executable=load_executable(task.command, task.package.pkgname)
+            return float(executable.resources.walltime)*3600
+        except:
+            logger.debug("No walltime found for %r - assuming 0."%task)
+            return 0.0
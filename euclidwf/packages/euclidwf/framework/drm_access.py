@@ -46,10 +46,11 @@ def read_submit_response(data):
 
 # CHECK STATUS
 #----------------------------------------------
+CHECKSTATUS_MAX_JOBIDS=1
 
 def create_checkstatus_command(cmdname, jobids):
-    if len(jobids) != 1:
-        raise ConfigurationError("Check status command called with %i jobids. Only one single is accepted.")
+    if len(jobids) != CHECKSTATUS_MAX_JOBIDS:
+        raise ConfigurationError("Check status command called with %i jobids. Only one single is accepted."%len(jobids))
     jobid=jobids[0]
     cmdArray = cmdname.split()    
     cmdArray.append(DRM_JOBID%jobid)
@@ -25,7 +25,8 @@ Created on May 18, 2015
 from pydron.dataflow import graph
 from pydron.dataflow.graph import START_TICK, FINAL_TICK
 from euclidwf.framework.context import CONTEXT
-from euclidwf.framework.graph_tasks import ExecTask, NestedGraphTask, ParallelSplitTask
+from euclidwf.framework.graph_tasks import ExecTask, NestedGraphTask, ParallelSplitTask,\
+    BundleTask, BUNDLE, WINDOW, ELEMENTWISE, fuse_splits, fused_portname
 from euclidwf.framework.workflow_dsl import MethodInvocation, ParallelSplit, invoke_pipeline,\
     TaskInvocation
 from euclidwf.utilities.error_handling import PipelineGraphError
@@ -53,6 +54,7 @@ class PydronGraphBuilder(object):
         self.invocation=invoke_pipeline(method)
         self.graph=graph.Graph()
         self.ticks={} # invocation as key, tick as value
+        self.fused={} # downstream parallel split as key, upstream parallel split fused into it as value
     
     def build(self):
         """
@@ -60,8 +62,12 @@ class PydronGraphBuilder(object):
         Furthermore, it adds a 'context' variable to all tasks defined in the graph. This will
         be used to ingest runtime information to the nodes when traversing the graph.   
         """
+        self.fused=self._elementwise_splits()
+        upstream_splits=set(self.fused.values())
         tick=START_TICK
         for t in self.invocation.tasks:
+            if t in upstream_splits:
+                continue # added with the downstream split
             tick=self.add_task(tick,t)
         self.add_outputs()
         self.add_context()
@@ -71,8 +77,9 @@ class PydronGraphBuilder(object):
         """
         Adds for the given invocation an associated node/task to the graph.
         * for TaskInvocation: ExecTask
-        * for MethodInvocation: NestedGraphTask
-        * for ParallelSplit: ParallelSplitTask
+        * for MethodInvocation: NestedGraphTask - or BundleTask if the property 'bundle' is set
+        * for ParallelSplit: ParallelSplitTask - expanded in a sliding window if the property 'window' is set,
+        fused with the upstream split if the property 'elementwise' is set (see fuse_splits)
         In addition, it sets the following properties in the graph:
         * name: name of the original function invoked in the pipeline script
         * path: path to the node for the given task within the graph; note that at design time the graph is
@@ -81,13 +88,17 @@ class PydronGraphBuilder(object):
         """
         props={'name':invocation.name, 'path':invocation.name}
         tick=tick+1
+        bundle=bool(invocation.properties.get(BUNDLE, False))
         if isinstance(invocation, MethodInvocation):
             body_graph=build_graph(invocation.body_method)
-            task = NestedGraphTask(body_graph, invocation.name)
+            if bundle:
+                task = BundleTask(body_graph, invocation.name)
+            else:
+                task = NestedGraphTask(body_graph, invocation.name)
         elif isinstance(invocation, ParallelSplit):
-            body_graph=build_graph(invocation.body_method)            
-            outputname = invocation.outputs[0].name
-            task = ParallelSplitTask(body_graph, invocation.iterable, outputname, invocation.name)
+            task = self._split_task(invocation)
+            if invocation in self.fused:
+                task = fuse_splits(self._split_task(self.fused[invocation]), task)
         elif isinstance(invocation, TaskInvocation):
             command=invocation.properties['command']
             package=invocation.properties['package']
@@ -98,8 +109,43 @@ class PydronGraphBuilder(object):
             raise PipelineGraphError("No task implementation available for invocation of type %s."%str(type(invocation)))
         self.graph.add_task(tick, task, props)
         self.ticks[invocation]=tick
-        self.add_connections(invocation, tick)
+        if invocation in self.fused:
+            self.add_fused_connections(invocation, tick)
+        else:
+            self.add_connections(invocation, tick)
         return tick
+
+
+    def _split_task(self, invocation):
+        body_graph=build_graph(invocation.body_method)            
+        outputname = invocation.outputs[0].name
+        bundle=bool(invocation.properties.get(BUNDLE, False))
+        window = invocation.properties.get(WINDOW)
+        return ParallelSplitTask(body_graph, invocation.iterable, outputname, invocation.name, bundle, window)
+
+
+    def _elementwise_splits(self):
+        """
+        Returns the parallel splits with the property 'elementwise' set, mapped to the parallel split 
+        providing their iterable. The iterable must be the output list of another parallel split that 
+        is not used anywhere else.
+        """
+        fused={}
+        for invocation in self.invocation.tasks:
+            if not isinstance(invocation, ParallelSplit) or not invocation.properties.get(ELEMENTWISE, False):
+                continue
+            upstream=invocation.inputs[invocation.iterable].parent
+            if not isinstance(upstream, ParallelSplit):
+                raise PipelineGraphError("Parallel split %s is declared elementwise - its iterable must be the output of a parallel split."%invocation.name)
+            if upstream in fused:
+                raise PipelineGraphError("Parallel split %s is declared elementwise - chains of elementwise splits are not supported."%invocation.name)
+            consumers=[t for t in self.invocation.tasks for name, source in t.inputs.iteritems()
+                       if source.parent is upstream and not (t is invocation and name == invocation.iterable)]
+            consumers+=[s for s in self.invocation.outputs if s.ref.parent is upstream]
+            if consumers:
+                raise PipelineGraphError("Parallel split %s is declared elementwise - the output of %s must not be used elsewhere."%(invocation.name, upstream.name))
+            fused[invocation]=upstream
+        return fused
     
     
     def add_connections(self, task, tick):
@@ -110,7 +156,22 @@ class PydronGraphBuilder(object):
         Note that whereas for each input there is only a single connection - 
         an output may be connected to many inputs.          
         """
-        for inputname, source in task.inputs.iteritems():
+        self._connect_inputs(task.inputs, tick)
+
+
+    def add_fused_connections(self, invocation, tick):
+        """
+        Connects the inputs of an elementwise parallel split fused with its upstream split: the inputs 
+        of the upstream split and those of the split itself, except for the iterable (see fuse_splits).
+        """
+        self.add_connections(self.fused[invocation], tick)
+        inputs={fused_portname(invocation, name):source for name, source in invocation.inputs.iteritems() 
+                if name != invocation.iterable}
+        self._connect_inputs(inputs, tick)
+
+
+    def _connect_inputs(self, inputs, tick):
+        for inputname, source in inputs.iteritems():
             endpoint=graph.Endpoint(tick, inputname)
             if source.parent:
                 source_tick = self.ticks[source.parent]
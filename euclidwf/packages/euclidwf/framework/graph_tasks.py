@@ -4,7 +4,9 @@ The different implementations are associated with the structural elements
 defined in the workflow language:
 * ExecTask for a TaskInvocation
 * NestedGraphTask for a (nested) MethodInvocation
-* ParallelSplitTask for a ParallelSplit.
+* ParallelSplitTask for a ParallelSplit
+* BundleTask for a (nested) MethodInvocation or the iterations of a ParallelSplit
+to be submitted as a single job.
 
 When traversing the Pydron graph, the (Pydron) traverser delegates 
 the handling of the tasks at the nodes to handlers that submit jobs to the 
@@ -17,6 +19,7 @@ Created on May 19, 2015
 
 @author: martin.melchior
 '''
+import gc
 import os
 from twisted.internet import defer
 from twisted.python.failure import Failure
@@ -25,9 +28,11 @@ from pydron.dataflow.graph import START_TICK
 from pydron.dataflow.refine import insert_subgraph
 from pydron.dataflow.tasks import AbstractTask
 from pydron.interpreter.traverser import EvalResult
+from euclidwf.framework import admission
 from euclidwf.framework.context import WORKDIR, CONTEXT, TRANSPORTER, LOCALWORKDIR,\
     WSROOT
-import pickle
+from euclidwf.utilities.error_handling import PipelineGraphError
+from euclidwf.utilities import listfile
 
 EXECTASK_REPR="ExecTask (name=%s, pkg=%s)"
 
@@ -166,13 +171,70 @@ class NestedGraphTask(AbstractTask):
         return "NestedGraphTask(%s): \n      %s" % (self.name, self.body_graph)
 
 
+BUNDLE='bundle'
+BUNDLE_PLAN='bundle_plan'
+BUNDLE_TIMING='bundle_timing'
+
+class BundleTask(AbstractTask):
+    """
+    Task associated with a nested workflow (or the body of a parallel split) that is
+    submitted as a single job - the steps of the sub-graph ('body_graph') are executed
+    one after the other within the job by the bundle runner. The inputs and outputs of
+    the task are the inputs and outputs of the body graph.
+    """
+    def __init__(self, body_graph, name):
+        """
+        @param body_graph: The sub-graph with the steps to be executed in the job. It must only
+        contain ExecTasks.
+        @param name: Name of the function in the original pipeline specification.
+        """
+        for t in body_graph.get_all_ticks():
+            if not isinstance(body_graph.get_task(t), ExecTask):
+                raise PipelineGraphError("Bundle %s must only contain task invocations - found %r."%(name, body_graph.get_task(t)))
+        self.body_graph = body_graph
+        self.name = name
+        self.inputnames = sorted(set(source.port for source, _ in body_graph.get_out_connections(START_TICK) if source.port != CONTEXT))
+        self.outputnames = sorted(dest.port for _, dest in body_graph.get_in_connections(graph.FINAL_TICK))
+
+    def evaluate(self, inputs):
+        raise ValueError("Task cannot be executed - it just contains the information \
+                                for performing a bundle of steps in the pipeline.")
+
+    def refine(self, g, tick, known_inputs):
+        raise ValueError("No refinement in a bundle task.")
+
+    def steps(self):
+        '''
+        Returns the ticks of the steps in the order of execution - connections always
+        point to younger ticks, so ascending tick order is a topological order.
+        '''
+        return sorted(self.body_graph.get_all_ticks())
+
+    def step_inputs(self, tick):
+        '''
+        Returns for each input port of the step the endpoint providing it - an output of a
+        previous step or an input of the bundle (at the START_TICK).
+        '''
+        return {dest.port: source for source, dest in self.body_graph.get_in_connections(tick) if dest.port != CONTEXT}
+
+    def output_sources(self):
+        '''
+        Returns for each output port of the bundle the endpoint of the step providing it.
+        '''
+        return {dest.port: source for source, dest in self.body_graph.get_in_connections(graph.FINAL_TICK)}
+
+    def __repr__(self):
+        return "BundleTask(%s): \n      %s" % (self.name, self.body_graph)
+
+
 class HelperTask(AbstractTask):
     pass
 
 class _mapPortsTask(HelperTask):
     """
-    Helper task that is used to map the input list elements to individual ports that can 
-    be connected to the different sub-processes of a parallel split task.  
+    Helper task that is used to map the input list elements to the different sub-processes of a 
+    parallel split task - the list is the value of a vector port with one connection per element
+    (see pydron.dataflow.graph.Endpoint).
     """    
     def __init__(self, inputname, array):
         self.num_splits = len(array)
@@ -180,7 +242,7 @@ class _mapPortsTask(HelperTask):
         self.inputname=inputname
                 
     def evaluate(self, g, tick, task, inputs):
-        result=EvalResult({"%s_%s"%(self.inputname,i+1) : self.array[i] for i in range(self.num_splits)})
+        result=EvalResult({self.inputname : list(self.array)})
         return defer.succeed(result)
     
     def refine(self, g, tick, known_inputs):
@@ -190,19 +252,42 @@ class _mapPortsTask(HelperTask):
         return "mapToPortsTask: %i splits" % (self.num_splits)
 
 
+class _elementTask(HelperTask):
+    """
+    Helper task in the body of fused parallel splits (see fuse_splits) that composes the outputs of an 
+    iteration of the upstream split into the tuple the downstream split would find as element of the 
+    upstream output list.
+    """
+    def __init__(self, inputnames, outputname):
+        self.inputnames=list(inputnames)
+        self.outputname=outputname
+        self.outputnames=[outputname]
+
+    def evaluate(self, g, tick, task, inputs):
+        element=tuple(inputs[name] for name in self.inputnames)
+        return defer.succeed(EvalResult({self.outputname : element}))
+
+    def refine(self, g, tick, known_inputs):
+        raise ValueError("No refinement of an elementTask.")
+
+    def __repr__(self):
+        return "elementTask: %s" % (self.outputname)
+
+
 class _reducePortsTask(HelperTask):
     """
     Helper task that is used to collect the outputs of all the different sub-processes of a parallel split 
     (its file paths) and compose a single file containing a list tuples - each tuple containing the 
     outputs (file paths) of a single sub-process. The file is then uploaded to the workspace asynchronously.
-    a deferred object (see twisted) is returned. 
+    a deferred object (see twisted) is returned. Each output of the sub-processes is received by a vector 
+    port with one connection per sub-process (see pydron.dataflow.graph.Endpoint).
     The task is executed ('evaluate') locally - i.e. it is not submitted to the computing infrastructure.   
     """
     def __init__(self, num_splits, inputnames, outputlistname):
         self.num_splits=num_splits
         self.portnames=inputnames  # names of the input arguments of the body method
         self.outputlistname=outputlistname
-        self.inputnames=["%s_%i"%(_name, i+1) for _name in inputnames for i in range(self.num_splits)]
+        self.inputnames=list(inputnames)
         self.outputnames=[outputlistname]
 
     def evaluate(self, g, tick, task, inputs):
@@ -212,21 +297,16 @@ class _reducePortsTask(HelperTask):
         """
         # create the output file locally - relative output path is given by the model path of the given node. 
         context=inputs[CONTEXT]
-        transporter=context[TRANSPORTER]
         parentdir=_dataflow_path(g, tick)
-        localpath=os.path.join(context[LOCALWORKDIR], parentdir, self.outputlistname)
-        if not os.path.exists(os.path.join(str(context[LOCALWORKDIR]), parentdir)):
-            os.makedirs(os.path.join(str(context[LOCALWORKDIR]), parentdir))
+        localpath=_local_outputlist_path(context, parentdir, self.outputlistname)
 
-        outputlist=[]    
-        for i in range(self.num_splits):
-            tuple_from_split=tuple([ inputs["%s_%i" % (name,i+1)] for name in self.portnames ])
-            outputlist.append(tuple_from_split)
-        with open(localpath, 'w') as localfile:
-            pickle.dump(outputlist, localfile)
-        
+        listfile.write_list(localpath, self._outputlist(inputs))
+        return self._upload(context, localpath, parentdir)
+
+    def _upload(self, context, localpath, parentdir):
         # now compose the remote path where this file needs to be copied to
         # use the transporter obtained the context has been initialized with
+        transporter=context[TRANSPORTER]
         remotepath=os.path.join(str(context[WSROOT]), str(context[WORKDIR]), parentdir, self.outputlistname)
         relativepath = os.path.join(parentdir, self.outputlistname)
         d = transporter.upload_file(localpath, remotepath)
@@ -243,13 +323,110 @@ class _reducePortsTask(HelperTask):
         d.addErrback(on_failure)
         return d
     
+    def _outputlist(self, inputs):
+        outputlist=[]    
+        for i in range(self.num_splits):
+            tuple_from_split=tuple([ inputs[name][i] for name in self.portnames ])
+            outputlist.append(tuple_from_split)
+        return outputlist
+    
     def refine(self, g, tick, known_inputs):
         raise ValueError("No refinement of a reducePortsTask.")
 
     def __repr__(self):
         return "reducePortsTask: %i splits" % (self.num_splits)
+
+
+class _windowReducePortsTask(_reducePortsTask):
+    """
+    Helper task that collects the outputs of a parallel split expanded in a sliding window (see 
+    _SplitWindow). The outputs are not connected as inputs: they are appended to the list file as 
+    the iterations are collapsed (see _ListManifest). The task is refined (and, hence, becomes ready) 
+    once all the iterations are collapsed - it then just seals the list file and uploads it.
+    """
+    def __init__(self, window, inputnames, outputlistname):
+        _reducePortsTask.__init__(self, window.num_splits, inputnames, outputlistname)
+        self.window=window
+        self.inputnames=[]
+        self.refiner_ports=[CONTEXT]
+
+    def evaluate(self, g, tick, task, inputs):
+        context=inputs[CONTEXT]
+        parentdir=_dataflow_path(g, tick)
+        manifest=self.window.manifest
+        if manifest is None:
+            # no iterations
+            manifest=_ListManifest(_local_outputlist_path(context, parentdir, self.outputlistname), 0)
+        manifest.seal()
+        return self._upload(context, manifest.path, parentdir)
+
+    def refine(self, g, tick, known_inputs):
+        return self.window.done
+
+    def __repr__(self):
+        return "windowReducePortsTask: %i splits" % (self.num_splits)
+
+
+class _collapseIterationTask(HelperTask):
+    """
+    Helper task added behind each iteration of a parallel split expanded in a sliding window (see 
+    _SplitWindow). Its inputs are the outputs of the iteration - once these are available, the task is 
+    refined by collapsing the iteration into a compact record and expanding the next iteration.
+    """
+    def __init__(self, window, iteration):
+        self.window=window
+        self.iteration=iteration
+        self.inputnames=window.portnames
+        self.refiner_ports=window.portnames+[CONTEXT]
+
+    def evaluate(self, g, tick, task, inputs):
+        raise ValueError("Should not be evaluated - should have been refined i.e. removed with its iteration.")
+
+    def refine(self, g, tick, known_inputs):
+        self.window.collapse(g, tick, self.iteration, known_inputs)
+        return defer.succeed(None)
+
+    def __repr__(self):
+        return "collapseIterationTask: iteration %i" % (self.iteration+1)
+
+
+class _ListManifest(object):
+    """
+    List file written incrementally as the elements become known - in any order. The file (see 
+    euclidwf.utilities.listfile) is written up to the last element known with all the elements
+    before it. Elements known out of order are kept until then. The file can only be read once 
+    sealed - before, it is marked as incomplete.
+    """
+    def __init__(self, path, length):
+        """
+        @param path: The local path of the list file - overwritten if it exists.
+        @param length: The number of elements.
+        """
+        self.path=path
+        self.length=length
+        self.next_index=0
+        self.pending={}
+        self._writer=listfile.ListFileWriter(path)
+
+    def append(self, index, element):
+        self.pending[index]=element
+        while self.next_index in self.pending:
+            self._writer.append(self.pending.pop(self.next_index))
+            self.next_index+=1
+        self._writer.flush()
+
+    def seal(self):
+        if self.next_index != self.length:
+            raise ValueError("List %s is incomplete - %i of %i elements written."%(self.path, self.next_index, self.length))
+        self._writer.close()
  
  
+WINDOW='window'
+WINDOW_AUTO='auto'
+DEFAULT_WINDOW=1000 # iterations in the window if sized automatically and the DRM capacity is not limited
+WINDOW_CAPACITY_FACTOR=2 # iterations in the window per job the DRM may run at a time
+ELEMENTWISE='elementwise'
+
 class ParallelSplitTask(AbstractTask):
     """
     Task associated with a parallel split and specified by an invocation of type ParallelSplit.
@@ -261,19 +438,25 @@ class ParallelSplitTask(AbstractTask):
     The sub-graph is integrated into the parent graph when the refine operation is invoked. 
     As a result of applying the parallel split we obtain a file with a list of tuples - each tuple 
     containing the paths of the output files from each parallel-splitted sub-graph. 
+    For long lists, the split can be expanded in a sliding window - see _SplitWindow.
     """
-    def __init__(self, body_graph, iterable, outputname, name):
+    def __init__(self, body_graph, iterable, outputname, name, bundle=False, window=None):
         """
         @param body_graph: The logic to be applied in each split.
         @param iterable: The name of the argument (input port) that defines the splits.
         @param outputname: The name of the outputlist (file containing the output list) of the parallel split. 
         @param name: The name of the body function defined in the original pipeline specification. 
+        @param bundle: If set, each split is submitted as a single job (see BundleTask).
+        @param window: If set, at most this number of splits is expanded into the graph at a time - or, 
+        if set to 'auto', a multiple of the number of jobs the DRM may run at a time for a pipeline run.
         """
         self.body_graph = body_graph
         self.iterator_port = iterable
         self.refiner_ports = [iterable, CONTEXT] # we need these to let the traverser know that refinement is needed.
         self.name = name
         self.outputname=outputname
+        self.bundle_task = BundleTask(body_graph, name) if bundle else None
+        self.window = window
 
     def evaluate(self, inputs):
         raise ValueError("Should not be evaluated in a job - should have been refined i.e. replaced by a subgraph.")
@@ -291,6 +474,7 @@ class ParallelSplitTask(AbstractTask):
         from all the sub-graphs and provides a list with these output tuples.
         * adding and connecting all nodes (of map, reduce and all the n sub-graphs) in the parent graph;
         * removing the original parallel split node from the graph.    
+        The deferred returned fires with the list of input elements.
         """
         d = self._fetch_refiner_data(known_inputs)
         
@@ -298,6 +482,7 @@ class ParallelSplitTask(AbstractTask):
             list_file=input_values[self.iterator_port]
             input_list=self._load_list_from_file(list_file)
             self.adjust_graph(g, tick, input_list)
+            return input_list
         
         def on_failure(reason):
             failure=Failure(ValueError("Exception occurred while refining tick %s. Reason: %s \n"%(tick, reason.getTraceback())))
@@ -309,9 +494,8 @@ class ParallelSplitTask(AbstractTask):
 
     
     def _load_list_from_file(self, fname):
-        with open(fname,'r') as f:
-            listobject = pickle.load(f) 
-        return listobject
+        # elements are only read from a list file when accessed - pickled lists are loaded as a whole
+        return listfile.load_list(fname)
     
     
     def _fetch_refiner_data(self, known_inputs):
@@ -368,10 +552,16 @@ class ParallelSplitTask(AbstractTask):
         # no inputs are needed for this task since data are passed in at refinement time
         reduce_inputnames=[source.port for source,dest in self.body_graph.get_in_connections(graph.FINAL_TICK)]       
         _, reduce_out_dest = g.get_out_connections(tick)[0]
-        reduce_task=_reducePortsTask(len(input_list), reduce_inputnames, self.outputname)
         reduce_tick=iterations_tick+1
         reducepath="%s.reduce"%parentpath        
-        g.add_task(reduce_tick, reduce_task, {'name':'reduce', 'path':reducepath})
+        window_size=self._window_size(len(input_list))
+        if window_size:
+            window=_SplitWindow(self, window_size, len(input_list), reduce_inputnames, map_task_tick, iterations_tick, parentpath)
+            reduce_task=_windowReducePortsTask(window, reduce_inputnames, self.outputname)
+            g.add_task(reduce_tick, reduce_task, {'name':'reduce', 'path':reducepath, 'collapsed':window.records})
+        else:
+            reduce_task=_reducePortsTask(len(input_list), reduce_inputnames, self.outputname)
+            g.add_task(reduce_tick, reduce_task, {'name':'reduce', 'path':reducepath})
         
         # context
         source=graph.Endpoint(START_TICK, CONTEXT)
@@ -382,60 +572,111 @@ class ParallelSplitTask(AbstractTask):
 
         # iterations
         input_map = {dest.port: source for source, dest in g.get_in_connections(tick) if dest.port != self.iterator_port}
-        for iteration_counter in range(len(input_list)):
-            # tick to expand the sub-graph tasks from
-            iteration_tick = graph.START_TICK + iteration_counter+1 << iterations_tick
 
+        # the cyclic garbage collector is paused while the iterations are added - the many
+        # objects created would trigger it repeatedly, without any garbage to be collected.
+        gc_enabled=gc.isenabled()
+        gc.disable()
+        try:
+            if window_size:
+                window.start(g, input_map)
+            else:
+                collector=lambda iteration_tick, iteration, port: graph.Endpoint(reduce_tick, port, iteration)
+                self._add_iterations(g, map_task_tick, input_map, iterations_tick, range(len(input_list)), parentpath, collector)
+        finally:
+            if gc_enabled:
+                gc.enable()
+            
+        self._remove_task(g, tick)
+        g.connect(reduce_task_source,reduce_out_dest)                     
+
+        
+    def _window_size(self, num_splits):
+        '''
+        Returns the number of iterations to expand at a time - None if expanded without a window.
+        '''
+        if not self.window:
+            return None
+        if self.window == WINDOW_AUTO:
+            capacity=admission.controller.capacity()
+            size=WINDOW_CAPACITY_FACTOR*capacity if capacity else DEFAULT_WINDOW
+        else:
+            size=int(self.window)
+        if size <= 0:
+            raise PipelineGraphError("Window of parallel split %s must be positive - found %s."%(self.name, self.window))
+        return min(size, num_splits)
+
+        
+    def _add_bundle(self, g, iteration_tick, input_map, iterator_port_source, iteration, path, collector):
+        '''
+        Adds the iteration as a single node with the bundle task - instead of the subgraph.
+        '''
+        g.add_task(iteration_tick, self.bundle_task, {'name':self.name, 'path':path})
+        iteration_input={k:v for k,v in input_map.iteritems()}
+        iteration_input.update({self.iterator_port : iterator_port_source})
+        for port in self.bundle_task.inputnames+[CONTEXT]:
+            g.connect(iteration_input[port], graph.Endpoint(iteration_tick, port))
+        for port, source in self.bundle_task.output_sources().iteritems():
+            g.connect(graph.Endpoint(iteration_tick, port), collector(iteration_tick, iteration, source.port))
+
+
+    def _add_iterations(self, g, map_task_tick, input_map, iterations_tick, iterations, parentpath, collector):
+        '''
+        Adds the subgraphs (or bundles) of the given iterations and connects them to the map task
+        and, with their outputs, to the endpoints returned by the collector function.
+        @param iterations: The iteration counters (starting at 0).
+        @param collector: f(iteration tick, iteration counter, output port) returning the endpoint 
+        the output is connected to. 
+        '''
+        # ticks to expand the sub-graph tasks from
+        iteration_ticks = [graph.START_TICK + iteration_counter+1 << iterations_tick for iteration_counter in iterations]
+        iteration_paths = {iteration_tick : "%s.iterations.%i"%(parentpath,iteration_counter+1) for iteration_counter, iteration_tick in zip(iterations, iteration_ticks)}
+
+        # connections of the subgraph to its inputs and outputs - the same for all iterations
+        body_inputs=[(source.port, dest.tick, dest.port) for source, dest in self.body_graph.get_out_connections(graph.START_TICK)
+                     if dest.tick != graph.FINAL_TICK] # direct connection are treated as output connections.
+        body_outputs=[source for source, _ in self.body_graph.get_in_connections(graph.FINAL_TICK)]
+
+        connections=[]
+        for iteration_counter, iteration_tick in zip(iterations, iteration_ticks):
             # connections for the inputs - 
-            iterator_port_source=graph.Endpoint(map_task_tick, "%s_%s"%(self.iterator_port,iteration_counter+1))            
-            in_connections = self._in_connections(iteration_tick, input_map, iterator_port_source)
+            iterator_port_source=graph.Endpoint(map_task_tick, self.iterator_port, iteration_counter)
+            if self.bundle_task:
+                self._add_bundle(g, iteration_tick, input_map, iterator_port_source, iteration_counter, iteration_paths[iteration_tick], collector)
+                continue
+            connections.extend(self._in_connections(iteration_tick, input_map, iterator_port_source, body_inputs))
 
             # connection for the output tuple
-            out_connections=self._out_connections(iteration_tick, reduce_tick, iteration_counter)
+            connections.extend(self._out_connections(iteration_tick, iteration_counter, body_outputs, collector))
 
-            # insert the subgraph
-            insert_subgraph(g, self.body_graph, iteration_tick)
+        if self.bundle_task:
+            return
 
-            # add connections
-            for source, dest in in_connections:
-                g.connect(source, dest)
-            for source, dest in out_connections:
-                g.connect(source, dest)
+        # insert the subgraphs of all iterations and their connections at once - with the dataflow paths extended
+        def properties(iteration_tick, t, props):
+            props['path']="%s.%s"%(iteration_paths[iteration_tick], props['path'])
+            return props
+        g.insert_subgraphs(self.body_graph, iteration_ticks, properties, connections)
 
-            addedticks=_filter_for_common_parent(g, iteration_tick)
-            for t in addedticks:                
-                parentpath_it="%s.iterations.%i"%(parentpath,iteration_counter+1)
-                _extend_dataflow_path(g, t, parentpath_it)
-            
-        self._remove_task(g, tick)
-        g.connect(reduce_task_source,reduce_out_dest)                     
 
-        
-    def _in_connections(self, iteration_tick, input_map, iterator_port_source):
+    def _in_connections(self, iteration_tick, input_map, iterator_port_source, body_inputs):
         '''
         Prepare the connections to hook up the subgraph's inputs.
+        @param body_inputs: (input port, tick, port) of the connections from the inputs within the subgraph.
         '''
-        iteration_input={k:v for k,v in input_map.iteritems()}
-        iteration_input.update({self.iterator_port : iterator_port_source})
-            
-        # connections for the inputs - 
         in_connections=[]  
-        for source, dest in self.body_graph.get_out_connections(graph.START_TICK):
-            if dest.tick == graph.FINAL_TICK:
-                continue # direct connection are treated as output connections.
-            else:
-                task_input = iteration_input[source.port]
-                subgraph_dest = graph.Endpoint(dest.tick << iteration_tick, dest.port)
-                in_connections.append((task_input, subgraph_dest))
-        
+        for port, tick, dest_port in body_inputs:
+            task_input = iterator_port_source if port == self.iterator_port else input_map[port]
+            subgraph_dest = graph.Endpoint(tick << iteration_tick, dest_port)
+            in_connections.append((task_input, subgraph_dest))
         return in_connections
                 
                 
-    def _out_connections(self, iteration_tick, collector_tick, iteration):
+    def _out_connections(self, iteration_tick, iteration, body_outputs, collector):
         out_connections=[]
-        for source,_ in self.body_graph.get_in_connections(graph.FINAL_TICK):
+        for source in body_outputs:
             out_source=graph.Endpoint(source.tick << iteration_tick, source.port)
-            out_dest=graph.Endpoint(collector_tick, "%s_%s" % (source.port, iteration+1))
+            out_dest=collector(iteration_tick, iteration, source.port)
             out_connections.append((out_source, out_dest))
         return out_connections
 
@@ -452,9 +693,211 @@ class ParallelSplitTask(AbstractTask):
         return "ParallelSplitTask(%s): \n      %s" % (self.name, self.body_graph)
         
 
-def get_ticks_by_property(graph, key, value):
+class _SplitWindow(object):
+    """
+    State of a parallel split expanded in a sliding window: only a limited number of iterations 
+    is in the graph at a time. The outputs of each iteration are connected to a collapse task
+    (see _collapseIterationTask). Once they are available, the iteration is removed from the graph
+    - its outputs and the summaries of its jobs are kept in a compact record - and the next 
+    iteration is expanded. The reduce task collects the outputs of all iterations, in the order 
+    of the list: these are appended to the list file as the iterations are collapsed and the file is 
+    sealed and uploaded by the reduce task when the last iteration has been collapsed. 
+    """
+    def __init__(self, split, size, num_splits, portnames, map_task_tick, iterations_tick, parentpath):
+        """
+        @param split: The ParallelSplitTask.
+        @param size: The maximum number of iterations in the graph at a time.
+        @param num_splits: The number of iterations.
+        @param portnames: The outputs of an iteration (ports of the FINAL_TICK in the body graph).
+        """
+        self.split=split
+        self.size=size
+        self.num_splits=num_splits
+        self.portnames=portnames
+        self.map_task_tick=map_task_tick
+        self.iterations_tick=iterations_tick
+        self.parentpath=parentpath
+        self.outputname=split.outputname
+        self.manifest=None
+        self.input_map=None
+        self.expanded=0
+        self.collapsed=0
+        self.records=[]
+        self.done=defer.Deferred()
+        # the collapse task follows the tasks of the iteration
+        if split.bundle_task:
+            self.collapse_offset=graph.START_TICK+1
+        else:
+            self.collapse_offset=max(split.body_graph.get_all_ticks())+1
+        if num_splits == 0:
+            self.done.callback(None)
+
+
+    def start(self, g, input_map):
+        """
+        Expands the first iterations.
+        @param input_map: The sources of the inputs of the split (other than the iterable) per port.
+        """
+        self.input_map=input_map
+        self._expand(g, self.size)
+
+
+    def collapse(self, g, tick, iteration, outputs):
+        """
+        Collapses the iteration with its collapse task at the given tick and expands the next one.
+        @param outputs: The outputs of the iteration per port.
+        """
+        iteration_tick=graph.START_TICK+iteration+1 << self.iterations_tick
+        removed=sorted(_collapsible_ticks(g, tick, iteration_tick))
+        jobs=[]
+        for t in removed:
+            summary=g.get_task_properties(t).get('summary')
+            if summary:
+                jobs.append((str(t), summary))
+        result=tuple(outputs[port] for port in self.portnames)
+        if self.manifest is None:
+            path=_local_outputlist_path(outputs[CONTEXT], "%s.reduce"%self.parentpath, self.outputname)
+            self.manifest=_ListManifest(path, self.num_splits)
+        self.manifest.append(iteration, result)
+        self.records.append(_IterationRecord(iteration, result, jobs))
+        for t in [tick]+removed:
+            self.split._remove_task(g, t)
+        self.collapsed+=1
+        self._expand(g, 1)
+        if self.collapsed == self.num_splits and not self.done.called:
+            self.done.callback(None)
+
+
+    def _expand(self, g, count):
+        iterations=range(self.expanded, min(self.expanded+count, self.num_splits))
+        self.expanded+=len(iterations)
+        collapse_ticks={}
+        for iteration in iterations:
+            iteration_tick=graph.START_TICK+iteration+1 << self.iterations_tick
+            collapse_tick=self.collapse_offset << iteration_tick
+            collapse_ticks[iteration_tick]=collapse_tick
+            path="%s.iterations.%i.collapse"%(self.parentpath, iteration+1)
+            g.add_task(collapse_tick, _collapseIterationTask(self, iteration), {'name':'collapse', 'path':path})
+        g.connect_all([(graph.Endpoint(START_TICK, CONTEXT), graph.Endpoint(t, CONTEXT)) for t in collapse_ticks.itervalues()])
+        collector=lambda iteration_tick, iteration, port: graph.Endpoint(collapse_ticks[iteration_tick], port)
+        self.split._add_iterations(g, self.map_task_tick, self.input_map, self.iterations_tick, iterations, self.parentpath, collector)
+
+
+class _IterationRecord(object):
+    """
+    Compact record of a collapsed iteration of a parallel split.
+    """
+    def __init__(self, iteration, outputs, jobs):
+        """
+        @param iteration: The iteration counter (starting at 0).
+        @param outputs: The tuple of outputs of the iteration.
+        @param jobs: (tick, summary) of the tasks executed in the iteration.
+        """
+        self.iteration=iteration
+        self.outputs=outputs
+        self.jobs=jobs
+
+
+def fuse_splits(upstream, downstream):
+    """
+    Fuses two parallel splits where the downstream split iterates over the output list of the upstream 
+    split and its iterations only depend on the matching element (property 'elementwise'). The body of 
+    the fused split runs the upstream body followed by the downstream body - the iteration of the 
+    downstream split starts as soon as the matching upstream iteration is done, instead of waiting for 
+    all of them. The inputs of the fused split are the inputs of the upstream split and the inputs of 
+    the downstream split - named as returned by fused_portname - except for its iterable.
+    @param upstream: The upstream ParallelSplitTask - its output list must only be used by the downstream split.
+    @param downstream: The downstream ParallelSplitTask.
+    @return: The fused ParallelSplitTask with the output list of the downstream split.
+    """
+    if upstream.bundle_task or downstream.bundle_task:
+        raise PipelineGraphError("Parallel splits %s and %s cannot be fused - bundled splits are not supported."%(upstream.name, downstream.name))
+    body=graph.Graph()
+    upstream_ticks=sorted(upstream.body_graph.get_all_ticks())
+    shift=len(upstream_ticks)+1
+    element_tick=graph.START_TICK+shift
+
+    # upstream body - its outputs compose the element of the downstream split
+    for t in upstream_ticks:
+        props=dict(upstream.body_graph.get_task_properties(t))
+        props['path']="%s.%s"%(upstream.name, props['path'])
+        body.add_task(t, upstream.body_graph.get_task(t), props)
+    element_ports=[source.port for source, _ in upstream.body_graph.get_in_connections(graph.FINAL_TICK)]
+    body.add_task(element_tick, _elementTask(element_ports, downstream.iterator_port), 
+                  {'name':'element', 'path':"%s.element"%upstream.name})
+    for t in [graph.START_TICK]+upstream_ticks:
+        for source, dest in upstream.body_graph.get_out_connections(t):
+            if dest.tick == graph.FINAL_TICK:
+                dest=graph.Endpoint(element_tick, source.port)
+            body.connect(source, dest)
+
+    # downstream body - with the ticks shifted and the inputs renamed
+    def shifted(endpoint):
+        if endpoint.tick in (graph.START_TICK, graph.FINAL_TICK):
+            return endpoint
+        return graph.Endpoint(endpoint.tick+shift, endpoint.port, endpoint.index)
+    downstream_ticks=sorted(downstream.body_graph.get_all_ticks())
+    for t in downstream_ticks:
+        props=dict(downstream.body_graph.get_task_properties(t))
+        props['path']="%s.%s"%(downstream.name, props['path'])
+        body.add_task(t+shift, downstream.body_graph.get_task(t), props)
+    for source, dest in downstream.body_graph.get_out_connections(graph.START_TICK):
+        if source.port == downstream.iterator_port:
+            source=graph.Endpoint(element_tick, source.port)
+        elif source.port != CONTEXT:
+            source=graph.Endpoint(graph.START_TICK, fused_portname(downstream, source.port))
+        body.connect(source, shifted(dest))
+    for t in downstream_ticks:
+        for source, dest in downstream.body_graph.get_out_connections(t):
+            body.connect(shifted(source), shifted(dest))
+    aliases=downstream.body_graph.get_task_properties(graph.FINAL_TICK).get('aliases')
+    if aliases is not None:
+        body.set_task_property(graph.FINAL_TICK, 'aliases', aliases)
+
+    return ParallelSplitTask(body, upstream.iterator_port, downstream.outputname, downstream.name,
+                             window=upstream.window or downstream.window)
+
+
+def fused_portname(downstream, port):
+    """
+    Returns the name of the input of the fused split (see fuse_splits) for an input of the downstream split.
+    """
+    return "%s.%s"%(downstream.name, port)
+
+
+def _collapsible_ticks(g, tick, parenttick):
+    """
+    Returns the ticks of the tasks at or below the parent tick the task at the given tick depends 
+    on - except for those that (directly or indirectly) provide inputs to other tasks as well, 
+    which may not have been executed yet.
+    """
+    descendants=set(g.get_descendant_ticks(parenttick))
+    descendants.add(parenttick)
+    ticks=set()
+    stack=[tick]
+    while stack:
+        for source, _ in g.get_in_connections(stack.pop()):
+            if source.tick in descendants and source.tick not in ticks:
+                ticks.add(source.tick)
+                stack.append(source.tick)
+    changed=True
+    while changed:
+        changed=False
+        for t in list(ticks):
+            if any(dest.tick != tick and dest.tick not in ticks for _, dest in g.get_out_connections(t)):
+                ticks.discard(t)
+                changed=True
+    return ticks
+
+
+def get_ticks_by_property(graph, key, value, parenttick=None):
+    '''
+    Returns the ticks of the tasks with the given property value - optionally only
+    those of the sub-graph inserted at the given parent tick.
+    '''
     selected_ticks=[]
-    for tick in graph.get_all_ticks():
+    ticks=graph.get_descendant_ticks(parenttick) if parenttick is not None else graph.get_all_ticks()
+    for tick in ticks:
         props=graph.get_task_properties(tick)
         if key in props.keys():
             if value == props[key]:
@@ -462,6 +905,13 @@ def get_ticks_by_property(graph, key, value):
     return selected_ticks
 
 
+def _local_outputlist_path(context, parentdir, outputlistname):
+    localdir=os.path.join(str(context[LOCALWORKDIR]), parentdir)
+    if not os.path.exists(localdir):
+        os.makedirs(localdir)
+    return os.path.join(localdir, outputlistname)
+
+
 def _dataflow_path(g, tick):    
     return g.get_task_properties(tick)['path']
 
@@ -472,12 +922,4 @@ def _extend_dataflow_path(g, tick, parentpath):
 
 
 def _filter_for_common_parent(g, parenttick):
-    ticks=[]
-    parent_depth=len(parenttick._elements)
-    for t in g.get_all_ticks():
-        depth=len(t._elements)
-        if depth>parent_depth:
-            reftick=t>>depth-parent_depth
-            if reftick==parenttick:
-                ticks.append(t)
-    return ticks
\ No newline at end of file
+    return g.get_descendant_ticks(parenttick)
\ No newline at end of file
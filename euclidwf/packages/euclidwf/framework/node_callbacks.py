@@ -5,24 +5,40 @@ Created on Apr 15, 2015
 '''
 
 import datetime
+import json
 import logging
 import os
-from twisted.internet import defer, task
+from twisted.internet import defer
 from twisted.python.failure import Failure
 from pydron.interpreter.traverser import EvalResult
 
-from euclidwf.framework.context import CONTEXT, WORKDIR, LOGDIR, CHECKSTATUS_TIME, CHECKSTATUS_TIMEOUT
-from euclidwf.framework.graph_tasks import HelperTask
+from euclidwf.framework import admission, result_cache
+from euclidwf.framework.context import CONTEXT, WORKDIR, LOGDIR, CHECKSTATUS_TIMEOUT,\
+    LOCALWORKDIR, WSROOT, TRANSPORTER
+from euclidwf.framework.critical_path import CriticalPathEstimator
+from euclidwf.framework.graph_tasks import HelperTask, BundleTask, BUNDLE_PLAN, BUNDLE_TIMING,\
+    ExecTask, ParallelSplitTask
+from euclidwf.framework.taskdefs import ComputingResources
+from euclidwf.framework.status_poller import StatusPoller, PollSchedule
 from euclidwf.utilities import cmd_executor
 from euclidwf.utilities.error_handling import ProcessingError
-from euclidwf.framework.drm_access import JOB_PENDING, JOB_ABORTED
+from euclidwf.framework.drm_access import JOB_PENDING, JOB_ABORTED, JOB_COMPLETED
 from euclidwf.utilities.exec_loader import load_executable
 
 from euclidwf.framework import drm_access, drm_access2
-DRM=drm_access
+DRM_MODULES={1:drm_access, 2:drm_access2}
 
 logger = logging.getLogger(__name__)  
 
+
+def drm_module(drmconfig):
+    '''
+    Returns the module providing the DRM access methods for the interface version (accessVersion) 
+    configured: drm_access for version 1 (one job id per status check), drm_access2 for version 2.  
+    '''
+    return DRM_MODULES[drmconfig.accessVersion]
+
+
 class NodeCallbacks(object):
     """
     This component provides callback functions for processing. The tasks are identified by :class:`Traverser` either 
@@ -31,17 +47,38 @@ class NodeCallbacks(object):
     Ready for execution means that jobs are configured and submitted to the DRM; ready for refinement means that 
     the graph is being modified for data that has become available at runtime.
     """    
-    def __init__(self, configuration, credentials, pkgdefs):
+    def __init__(self, configuration, credentials, pkgdefs, runid=None, checkpoint=None, weight=1.0):
         """
         :param configuration: Configuration which contains the the details of
            * the local cache to be used to store fetched data
            * the workspace on the HPC submission host  
+        :param runid: id of the run the jobs are submitted for - used to share the DRM 
+        fairly among runs, see :mod:`admission`. 
+        :param checkpoint: checkpoint the progress of the run is recorded in and - if 
+        the run is resumed - restored from, see :mod:`checkpoint`.
+        :param weight: share of the DRM given to the run relative to the other runs.
         """
         self._configuration = configuration
+        self._checkpoint = checkpoint
+        self._jobs = set()
+        self._runid = runid if runid is not None else id(self)
+        admission.controller.configure(configuration.drmConfig.maxJobs, configuration.drmConfig.maxJobsPerRun)
+        admission.controller.register_run(self._runid, weight)
+        self._drm = drm_module(configuration.drmConfig)
         self._drm_methods = _DRMMethods(configuration.drmConfig)
         self._cmd_executor = cmd_executor.create(configuration.drmConfig, configuration.localcache, credentials.drmUsername, credentials.drmPassword)
         self._job_queue = set()
         self._currently_running = {}
+        self._critical_path = CriticalPathEstimator()
+        self._result_cache = result_cache.create(configuration)
+        self._checksums = result_cache.get_checksum_index(configuration.localcache) if self._result_cache else None
+        self._cache_hits = 0
+        self._cache_misses = 0
+        polltime=float(configuration.drmConfig.statusCheckPollTime)
+        schedule=PollSchedule(polltime, configuration.drmConfig.statusCheckMaxDelay)
+        self._status_poller = StatusPoller(self._execute, self._drm, self._drm_methods.check_status, polltime,
+                                           self._on_status, self._on_status_failure,
+                                           configuration.drmConfig.statusCheckBatchSize, schedule=schedule)
     
     
     def _check_configuration(self):
@@ -57,7 +94,36 @@ class NodeCallbacks(object):
         :param inputs: portname, value for the refiner ports.
         """
         logger.debug("Refining task with tick %s." % tick)
-        return task.refine(g, tick, inputs)
+        input_list = None
+        if self._checkpoint and isinstance(task, ParallelSplitTask):
+            input_list = self._checkpoint.get_refined(tick)
+        if input_list is not None:
+            logger.debug("Refinement of task with tick %s restored from checkpoint." % tick)
+            task.adjust_graph(g, tick, input_list)
+            d = defer.succeed(None)
+        else:
+            d = task.refine(g, tick, inputs)
+            if self._checkpoint and isinstance(task, ParallelSplitTask):
+                d.addCallback(self._record_refined, tick)
+        if isinstance(task, ParallelSplitTask):
+            d.addCallback(self._refined, g, tick)
+        return d
+
+
+    def _record_refined(self, input_list, tick):
+        self._checkpoint.record_refined(tick, input_list)
+        return input_list
+
+
+    def _refined(self, result, g, tick):
+        """
+        Updates the critical path estimate after a parallel split has been refined - and the
+        priorities of the queued jobs affected.
+        """
+        updated = self._critical_path.update(g, tick)
+        admission.controller.update_priorities(self._runid, lambda job: self._critical_path.priority(job.tick),
+                                               lambda job: job.tick in updated)
+        return result
     
     
     def submit_task(self, g, tick, task, inputs):
@@ -73,92 +139,271 @@ class NodeCallbacks(object):
             g.set_task_property(tick, 'summary', _InPlaceExecSummary(tick, dfpath))
             return task.evaluate(g, tick, task, inputs)
         else:
-            executable = load_executable(task.command, task.package.pkgname)
+            if isinstance(task, BundleTask):
+                executable = _Bundle(task, self._configuration.drmConfig.bundleCmd)
+            else:
+                executable = load_executable(task.command, task.package.pkgname)
             job = _Job(self, g, tick, task, executable, inputs)
-            logger.debug("Job added to queue: %r" % job)
-            self._job_queue.add(job)
-            self._submit_jobs()
+            job.result.addBoth(self._job_finished, job)
+            self._jobs.add(job)
+            if not self._critical_path.has_estimate():
+                self._critical_path.update(g)
+            if self._resume(job):
+                pass
+            elif self._result_cache and isinstance(task, ExecTask):
+                d = self._fetch_cached(job)
+                d.addCallback(self._cached_or_queued, job)
+                d.addErrback(job.result.errback)
+            else:
+                self._queue(job)
             return job.result
+
+
+    def _resume(self, job):
+        '''
+        Restores the job from the checkpoint of the run: a job completed before is not 
+        submitted again, a job submitted before is just checked for its status again.
+        :returns: True if the job has been restored.
+        '''
+        if not self._checkpoint:
+            return False
+        completed = self._checkpoint.get_completed(job.tick)
+        if completed:
+            logger.info("Job %s completed before - outputs restored from checkpoint."%str(job.tick))
+            _restore_job(job, completed)
+            job.g.set_task_property(job.tick, 'summary', _JobExecSummary(job))
+            job.result.callback(self._collect_results(job))
+            return True
+        submitted = self._checkpoint.get_submitted(job.tick)
+        if submitted:
+            logger.info("Job %s submitted before with pid %s - re-attached."%(str(job.tick), submitted['pid']))
+            _restore_job(job, submitted)
+            self._queue(job)
+            return True
+        return False
+
+
+    def _record_completed(self, job):
+        if self._checkpoint:
+            self._checkpoint.record_completed(job)
+
+
+    def _queue(self, job):
+        logger.debug("Job added to queue: %r" % job)
+        self._job_queue.add(job)
+        self._submit_jobs()
+
+
+    def _fetch_cached(self, job):
+        '''
+        Computes the cache key of the job from the checksums of its inputs and links the cached
+        outputs into the workdir if available.
+        :returns: Deferred True if the outputs have been taken from the cache.
+        '''
+        context = job.inputs[CONTEXT]
+        inputs = self._create_input_dict(job)
+        ports = sorted(inputs.keys())
+        d = defer.gatherResults([self._checksum(context, inputs[port]) for port in ports], consumeErrors=True)
+
+        def fetch(checksums):
+            job.cache_key = result_cache.cache_key(job.executable, dict(zip(ports, checksums)))
+            job.outputs = self._create_output_dict(job)
+            return self._result_cache.fetch(job.cache_key, job.outputs, context, context[TRANSPORTER])
+
+        def no_checksums(reason):
+            logger.warn("Checksums of the inputs of %r not available - result cache not used: %s"%(job, reason.getErrorMessage()))
+            return False
+
+        d.addCallbacks(fetch, no_checksums)
+        return d
+
+
+    def _checksum(self, context, path):
+        '''
+        Returns the (deferred) checksum of the input product - only read if its checksum is 
+        not known for its size and modification time.
+        '''
+        remotepath = os.path.join(str(context[WSROOT]), str(context[WORKDIR]), path)
+        return self._checksums.checksum(remotepath, context[TRANSPORTER])
+
+
+    def _cached_or_queued(self, cached, job):
+        if job.result.called:
+            return # cancelled in the meantime
+        if not cached:
+            self._cache_misses += 1
+            self._queue(job)
+            return
+        logger.info("Outputs of job %s taken from the result cache."%str(job.tick))
+        self._cache_hits += 1
+        job.submit_time = job.end_time = datetime.datetime.now()
+        job.status = JOB_COMPLETED
+        job.g.set_task_property(job.tick, 'summary', _CachedExecSummary(job))
+        self._record_completed(job)
+        job.result.callback(self._collect_results(job))
+
+
+    def _store_cached(self, job):
+        '''
+        Stores the outputs of the job in the result cache.
+        :returns: Deferred fired when the outputs are available in the workdir again.
+        '''
+        if self._result_cache and getattr(job, 'cache_key', None):
+            context = job.inputs[CONTEXT]
+            return self._result_cache.store(job.cache_key, job.outputs, context, context[TRANSPORTER])
+        return defer.succeed(None)
+
+
+    def get_statistics(self):
+        '''
+        Returns statistics on the jobs of the run - the use of the result cache.
+        '''
+        if not self._result_cache:
+            return {}
+        stats = {'hits':self._cache_hits, 'misses':self._cache_misses}
+        stats['cache'] = self._result_cache.get_statistics()
+        stats['checksums'] = self._checksums.get_statistics()
+        return {'resultCache':stats}
     
     
+    def close(self):
+        """
+        Call this when the run is finished - withdraws the jobs still waiting for admission.
+        """
+        admission.controller.unregister_run(self._runid)
+
+
+    def cancel(self):
+        """
+        Cancels all jobs not yet finished - they are withdrawn from the queue and from 
+        admission. Jobs already submitted keep running on the DRM and are re-attached
+        if the run is resumed. Their status is still checked - but only to release
+        their admission slots once they have ended.
+        """
+        for job in list(self._jobs):
+            job.result.cancel()
+        self.close()
+
+
     def _submit_jobs(self):
         """
-        Call this whenever a new job is added to the queue.
+        Call this whenever a new job is added to the queue. The jobs are submitted
+        as soon as they are admitted by the admission controller - jobs on the 
+        critical path first.
         """
         to_remove=[]
         for job in self._job_queue:
-            logger.debug("Job %r submitted." %job)
-            self._submit(job)
+            job.admission=admission.controller.request(self._runid, job, self._critical_path.priority(job.tick))
+            job.admission.addCallbacks(self._admitted, _ignore_cancelled)
             to_remove.append(job)
         for job in to_remove:
             self._job_queue.remove(job)
 
 
-    def _check_status(self, job):
-        checkstatus_method=self._drm_methods.check_status
-        check_cmd=DRM.create_checkstatus_command(checkstatus_method, [job.pid])
-        d = self._cmd_executor.execute(check_cmd)
-        data=[]
-        
-        def on_executed(process):
-            process.stdout.add_callback(data.append)
-            process.stderr.add_callback(data.append)
-            return process.exited.next_event()
+    def _admitted(self, job):
+        job.admitted=True
+        if job.pid:
+            # re-attached from the checkpoint - already submitted
+            self._status_poller.add(job)
+            return
+        logger.debug("Job %r submitted." %job)
+        self._submit(job)
 
-        def on_finished(reason):
-            if reason:
-                failure = Failure(ValueError("Exception occurred while checking job status. Reason: %s \n Stdout: %s"%(reason.getTraceback(), ''.join(data))))
-                job.result.errback(failure)
-                return 
-
-            now = datetime.datetime.now()
-            istimedout = job.is_timed_out(now)
-            response=DRM.read_checkstatus_response(data)[0]
-            if not response.status:
-                failure = Failure(ValueError("Exception occurred while checking job status. No status information provided."))
-                job.result.errback(failure)
-                return
-            status= response.status if not istimedout else JOB_ABORTED
-            if DRM.wait_for_job(status):
-                job.status=status
-                return 
-
-            job.check_status_loop.stop()
-            job.end_time=now
+
+    def _job_finished(self, result, job):
+        self._jobs.discard(job)
+        if not self._status_poller.has_job(job):
+            # jobs cancelled while on the DRM keep their slot until they have ended
+            self._release(job)
+        return result
+
+
+    def _release(self, job):
+        if job.admitted:
+            job.admitted=False
+            admission.controller.release(self._runid)
+
+
+    def _execute(self, cmd):
+        return self._cmd_executor.execute(cmd)
+
+
+    def _on_status(self, job, response):
+        """
+        Handles the status response obtained for a job by the status poller.
+        """
+        if job.result.called:
+            self._on_cancelled_status(job, response)
+            return
+        now = datetime.datetime.now()
+        istimedout = job.is_timed_out(now)
+        if not response.status:
+            failure = Failure(ValueError("Exception occurred while checking job status. No status information provided."))
+            self._status_poller.remove(job)
+            job.result.errback(failure)
+            return
+        status= response.status if not istimedout else JOB_ABORTED
+        if self._drm.wait_for_job(status):
             job.status=status
-            job.g.set_task_property(job.tick, 'summary', _JobExecSummary(job))
-            if istimedout:
-                logger.info("Job %s aborted by pipeline run service due to a timeout."%str(job.tick))
-                failure=Failure(ProcessingError("Job %s aborted by pipeline run service due to a timeout."%(str(job.tick))))
-                job.result.callback(failure)
-                #return failure
-            elif DRM.job_failed(status):
-                logger.info("Job %s failed."%(str(job.tick)))
-                logger.info("STDOUT: %s \nSTDERR: %s."%(response.stdout,response.stderr))
-                failure=Failure(ProcessingError("Processing of the job %s failed with status %s. \nSTDOUT: %s \nSTDERR: %s"%(str(job.tick),status, response.stdout, response.stderr)))
-                job.result.callback(failure)
-                #return failure
-            elif DRM.job_completed(status):
-                logger.info("Job %s succeeded."%str(job.tick))
-                result=self._collect_results(job)
+            return 
+
+        self._status_poller.remove(job)
+        job.end_time=now
+        job.status=status
+        if isinstance(job.task, BundleTask):
+            summary=_BundleExecSummary(job)
+        else:
+            summary=_JobExecSummary(job)
+        job.g.set_task_property(job.tick, 'summary', summary)
+        result=None
+        d=defer.succeed(None)
+        if istimedout:
+            logger.info("Job %s aborted by pipeline run service due to a timeout."%str(job.tick))
+            result=Failure(ProcessingError("Job %s aborted by pipeline run service due to a timeout."%(str(job.tick))))
+        elif self._drm.job_failed(status):
+            logger.info("Job %s failed."%(str(job.tick)))
+            logger.info("STDOUT: %s \nSTDERR: %s."%(response.stdout,response.stderr))
+            result=Failure(ProcessingError("Processing of the job %s failed with status %s. \nSTDOUT: %s \nSTDERR: %s"%(str(job.tick),status, response.stdout, response.stderr)))
+        elif self._drm.job_completed(status):
+            logger.info("Job %s succeeded."%str(job.tick))
+            result=self._collect_results(job)
+            self._record_completed(job)
+            # the successors are started once the outputs are back in the workdir
+            d=self._store_cached(job)
+        if result is None:
+            return
+        if isinstance(summary, _BundleExecSummary) and not istimedout:
+            d.addCallback(lambda _: self._fetch_timing(job, summary))
+
+        def finished(_):
+            if not job.result.called:
                 job.result.callback(result)
-                #return result
-                
-        def on_failure(reason):
-            check_status_loop=job.check_status_loop
-            if check_status_loop.running:
-                check_status_loop.stop()
-            failure=Failure(ValueError("Exception at check_status with reason: %s \n stdout: %s"%(reason.getTraceback(), ''.join(data))))
-            job.result.errback(failure)
-        
-        d.addCallback(on_executed)
-        d.addCallback(on_finished)
-        d.addErrback(on_failure)
-        return d
+
+        d.addCallback(finished)
+
+
+    def _on_cancelled_status(self, job, response):
+        '''
+        Handles the status of a job cancelled while running on the DRM - its admission
+        slot is released as soon as it has ended.
+        '''
+        if response.status and self._drm.wait_for_job(response.status):
+            return
+        logger.info("Cancelled job %s ended with status %s."%(str(job.tick), response.status))
+        self._status_poller.remove(job)
+        self._release(job)
+
+
+    def _on_status_failure(self, job, failure):
+        if job.result.called:
+            logger.warn("Status of the cancelled job %s unknown - releasing its admission slot: %s"%(str(job.tick), failure.getErrorMessage()))
+            self._release(job)
+            return
+        job.result.errback(failure)
 
 
     def _collect_results(self, job):
-        return EvalResult(job.outputs)
+        return EvalResult({k:v for k,v in job.outputs.iteritems() if k!=BUNDLE_TIMING})
         
 
     def _create_input_dict(self, job):        
@@ -170,6 +415,8 @@ class NodeCallbacks(object):
 
     def _create_output_dict(self, job): 
         outdir=job.outdir
+        if isinstance(job.task, BundleTask):
+            return job.executable.outputs_dict(outdir)
         output_dict={}
         from_pkgdef={ o.name : o for o in job.executable.outputs }
         for outputname in job.task.outputnames:
@@ -179,15 +426,68 @@ class NodeCallbacks(object):
 
 
     def _submit(self, job):
+        if isinstance(job.task, BundleTask):
+            d=self._upload_plan(job)
+            d.addCallback(lambda planpath: self._submit_job(job, {BUNDLE_PLAN:planpath}))
+            d.addErrback(job.result.errback)
+        else:
+            self._submit_job(job)
+
+
+    def _upload_plan(self, job):
+        '''
+        Writes the plan of the steps of a bundle and uploads it to the workspace.
+        :returns: Deferred path of the plan relative to the workdir.
+        '''
+        context=job.inputs[CONTEXT]
+        relativepath=os.path.join(job.outdir, "%s.json"%BUNDLE_PLAN)
+        localpath=os.path.join(context[LOCALWORKDIR], relativepath)
+        if not os.path.exists(os.path.dirname(localpath)):
+            os.makedirs(os.path.dirname(localpath))
+        elif os.path.lexists(localpath):
+            # replaced, not truncated - the uploaded plan may be linked to it
+            os.remove(localpath)
+        with open(localpath, 'w') as planfile:
+            json.dump(job.executable.plan(self._create_input_dict(job), job.outdir), planfile, indent=2)
+        remotepath=os.path.join(str(context[WSROOT]), str(context[WORKDIR]), relativepath)
+        d=context[TRANSPORTER].upload_file(localpath, remotepath)
+        d.addCallback(lambda _: relativepath)
+        return d
+
+
+    def _fetch_timing(self, job, summary):
+        '''
+        Fetches the timing of the steps written by the bundle runner and adds it to the summary.
+        '''
+        context=job.inputs[CONTEXT]
+        relativepath=job.outputs[BUNDLE_TIMING]
+        localpath=os.path.join(context[LOCALWORKDIR], relativepath)
+        remotepath=os.path.join(str(context[WSROOT]), str(context[WORKDIR]), relativepath)
+        d=context[TRANSPORTER].fetch_file(remotepath, localpath)
+
+        def fetched(_):
+            with open(localpath, 'r') as timingfile:
+                summary.steps=json.load(timingfile)['steps']
+
+        def not_fetched(reason):
+            logger.warn("No timing available for the steps of bundle %s: %s"%(str(job.tick), reason.getErrorMessage()))
+
+        d.addCallback(fetched)
+        d.addErrback(not_fetched)
+        return d
+
+
+    def _submit_job(self, job, extra_inputs={}):
         submit_method=self._drm_methods.submit
         context=job.inputs[CONTEXT]
         inputs=self._create_input_dict(job)
+        inputs.update(extra_inputs)
         outputs=self._create_output_dict(job)
         workdir=context[WORKDIR]
         logdir=os.path.join(context[LOGDIR],job.outdir)
         job.outputs=outputs
-        command=job.task.command
-        submit_cmd=DRM.create_submit_command(submit_method, 
+        command=job.executable.command
+        submit_cmd=self._drm.create_submit_command(submit_method, 
                                              command, 
                                              inputs, 
                                              outputs, 
@@ -210,13 +510,15 @@ class NodeCallbacks(object):
             if reason:
                 return Failure(ValueError("Exception occurred while submitting job. Reason: %s \ Stdout: %s"%(reason.getTraceback(), ''.join(data))))
             else:
-                response = DRM.read_submit_response(data)
+                response = self._drm.read_submit_response(data)
                 if not response.jobid:
                     return Failure(ValueError("pid of the submitted task could not be resolved from the stdout.\nStdout: %s"%''.join(data)))
                 job.pid=response.jobid
-                check_status_loop=task.LoopingCall(self._check_status, job)
-                job.check_status_loop=check_status_loop
-                return check_status_loop.start(context[CHECKSTATUS_TIME], True)
+                if self._checkpoint:
+                    self._checkpoint.record_submitted(job)
+                if job.result.called:
+                    return # cancelled while being submitted
+                self._status_poller.add(job)
 
         def on_failure(reason):
             failure = Failure(ValueError("Exception at submit with reason: %s \n stdout: %s"%(reason.getTraceback(), ''.join(data))))
@@ -231,9 +533,12 @@ class NodeCallbacks(object):
     def _cancel_job(self, job):
         if job in self._job_queue:
             self._job_queue.remove(job)
+        elif job.admission and not job.admission.called:
+            job.admission.cancel()
         elif job in self._currently_running:
             self._currently_running[job].cancel()
             del self._currently_running[job]
+        # a job on the DRM is still polled - until it has ended, see _on_cancelled_status
        
        
 class _Job(object):
@@ -252,6 +557,9 @@ class _Job(object):
         self.timeout = inputs[CONTEXT][CHECKSTATUS_TIMEOUT]*executable.resources.walltime*3600
         self.status = JOB_PENDING
         self.pid = None
+        self.admission = None
+        self.admitted = False
+        self.cache_key = None
         
     def _cancel(self, d):
         self.callbacks._cancel_job(self)
@@ -268,6 +576,61 @@ class _Job(object):
         
 
 
+class _Bundle(object):
+    '''
+    Describes a bundle like an executable - the command is the bundle runner and the 
+    resources requested cover all steps executed one after the other.
+    '''
+    def __init__(self, task, command):
+        self.task=task
+        self.command=command
+        self.steps=[]
+        for tick in task.steps():
+            step=task.body_graph.get_task(tick)
+            path=task.body_graph.get_task_properties(tick)['path']
+            self.steps.append((tick, path, step, load_executable(step.command, step.package.pkgname)))
+        resources=[executable.resources for _, _, _, executable in self.steps]
+        self.resources=ComputingResources(max(r.cores for r in resources), max(r.ram for r in resources), 
+                                          sum(r.walltime for r in resources))
+
+    def step_outputs(self, outdir):
+        '''
+        Returns per step the output paths - within the directory of the step as if submitted on its own.
+        '''
+        step_outputs={}
+        for tick, path, step, executable in self.steps:
+            mime_types={o.name : o.mime_type for o in executable.outputs}
+            stepdir="%s.%s"%(outdir, path)
+            step_outputs[tick]={name : "%s.%s"%(os.path.join(stepdir, name), mime_types[name]) for name in step.outputnames}
+        return step_outputs
+
+    def outputs_dict(self, outdir):
+        step_outputs=self.step_outputs(outdir)
+        outputs={port : step_outputs[source.tick][source.port] for port, source in self.task.output_sources().iteritems()}
+        outputs[BUNDLE_TIMING]=os.path.join(outdir, "%s.json"%BUNDLE_TIMING)
+        return outputs
+
+    def plan(self, inputs, outdir):
+        '''
+        Returns the plan for the bundle runner: the steps with their command and the paths 
+        of their inputs and outputs - relative to the workdir.
+        '''
+        step_outputs=self.step_outputs(outdir)
+        steps=[]
+        for tick, path, step, _ in self.steps:
+            step_inputs={}
+            for port, source in self.task.step_inputs(tick).iteritems():
+                if source.tick in step_outputs:
+                    step_inputs[port]=step_outputs[source.tick][source.port]
+                else:
+                    step_inputs[port]=inputs[source.port]
+            steps.append({'name':path, 'command':step.command, 'inputs':step_inputs, 'outputs':step_outputs[tick]})
+        return {'steps':steps}
+
+    def __repr__(self):
+        return "Bundle(%s: %s)"%(self.task.name, ', '.join(path for _, path, _, _ in self.steps))
+
+
 class _JobExecSummary(object):
     def __init__(self, job):
         self.tick = job.tick
@@ -283,6 +646,18 @@ class _JobExecSummary(object):
         self.lapse_time = get_timediff(job.submit_time,job.end_time)
 
 
+class _CachedExecSummary(_JobExecSummary):
+    def __init__(self, job):
+        super(_CachedExecSummary, self).__init__(job)
+        self.cached = True
+
+
+class _BundleExecSummary(_JobExecSummary):
+    def __init__(self, job):
+        super(_BundleExecSummary, self).__init__(job)
+        self.steps = None
+
+
 class _InPlaceExecSummary(object):
     def __init__(self, tick, path):
         self.tick = tick
@@ -294,6 +669,18 @@ class _InPlaceExecSummary(object):
         self.lapse_time = None
         
 
+def _restore_job(job, entry):
+    job.pid = entry['pid']
+    job.outputs = entry['outputs']
+    job.submit_time = entry.get('submit_time')
+    job.end_time = entry.get('end_time')
+    job.status = entry.get('status', JOB_PENDING)
+
+
+def _ignore_cancelled(reason):
+    reason.trap(defer.CancelledError)
+
+
 def get_timediff(dt1, dt2):
     return (dt2-dt1).total_seconds()
 
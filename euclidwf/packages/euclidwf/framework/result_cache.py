@@ -0,0 +1,352 @@
+'''
+Content-addressed cache for the outputs of executed tasks.
+
+The key of a cache entry is computed from the command of the executable, the version
+of its package definition (the checksum of the package definition file), the resources
+requested and the checksums of the contents of all input products. Hence, a task that
+is invoked again with the same inputs - e.g. when a pipeline is run again after a
+failure or after a change further down the dataflow - is not submitted to the DRM:
+the outputs stored in the cache are linked into the workdir of the new run instead.
+
+The outputs are stored in a directory in the workspace (one sub-directory per entry):
+they are moved there from the workdir of the run that has produced them and linked back
+into it. Hence, the cache does not depend on the workdirs - they may be cleaned - and
+evicting an entry frees the space of its outputs (the links to them in the workdirs of
+earlier runs are left dangling). The index of the entries is kept in the local cache of
+the server. Entries are evicted least recently used first as soon as the number of
+entries or the size of the outputs exceeds the limits configured.
+
+The checksums of the input products are kept in an index as well - by path, together
+with the size and the modification time of the product (and its inode and change time
+if the transporter provides them). A product is only read to compute its checksum if
+it is not known yet or has changed.
+'''
+import collections
+import hashlib
+import json
+import logging
+import os
+
+from twisted.internet import defer
+
+from euclidwf.framework.context import WSROOT, WORKDIR
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE='result_cache.json'
+CHECKSUMS_FILE='checksums.jsonl'
+DEFAULT_MAX_ENTRIES=10000
+
+
+def create(configuration):
+    '''
+    Returns the result cache configured for the workspace - None if no cache is configured.
+    '''
+    wsConfig=configuration.wsConfig
+    if not wsConfig.resultCacheDir:
+        return None
+    indexpath=os.path.join(configuration.localcache, INDEX_FILE)
+    cache=get_cache(indexpath, wsConfig.resultCacheDir)
+    cache.configure(wsConfig.resultCacheMaxEntries, wsConfig.resultCacheMaxBytes)
+    return cache
+
+
+_caches={}
+
+def get_cache(indexpath, cachedir):
+    '''
+    Returns the cache for the given index - shared by all runs of the server process.
+    '''
+    key=(indexpath, cachedir)
+    if key not in _caches:
+        _caches[key]=ResultCache(indexpath, cachedir)
+    return _caches[key]
+
+
+_checksum_indexes={}
+
+def get_checksum_index(localcache):
+    '''
+    Returns the index of the checksums of the products - shared by all runs of the server process.
+    '''
+    indexpath=os.path.join(localcache, CHECKSUMS_FILE)
+    if indexpath not in _checksum_indexes:
+        _checksum_indexes[indexpath]=ChecksumIndex(indexpath)
+    return _checksum_indexes[indexpath]
+
+
+def package_version(executable):
+    '''
+    Returns the checksum of the package definition file of the executable - or the
+    package name if the file is not available.
+    '''
+    pkgfile=getattr(executable, 'pkgfile', None)
+    if pkgfile and os.path.isfile(pkgfile):
+        with open(pkgfile, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+    return getattr(executable, 'pkgname', None)
+
+
+def cache_key(executable, checksums):
+    '''
+    Computes the key for invoking the executable with inputs of the given checksums.
+    :param checksums: dictionary with the checksum of the content per input port.
+    '''
+    resources=executable.resources
+    fingerprint=[executable.command, package_version(executable),
+                 [resources.cores, resources.ram, resources.walltime],
+                 sorted(checksums.iteritems())]
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True)).hexdigest()
+
+
+class ResultCache(object):
+    """
+    Index of the cached outputs - least recently used entries first.
+    """
+
+    def __init__(self, indexpath, cachedir, max_entries=None, max_bytes=None):
+        '''
+        :param indexpath: local path of the file the index is stored in.
+        :param cachedir: directory of the cached outputs - relative to the workspace root.
+        :param max_entries: maximum number of entries.
+        :param max_bytes: maximum size of all outputs in the cache - None for no limit.
+        '''
+        self.indexpath=indexpath
+        self.cachedir=cachedir
+        self.max_entries=max_entries or DEFAULT_MAX_ENTRIES
+        self.max_bytes=max_bytes
+        self.hits=0
+        self.misses=0
+        self.stores=0
+        self.store_failures=0
+        self.evictions=0
+        self._entries=collections.OrderedDict()
+        self._load()
+
+
+    def configure(self, max_entries=None, max_bytes=None):
+        self.max_entries=max_entries or DEFAULT_MAX_ENTRIES
+        self.max_bytes=max_bytes
+
+
+    def size(self):
+        return sum(entry['size'] for entry in self._entries.itervalues())
+
+
+    def has_entry(self, key):
+        return key in self._entries
+
+
+    def fetch(self, key, outputs, context, transporter):
+        '''
+        Links the cached outputs for the key to the given paths.
+        :param outputs: dictionary with the path (relative to the workdir) per output port.
+        :returns: Deferred True on a hit, False on a miss.
+        '''
+        entry=self._entries.get(key)
+        if entry is None or set(entry['outputs'].keys())!=set(outputs.keys()):
+            self.misses+=1
+            return defer.succeed(False)
+        deferreds=[transporter.link_file(self._abspath(context, entry['outputs'][port]), _workdir_path(context, path))
+                   for port, path in outputs.iteritems()]
+        d=defer.gatherResults(deferreds, consumeErrors=True)
+
+        def linked(_):
+            self.hits+=1
+            self._entries[key]=self._entries.pop(key)
+            self._save()
+            return True
+
+        def not_linked(reason):
+            logger.warn("Cached outputs for %s not available - entry removed: %s"%(key, reason.getErrorMessage()))
+            self.misses+=1
+            self._entries.pop(key, None)
+            self._save()
+            return False
+
+        d.addCallbacks(linked, not_linked)
+        return d
+
+
+    def store(self, key, outputs, context, transporter):
+        '''
+        Stores the outputs (paths relative to the workdir, per output port) for the key.
+        :returns: Deferred fired when the outputs have been stored.
+        '''
+        cached={port: os.path.join(self.cachedir, key, os.path.basename(path)) for port, path in outputs.iteritems()}
+        deferreds=[self._store_output(_workdir_path(context, outputs[port]), self._abspath(context, cached[port]), transporter)
+                   for port in outputs.keys()]
+        d=defer.gatherResults(deferreds, consumeErrors=True)
+
+        def stored(sizes):
+            self.stores+=1
+            self._entries.pop(key, None)
+            self._entries[key]={'outputs':cached, 'size':sum(sizes)}
+            evicted=self._evict()
+            self._save()
+            return self._remove(evicted, context, transporter)
+
+        def not_stored(reason):
+            # the run goes on without the entry - but the failure is not to go unnoticed
+            if reason.check(defer.FirstError):
+                reason=reason.value.subFailure
+            self.store_failures+=1
+            logger.warn("Outputs for %s could not be stored in the result cache: %s"%(key, reason.getErrorMessage()))
+
+        d.addCallback(stored)
+        d.addErrback(not_stored)
+        return d
+
+
+    def _store_output(self, workpath, cachepath, transporter):
+        '''
+        Moves the output into the cache and links it back into the workdir.
+        :returns: Deferred size of the output.
+        '''
+        d=transporter.move_file(workpath, cachepath)
+
+        def moved(_):
+            d=transporter.link_file(cachepath, workpath)
+            d.addErrback(not_linked)
+            return d
+
+        def not_linked(reason):
+            # the output must stay available in the workdir
+            d=transporter.move_file(cachepath, workpath)
+            d.addCallback(lambda _: reason)
+            return d
+
+        d.addCallback(moved)
+        return d
+
+
+    def _evict(self):
+        evicted=[]
+        while self._entries and (len(self._entries)>self.max_entries or
+                                 (self.max_bytes is not None and self.size()>self.max_bytes)):
+            _, entry=self._entries.popitem(last=False)
+            evicted.append(entry)
+            self.evictions+=1
+        return evicted
+
+
+    def _remove(self, entries, context, transporter):
+        deferreds=[]
+        for entry in entries:
+            for path in entry['outputs'].itervalues():
+                d=transporter.remove_file(self._abspath(context, path))
+                d.addErrback(lambda reason: logger.warn("Cached output not removed: %s"%reason.getErrorMessage()))
+                deferreds.append(d)
+        return defer.gatherResults(deferreds)
+
+
+    def _abspath(self, context, path):
+        return os.path.join(str(context[WSROOT]), path)
+
+
+    def _load(self):
+        if not os.path.exists(self.indexpath):
+            return
+        try:
+            with open(self.indexpath, 'r') as f:
+                entries=json.load(f)
+            self._entries=collections.OrderedDict((str(key), entry) for key, entry in entries)
+        except:
+            logger.warn("Index of the result cache %s could not be loaded - starting with an empty cache."%self.indexpath)
+
+
+    def _save(self):
+        parentdir=os.path.dirname(self.indexpath)
+        if parentdir and not os.path.exists(parentdir):
+            os.makedirs(parentdir)
+        tmppath=self.indexpath+".tmp"
+        with open(tmppath, 'w') as f:
+            json.dump(self._entries.items(), f)
+        os.rename(tmppath, self.indexpath)
+
+
+    def get_statistics(self):
+        return {'entries':len(self._entries), 'bytes':self.size(), 'hits':self.hits, 'misses':self.misses,
+                'stores':self.stores, 'store_failures':self.store_failures, 'evictions':self.evictions}
+
+
+def _workdir_path(context, path):
+    return os.path.join(str(context[WSROOT]), str(context[WORKDIR]), path)
+
+
+class ChecksumIndex(object):
+    """
+    Checksums of the products in the workspace by path - a checksum is valid as long as the
+    stamp of the product returned by the transporter (size, modification time and - if
+    available - inode and change time) is unchanged. New checksums are appended to the
+    index file.
+    """
+
+    def __init__(self, indexpath):
+        self.indexpath=indexpath
+        self.hits=0
+        self.computed=0
+        self._entries={}
+        self._load()
+
+
+    def checksum(self, path, transporter):
+        '''
+        Returns the (deferred) checksum of the product - computed only if not known for its
+        stamp.
+        '''
+        d=transporter.stat(path)
+
+        def stated(stamp):
+            entry=self._entries.get(path)
+            if entry is not None and entry[:-1]==list(stamp):
+                self.hits+=1
+                return entry[-1]
+            d=transporter.checksum(path)
+            d.addCallback(computed, stamp)
+            return d
+
+        def computed(md5, stamp):
+            self.computed+=1
+            self._entries[path]=list(stamp)+[md5]
+            self._append(path, self._entries[path])
+            return md5
+
+        d.addCallback(stated)
+        return d
+
+
+    def _load(self):
+        if not os.path.exists(self.indexpath):
+            return
+        lines=0
+        try:
+            with open(self.indexpath, 'r') as f:
+                for line in f:
+                    path, entry=json.loads(line)
+                    self._entries[str(path)]=entry
+                    lines+=1
+        except:
+            logger.warn("Index of the checksums %s could not be loaded completely."%self.indexpath)
+        if lines>2*len(self._entries):
+            self._compact()
+
+
+    def _compact(self):
+        tmppath=self.indexpath+".tmp"
+        with open(tmppath, 'w') as f:
+            for path, entry in self._entries.iteritems():
+                f.write(json.dumps([path, entry])+"\n")
+        os.rename(tmppath, self.indexpath)
+
+
+    def _append(self, path, entry):
+        parentdir=os.path.dirname(self.indexpath)
+        if parentdir and not os.path.exists(parentdir):
+            os.makedirs(parentdir)
+        with open(self.indexpath, 'a') as f:
+            f.write(json.dumps([path, entry])+"\n")
+
+
+    def get_statistics(self):
+        return {'checksums':len(self._entries), 'hits':self.hits, 'computed':self.computed}
@@ -10,16 +10,18 @@ import os
 import sys
 import traceback
 
+from twisted.internet import defer
 from pydron.dataflow import graph
 from pydron.interpreter.traverser import Traverser
 
-from euclidwf.framework import context
-from euclidwf.framework.context import CONTEXT, serializable, WORKDIR, LOGDIR
+from euclidwf.framework import context, checkpoint
+from euclidwf.framework.context import CONTEXT, serializable, WORKDIR, LOGDIR, TRANSPORTER
 from euclidwf.framework.graph_builder import build_graph
 from euclidwf.framework.node_callbacks import NodeCallbacks
 from euclidwf.framework.workflow_dsl import load_pipeline_from_file
 from euclidwf.utilities.error_handling import PipelineFrameworkError
-from euclidwf.server.server_model import JobStatus, PipelineTaskRun, RunOutput
+from euclidwf.server.server_model import JobStatus, PipelineTaskRun, RunOutput,\
+    PIPELINE_SCRIPT, PIPELINE_DIR, PKG_REPOSITORY, INPUTDATA_PATHS, RUN_WEIGHT
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -34,6 +36,7 @@ REPORT='report'
 INPUTS='inputs'
 OUTPUTS='outputs'
 ERRORLOG='errlog'
+STATISTICS='statistics'
 
 EXECSTATUS_PENDING = 'PENDING'
 EXECSTATUS_EXECUTING = 'EXECUTING'
@@ -46,8 +49,9 @@ class PipelineExecution():
     Object to keep a reference to all information needed to perform a pipeline run,
     to launch and check status of the pipeline run and to inspect the reports on the results.
     """
-    def __init__(self, runConfig, config, status=EXECSTATUS_PENDING):        
+    def __init__(self, runConfig, config, status=EXECSTATUS_PENDING, resume=False):        
         self.config=config
+        self.resume=resume # if set, the run is resumed from its checkpoint
         self.credentials=runConfig.credentials # object of type RunServerConfiguration
         self.runid=runConfig.runid
         self.pipelineScript=runConfig.pipelineScript
@@ -57,12 +61,15 @@ class PipelineExecution():
         self.workdir=runConfig.workdir
         self.logdir=runConfig.logdir
         self.data=runConfig.inputDataPaths        
+        self.weight=runConfig.weight # share of the DRM relative to other runs
         self.status=status
         self.pipeline=None # will be set as the (top-level) function that defines the pipeline
         self.dataflow=None # will become the (static) dataflow graph representing the pipeline processing 
         self.outputs=None # will become a map providing the output portnames as keys and the paths to the ouput product files as values
         self.report=None
         self.stacktrace=None
+        self.checkpoint=None
+        self.execution=None # deferred fired when the traversal of the graph has finished
         self.created=datetime.datetime.now()
         
         
@@ -70,8 +77,8 @@ class PipelineExecution():
         '''
         First, configures PYTHONPATH so that the pipeline specification can be parsed.
         Then, loads pipeline and creates the design time graph.
-        Finally, it prepares all for executing the pipeline by creating a runtime context
-        and instantiating a graph traverser. 
+        Finally, it prepares all for executing the pipeline by creating a runtime context, 
+        the checkpoint of the run and instantiating a graph traverser. 
         '''
         add_to_path([self.pkgRepository, self.pipelineDir])
         self.pipeline=load_pipeline_from_file(self.path_to_script)
@@ -79,20 +86,25 @@ class PipelineExecution():
         # build the design time dataflow graph
         self.dataflow = build_graph(self.pipeline)   
         
+        # the checkpoint the progress is recorded in - or restored from when resumed
+        self.checkpoint=checkpoint.create(self.config, self.runid, self.rundata(), self.resume)
+        
         # initialize the context
         self.data[CONTEXT]=context.create_context(self)
         
         # instantiate the traverser
-        self.callbacks=NodeCallbacks(self.config, self.credentials, self.pkgRepository)
+        self.callbacks=NodeCallbacks(self.config, self.credentials, self.pkgRepository, self.runid, self.checkpoint, self.weight)
         self.traverser=Traverser(self.callbacks.schedule_refinement, self.callbacks.submit_task)
 
                 
     def start(self):
         self.status=EXECSTATUS_EXECUTING
-        d = self.traverser.execute(self.dataflow, self.data)
+        d = self.execution = self.traverser.execute(self.dataflow, self.data)
             
         def finalize(outputs):
+            self.callbacks.close()
             self.status=EXECSTATUS_COMPLETED
+            self.checkpoint.record_finished(self.status)
             aliases=self.dataflow.get_task_properties(graph.FINAL_TICK)['aliases']
             self.outputs={}
             for _name,_alias in aliases.iteritems():
@@ -100,7 +112,9 @@ class PipelineExecution():
             self.report=summary(self.traverser.get_graph())
             
         def failed(reason):
-            self.status=EXECSTATUS_ERROR
+            self.callbacks.close()
+            self.status=EXECSTATUS_ABORTED if reason.check(defer.CancelledError) else EXECSTATUS_ERROR
+            self.checkpoint.record_finished(self.status)
             self.report=summary(self.traverser.get_graph())
             self.stacktrace=reason.getTraceback()
     
@@ -114,14 +128,37 @@ class PipelineExecution():
     
    
     def cancel(self):
-        raise NotImplementedError("Cancel method not yet implemented.")
+        '''
+        Cancels the run - the jobs not yet finished are no longer waited for. The progress
+        made so far is kept in the checkpoint of the run.
+        '''
+        if self.execution and not self.execution.called:
+            self.execution.cancel()
+        if getattr(self, 'callbacks', None):
+            self.callbacks.cancel()
+        self.status=EXECSTATUS_ABORTED
 
 
     def reset(self): 
+        '''
+        Cancels the run and starts it again - resumed from its checkpoint, i.e. only the
+        work not yet done is scheduled again.
+        '''
         self.cancel()
+        self.resume=True
         self.initialize()
         self.start()
 
+
+    def rundata(self):
+        '''
+        Returns the configuration of the run - without the credentials.
+        '''
+        return {RUNID:self.runid, WORKDIR:self.workdir, LOGDIR:self.logdir, 
+                PIPELINE_SCRIPT:self.pipelineScript, PIPELINE_DIR:self.pipelineDir,
+                PKG_REPOSITORY:self.pkgRepository, RUN_WEIGHT:self.weight,
+                INPUTDATA_PATHS:{k:v for k,v in self.data.iteritems() if k != CONTEXT}}
+
            
     def todict(self):
         try:
@@ -146,6 +183,9 @@ class PipelineExecution():
                 _dict[OUTPUTS]=self.outputs
             if self.stacktrace:
                 _dict[ERRORLOG]=self.stacktrace
+            statistics=self.get_statistics()
+            if statistics:
+                _dict[STATISTICS]=statistics
             return _dict
         except:
             _, _, exc_traceback = sys.exc_info()
@@ -166,6 +206,8 @@ class PipelineExecution():
                     jobs.append(JobStatus(str(tick), props['summary'].status))
                 except:
                     pass
+            for record in props.get('collapsed', []):
+                jobs.extend(JobStatus(jobtick, jobsummary.status) for jobtick, jobsummary in record.jobs)
         return jobs
     
     def get_task_runs(self):
@@ -193,6 +235,20 @@ class PipelineExecution():
             return None
 
 
+
+    def get_statistics(self):
+        '''
+        Returns statistics collected while executing the run - e.g. on the file transfers.
+        '''
+        statistics={}
+        if self.data and CONTEXT in self.data.keys() and TRANSPORTER in self.data[CONTEXT]:
+            transfers=self.data[CONTEXT][TRANSPORTER].get_statistics()
+            if transfers:
+                statistics['transfers']=transfers
+        if getattr(self, 'callbacks', None):
+            statistics.update(self.callbacks.get_statistics())
+        return statistics
+
     
     @classmethod
     def fromdict(cls, _dict):
@@ -229,19 +285,33 @@ def add_to_path(locations):
 
 
 def summary(graph):
-    return [summary_entries(tick, graph) for tick in sorted(graph.get_all_ticks())]
+    entries=[]
+    for tick in sorted(graph.get_all_ticks()):
+        entries.append(summary_entries(tick, graph))
+        # the jobs of the iterations of a parallel split already collapsed
+        for record in graph.get_task_properties(tick).get('collapsed', []):
+            entries.extend(_summary_entries(jobtick, jobsummary) for jobtick, jobsummary in record.jobs if jobsummary.workdir)
+    return entries
 
         
 def summary_entries(tick, graph):
     props = graph.get_task_properties(tick)
     if 'summary' in props.keys() and props['summary'].workdir:
-        summary=props['summary']
-        path=summary.dfpath
-        status=summary.status
-        time=summary.lapse_time
-        pid=summary.pid
-        wd=os.path.join(summary.workdir,path)
-        return { 'tick': str(tick), 'path':path, 'pid':pid, 'status':status, 'time':time, 'workdir':wd }
+        return _summary_entries(str(tick), props['summary'])
     else:
         return { 'tick': str(tick), 'path':props['path'], 'pid':'n/a', 'status':'n/a', 'time':0.0, 'workdir':'n/a' }
+
+
+def _summary_entries(tick, summary):
+    path=summary.dfpath
+    status=summary.status
+    time=summary.lapse_time
+    pid=summary.pid
+    wd=os.path.join(summary.workdir,path)
+    entries={ 'tick': tick, 'path':path, 'pid':pid, 'status':status, 'time':time, 'workdir':wd }
+    if getattr(summary, 'steps', None):
+        entries['steps']=summary.steps
+    if getattr(summary, 'cached', False):
+        entries['cached']=True
+    return entries
         
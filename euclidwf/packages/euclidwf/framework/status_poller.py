@@ -0,0 +1,276 @@
+'''
+Polls the DRM for the status of all jobs submitted by a :class:`NodeCallbacks` instance.
+
+Rather than running one check status command per job and poll period, a single
+poller keeps track of all jobs in flight and checks them together - with one
+check status command per poll period and batch of job ids. The responses are
+then dispatched to the handlers registered for the individual jobs.
+
+Not every job is checked with every poll: a :class:`PollSchedule` determines for
+each job when its status is due to be checked again - backing off while the job
+is waiting in the queue and adapting to the walltime requested by the job while
+it is executing. The delay never exceeds a maximum, which bounds the time until the
+end of a job is noticed.
+'''
+import collections
+import logging
+
+from twisted.internet import defer, task
+from twisted.python.failure import Failure
+
+from euclidwf.server.server_model import JOB_PENDING, JOB_QUEUED, JOB_HELD,\
+    JOB_SUSPENDED, JOB_EXECUTING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_JOBIDS=500
+DEFAULT_MAX_DELAY_FACTOR=10
+QUEUED_STATES=[JOB_PENDING, JOB_QUEUED, JOB_HELD, JOB_SUSPENDED]
+
+
+class PollSchedule(object):
+    """
+    Determines the delay until the status of a job is checked the next time.
+
+    * While the job is waiting (pending, queued, held or suspended), the delay is
+      doubled with every check, starting from the poll time.
+    * While the job is executing, the delay is a fraction of the time remaining
+      until the expected end of the job - given by the requested walltime.
+      Hence, long jobs are checked less frequently, and checks become more
+      frequent as the job approaches its expected end.
+    * The delay is never shorter than the poll time and never longer than
+      `max_delay`, which bounds the time until the end of a job is noticed.
+    """
+
+    def __init__(self, polltime, max_delay=None, backoff=2.0, remaining_fraction=0.25):
+        self.polltime=polltime
+        self.max_delay=max_delay if max_delay else DEFAULT_MAX_DELAY_FACTOR*polltime
+        self.backoff=backoff
+        self.remaining_fraction=remaining_fraction
+
+
+    def next_delay(self, state, now):
+        if state.status in QUEUED_STATES:
+            delay=self.polltime*self.backoff**state.waiting_checks
+        elif state.status==JOB_EXECUTING and state.walltime:
+            remaining=state.executing_since+state.walltime-now
+            delay=remaining*self.remaining_fraction
+        else:
+            delay=self.polltime
+        return max(self.polltime, min(delay, self.max_delay))
+
+
+class _PollState(object):
+    """
+    Keeps track of the polling of a single job.
+    """
+
+    def __init__(self, job, now):
+        self.job=job
+        self.due=now
+        self.status=None
+        self.waiting_checks=0
+        self.executing_since=None
+        self.walltime=_walltime(job)
+
+
+    def update(self, status, now):
+        if status in QUEUED_STATES:
+            self.waiting_checks+=1
+        elif status==JOB_EXECUTING and self.executing_since is None:
+            # the job has started at most one delay earlier - which is bounded by max_delay
+            self.executing_since=now
+        self.status=status
+
+
+class StatusPoller(object):
+    """
+    Keeps track of the jobs in flight and periodically checks their status with
+    batched check status commands.
+
+    For each job the status response is handed over to `on_status(job, response)`.
+    If a check status command fails, `on_failure(job, failure)` is called for each
+    of the jobs included in the command and the jobs are no longer polled.
+    Jobs for which a final status has been received need to be removed by the
+    handler with :meth:`remove`.
+
+    The poller wakes up every `polltime` seconds but only checks the jobs that
+    are due according to the `schedule`.
+    """
+
+    def __init__(self, execute, drm, checkstatus_cmd, polltime, on_status, on_failure,
+                 max_jobids=DEFAULT_MAX_JOBIDS, clock=None, schedule=None):
+        """
+        :param execute: callable invoking a command - see :meth:`AbstractCmdExecutor.execute`.
+        :param drm: module providing the DRM access methods (drm_access or drm_access2).
+        :param checkstatus_cmd: name of the check status command implemented by the DRM.
+        :param polltime: time in seconds between two subsequent polls.
+        :param on_status: called with the job and its CheckStatusResponse.
+        :param on_failure: called with the job and a Failure if the status could not be checked.
+        :param max_jobids: maximum number of job ids passed to a single check status command.
+        The limit given by the DRM access module (CHECKSTATUS_MAX_JOBIDS) is respected as well.
+        :param clock: provider of callLater and seconds - the reactor by default.
+        :param schedule: the :class:`PollSchedule` to apply - by default, a schedule
+        using the poll time as minimal delay.
+        """
+        self.execute=execute
+        self.drm=drm
+        self.checkstatus_cmd=checkstatus_cmd
+        self.polltime=polltime
+        self.max_jobids=_max_jobids(drm, max_jobids)
+        self._on_status=on_status
+        self._on_failure=on_failure
+        self.schedule=schedule if schedule else PollSchedule(polltime)
+        self._jobs=collections.OrderedDict()
+        self._loop=task.LoopingCall(self.poll)
+        if clock:
+            self._loop.clock=clock
+        self._clock=self._loop.clock
+
+
+    def add(self, job):
+        """
+        Starts polling the status of the given job - the job must have its pid set.
+        If no other job is polled at the moment, the status is checked immediately.
+        """
+        self._jobs[job.pid]=_PollState(job, self._clock.seconds())
+        if not self._loop.running:
+            d=self._loop.start(self.polltime, True)
+            d.addErrback(self._on_loop_failure)
+
+
+    def remove(self, job):
+        """
+        Stops polling the status of the given job.
+        """
+        if job.pid in self._jobs:
+            del self._jobs[job.pid]
+
+
+    def has_job(self, job):
+        return job.pid in self._jobs and self._jobs[job.pid].job is job
+
+
+    def get_jobs(self):
+        return [state.job for state in self._jobs.itervalues()]
+
+
+    def get_due(self, job):
+        """
+        Returns the time (in seconds as given by the clock) at which the status
+        of the job is checked next.
+        """
+        return self._jobs[job.pid].due
+
+
+    def poll(self):
+        """
+        Checks the status of all registered jobs that are due - by issuing one check
+        status command per batch of at most `max_jobids` jobs.
+        """
+        # jobs due before the next wake-up are checked now already
+        horizon=self._clock.seconds()+0.5*self.polltime
+        jobs=[state.job for state in self._jobs.itervalues() if state.due<horizon]
+        deferreds=[self._check_batch(batch) for batch in _batches(jobs, self.max_jobids)]
+        d=defer.DeferredList(deferreds)
+        d.addCallback(self._on_polled)
+        return d
+
+
+    def _on_polled(self, _):
+        if not self._jobs and self._loop.running:
+            self._loop.stop()
+
+
+    def _on_loop_failure(self, reason):
+        logger.error("Status polling stopped unexpectedly: %s"%reason.getTraceback())
+
+
+    def _check_batch(self, batch):
+        check_cmd=self.drm.create_checkstatus_command(self.checkstatus_cmd, [job.pid for job in batch])
+        logger.debug("Checking status of %i job(s)."%len(batch))
+        d = self.execute(check_cmd)
+        data=[]
+
+        def on_executed(process):
+            process.stdout.add_callback(data.append)
+            process.stderr.add_callback(data.append)
+            return process.exited.next_event()
+
+        def on_finished(reason):
+            if reason:
+                failure = Failure(ValueError("Exception occurred while checking job status. Reason: %s \n Stdout: %s"%(reason.getTraceback(), ''.join(data))))
+                for job in batch:
+                    self._fail(job, failure)
+                return
+            responses=self.drm.read_checkstatus_response(data)
+            for job, response in _match_responses(batch, responses):
+                if not self.has_job(job):
+                    continue
+                try:
+                    self._on_status(job, response)
+                    if self.has_job(job):
+                        self._reschedule(job, response.status)
+                except:
+                    self._fail(job, Failure(ValueError("Exception at check_status with reason: %s \n stdout: %s"%(Failure().getTraceback(), ''.join(data)))))
+
+        def on_failure(reason):
+            failure=Failure(ValueError("Exception at check_status with reason: %s \n stdout: %s"%(reason.getTraceback(), ''.join(data))))
+            for job in batch:
+                self._fail(job, failure)
+
+        d.addCallback(on_executed)
+        d.addCallback(on_finished)
+        d.addErrback(on_failure)
+        return d
+
+
+    def _reschedule(self, job, status):
+        now=self._clock.seconds()
+        state=self._jobs[job.pid]
+        state.update(status, now)
+        state.due=now+self.schedule.next_delay(state, now)
+
+
+    def _fail(self, job, failure):
+        if not self.has_job(job):
+            return
+        self.remove(job)
+        self._on_failure(job, failure)
+
+def _walltime(job):
+    executable=getattr(job, 'executable', None)
+    resources=getattr(executable, 'resources', None)
+    if resources and resources.walltime:
+        return float(resources.walltime)*3600
+    return None
+
+
+def _max_jobids(drm, max_jobids):
+    drm_limit=getattr(drm, 'CHECKSTATUS_MAX_JOBIDS', None)
+    limits=[limit for limit in (max_jobids, drm_limit) if limit]
+    return int(min(limits)) if limits else None
+
+
+def _batches(jobs, size):
+    if not size:
+        return [jobs] if jobs else []
+    return [jobs[i:i+size] for i in range(0, len(jobs), size)]
+
+
+def _match_responses(batch, responses):
+    '''
+    Associates the responses with the jobs of the batch - by job id if provided in
+    the response, otherwise by the position in the response. Jobs without response
+    are skipped (and checked again with the next poll).
+    '''
+    by_pid={str(job.pid):job for job in batch}
+    matched=[]
+    for index, response in enumerate(responses):
+        if response.jobid is not None:
+            job=by_pid.get(str(response.jobid))
+        else:
+            job=batch[index] if index<len(batch) else None
+        if job:
+            matched.append((job, response))
+    return matched
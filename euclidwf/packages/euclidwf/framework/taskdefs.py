@@ -4,7 +4,7 @@ Created on Apr 25, 2015
 @author: martin.melchior
 '''
 from euclidwf.framework.workflow_dsl import invoke_task
-import inspect
+import sys
 from euclidwf.utilities.error_handling import PipelineSpecificationError
 
 class Package():
@@ -41,12 +41,17 @@ class ComputingResources():
 
 
 class Executable():
-    def __init__(self, command, inputs=[], outputs=[], resources=ComputingResources()):
+    def __init__(self, command, inputs=[], outputs=[], resources=ComputingResources(), pkgname=None, pkgfile=None):
+        """
+        The package is the module the executable is defined in - unless given explicitly 
+        (e.g. for executables from the static index, see euclidwf.utilities.pkgdef_index).
+        """
         self.command=command
         self.inputs=self.input_array(inputs)
         self.outputs=self.output_array(outputs)
         self.resources=resources
-        pkgname,pkgfile=_pkgname()
+        if pkgname is None:
+            pkgname,pkgfile=_pkgname()
         self.pkgname=pkgname
         self.pkgfile=pkgfile
         
@@ -83,9 +88,9 @@ class Executable():
 
 
 def _pkgname():
-    frm = inspect.stack()[2]
-    mod = inspect.getmodule(frm[0])
-    return mod.__name__,mod.__file__
+    # module of the caller of the constructor - without the source lookups of inspect.stack()
+    frm = sys._getframe(2)
+    return frm.f_globals.get('__name__'), frm.f_globals.get('__file__')
 
     
 MIME_XML="xml"
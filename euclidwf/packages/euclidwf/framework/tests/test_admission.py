@@ -0,0 +1,99 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import unittest
+
+from euclidwf.framework.admission import AdmissionController
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        self.admitted=[]
+
+
+    def _request(self, controller, runid, job, priority=0):
+        d=controller.request(runid, job, priority)
+        d.addCallback(self.admitted.append)
+        return d
+
+
+    def test_unlimited(self):
+        controller=AdmissionController()
+        for i in range(5):
+            self._request(controller, 'run', i)
+        self.assertEqual(range(5), self.admitted)
+        self.assertEqual(5, controller.in_flight)
+
+
+    def test_global_cap(self):
+        controller=AdmissionController(max_jobs=2)
+        for i in range(4):
+            self._request(controller, 'run', i)
+        self.assertEqual([0,1], self.admitted)
+        self.assertEqual(2, controller.get_state()['queued'])
+        controller.release('run')
+        self.assertEqual([0,1,2], self.admitted)
+
+
+    def test_per_run_cap(self):
+        controller=AdmissionController(max_jobs=10, max_jobs_per_run=2)
+        for i in range(3):
+            self._request(controller, 'a', 'a%i'%i)
+        self._request(controller, 'b', 'b0')
+        self.assertEqual(['a0','a1','b0'], self.admitted)
+        controller.release('b')
+        self.assertEqual(['a0','a1','b0'], self.admitted)
+        controller.release('a')
+        self.assertEqual(['a0','a1','b0','a2'], self.admitted)
+
+
+    def test_fair_share_by_weight(self):
+        controller=AdmissionController(max_jobs=3)
+        controller.register_run('a', weight=2.0)
+        controller.register_run('b', weight=1.0)
+        for i in range(5):
+            self._request(controller, 'a', 'a%i'%i)
+        for i in range(5):
+            self._request(controller, 'b', 'b%i'%i)
+        self.assertEqual(['a0','a1','a2'], self.admitted)
+        del self.admitted[:]
+        for _ in range(3):
+            controller.release('a')
+        self.assertEqual(['b0','a3','a4'], self.admitted)
+        runs=controller.get_state()['runs']
+        self.assertEqual(2, runs['a']['inFlight'])
+        self.assertEqual(1, runs['b']['inFlight'])
+
+
+    def test_priority(self):
+        controller=AdmissionController(max_jobs=1)
+        for job, priority in [('x',0), ('y',1), ('z',5), ('w',1)]:
+            self._request(controller, 'run', job, priority)
+        for _ in range(3):
+            controller.release('run')
+        self.assertEqual(['x','z','y','w'], self.admitted)
+
+
+    def test_cancel_and_unregister(self):
+        controller=AdmissionController(max_jobs=1)
+        self._request(controller, 'a', 'a0')
+        d=self._request(controller, 'a', 'a1')
+        d.addErrback(lambda _: None)
+        self._request(controller, 'b', 'b0')
+        d.cancel()
+        self.assertEqual(1, controller.get_state()['queued'])
+        controller.unregister_run('a')
+        # a0 may still be running - its slot is kept until it is released
+        self.assertEqual(['a0'], self.admitted)
+        self.assertEqual(1, controller.in_flight)
+        controller.release('a')
+        self.assertEqual(['a0','b0'], self.admitted)
+        self.assertEqual(1, controller.in_flight)
+        self.assertEqual(['b'], controller.get_state()['runs'].keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
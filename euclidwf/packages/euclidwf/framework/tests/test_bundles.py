@@ -0,0 +1,115 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import sys
+import types
+import unittest
+
+from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK, Graph, Endpoint
+
+from euclidwf.framework.graph_tasks import ExecTask, BundleTask, ParallelSplitTask,\
+    NestedGraphTask, BUNDLE_TIMING
+from euclidwf.framework.node_callbacks import _Bundle
+from euclidwf.framework.taskdefs import Package, ComputingResources, Output
+from euclidwf.utilities.error_handling import PipelineGraphError
+
+
+class _Executable(object):
+    def __init__(self, outputs, resources):
+        self.outputs=[Output(o, mime_type='fits') for o in outputs]
+        self.resources=resources
+
+
+def _body_graph():
+    pkg=Package('bundlepkg')
+    step1=ExecTask('step1', pkg, ('a','b'), ('c',))
+    step2=ExecTask('step2', pkg, ('c','b'), ('d',))
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'b', 2, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        C(START_TICK, 'context', 2, 'context'),
+        T(1, step1, {'name':'step1', 'path':'step1'}),
+        C(1, 'c', 2, 'c'),
+        T(2, step2, {'name':'step2', 'path':'step2'}),
+        C(1, 'c', FINAL_TICK, 'step1.c'),
+        C(2, 'd', FINAL_TICK, 'step2.d'),
+    )
+
+
+class TestBundles(unittest.TestCase):
+
+    def setUp(self):
+        pkg=types.ModuleType('bundlepkg')
+        pkg.step1=_Executable(('c',), ComputingResources(2, 1.0, 0.5))
+        pkg.step2=_Executable(('d',), ComputingResources(1, 4.0, 0.25))
+        sys.modules['bundlepkg']=pkg
+
+
+    def tearDown(self):
+        del sys.modules['bundlepkg']
+
+
+    def test_bundle_task(self):
+        task=BundleTask(_body_graph(), 'bundle')
+        self.assertEqual(['a','b'], task.inputnames)
+        self.assertEqual(['step1.c','step2.d'], task.outputnames)
+        self.assertEqual(2, len(task.steps()))
+        self.assertFalse(getattr(task, 'refiner_ports', None))
+
+
+    def test_bundle_only_exec_tasks(self):
+        body=G(T(1, NestedGraphTask(_body_graph(), 'nested'), {'name':'nested', 'path':'nested'}))
+        self.assertRaises(PipelineGraphError, BundleTask, body, 'bundle')
+
+
+    def test_plan(self):
+        task=BundleTask(_body_graph(), 'bundle')
+        bundle=_Bundle(task, 'runner')
+        self.assertEqual(2, bundle.resources.cores)
+        self.assertEqual(4.0, bundle.resources.ram)
+        self.assertEqual(0.75, bundle.resources.walltime)
+
+        outputs=bundle.outputs_dict('ps.iterations.1')
+        self.assertEqual({'step1.c':'ps.iterations.1.step1/c.fits', 'step2.d':'ps.iterations.1.step2/d.fits',
+                          BUNDLE_TIMING:'ps.iterations.1/bundle_timing.json'}, outputs)
+
+        plan=bundle.plan({'a':'in/a.xml', 'b':'in/b.xml'}, 'ps.iterations.1')
+        self.assertEqual(['step1','step2'], [step['name'] for step in plan['steps']])
+        step2=plan['steps'][1]
+        self.assertEqual('step2', step2['command'])
+        self.assertEqual({'c':'ps.iterations.1.step1/c.fits', 'b':'in/b.xml'}, step2['inputs'])
+        self.assertEqual({'d':'ps.iterations.1.step2/d.fits'}, step2['outputs'])
+
+
+    def test_parallel_split_bundled(self):
+        body=_body_graph()
+        task=ParallelSplitTask(body, 'a', 'cd_list', 'ps', bundle=True)
+        g=Graph()
+        tick=START_TICK+1
+        g.add_task(tick, task, {'name':'ps', 'path':'ps'})
+        for port in ('a','b','context'):
+            g.connect(Endpoint(START_TICK, port), Endpoint(tick, port))
+        g.connect(Endpoint(tick, 'cd_list'), Endpoint(FINAL_TICK, 'cd_list'))
+
+        task.adjust_graph(g, tick, ['x','y'])
+
+        iterations_tick=(START_TICK+1<<tick)+1
+        reduce_tick=iterations_tick+1
+        bundle_ticks=[START_TICK+i<<iterations_tick for i in (1,2)]
+        ticks=g.get_all_ticks()
+        self.assertEqual(4, len(ticks))
+        for i, t in enumerate(bundle_ticks):
+            self.assertIs(task.bundle_task, g.get_task(t))
+            self.assertEqual('ps.iterations.%i'%(i+1), g.get_task_properties(t)['path'])
+            inputs={dest.port for _, dest in g.get_in_connections(t)}
+            self.assertEqual({'a','b','context'}, inputs)
+            outputs={(source.port, dest.tick, dest.port, dest.index) for source, dest in g.get_out_connections(t)}
+            self.assertEqual({('step1.c', reduce_tick, 'c', i), ('step2.d', reduce_tick, 'd', i)}, outputs)
+
+
+if __name__ == '__main__':
+    unittest.main()
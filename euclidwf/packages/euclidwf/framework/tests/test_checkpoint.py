@@ -0,0 +1,96 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from pydron.dataflow.graph import START_TICK, FINAL_TICK
+
+from euclidwf.framework import checkpoint
+from euclidwf.framework.checkpoint import Checkpoint, tick_to_str, str_to_tick
+
+
+class _Config(object):
+    def __init__(self, localcache):
+        self.localcache=localcache
+
+
+class _Job(object):
+    def __init__(self, tick, pid, outputs, status=None):
+        self.tick=tick
+        self.pid=pid
+        self.outputs=outputs
+        self.status=status
+        self.submit_time=datetime.datetime(2026, 10, 18, 12, 0, 0)
+        self.end_time=datetime.datetime(2026, 10, 18, 12, 30, 0)
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.config=_Config(self.testdir)
+        self.rundata={'runid':'run1', 'workdir':'wd'}
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def test_ticks(self):
+        nested=(START_TICK+3<<(START_TICK+1<<START_TICK+2).mark_loop_iteration())+1
+        for tick in (START_TICK, FINAL_TICK, START_TICK+1, nested):
+            self.assertEqual(tick, str_to_tick(tick_to_str(tick)))
+
+
+    def test_record_and_restore(self):
+        tick=START_TICK+2<<START_TICK+1
+        cp=checkpoint.create(self.config, 'run1', self.rundata)
+        cp.record_refined(START_TICK+1, [('x.fits', 'y.fits'), ('z.fits', 'w.fits')])
+        cp.record_submitted(_Job(tick, '42', {'c':'ps/c.xml'}))
+        cp.record_submitted(_Job(START_TICK+3, '43', {'d':'d/d.xml'}))
+        cp.record_completed(_Job(START_TICK+3, '43', {'d':'d/d.xml'}, 'COMPLETED'))
+
+        cp=Checkpoint(checkpoint.checkpoint_path(self.testdir, 'run1'))
+        self.assertEqual(self.rundata, cp.rundata)
+        self.assertEqual([('x.fits', 'y.fits'), ('z.fits', 'w.fits')], cp.get_refined(START_TICK+1))
+        self.assertEqual('42', cp.get_submitted(tick)['pid'])
+        self.assertEqual({'c':'ps/c.xml'}, cp.get_submitted(tick)['outputs'])
+        self.assertIsNone(cp.get_submitted(START_TICK+3))
+        completed=cp.get_completed(START_TICK+3)
+        self.assertEqual('COMPLETED', completed['status'])
+        self.assertEqual(datetime.datetime(2026, 10, 18, 12, 30, 0), completed['end_time'])
+
+
+    def test_incomplete_entry(self):
+        cp=checkpoint.create(self.config, 'run1', self.rundata)
+        cp.record_submitted(_Job(START_TICK+1, '42', {'c':'c.xml'}))
+        with open(cp.path, 'a') as f:
+            f.write('{"event": "completed", "tick"')
+        cp=Checkpoint(cp.path)
+        self.assertEqual('42', cp.get_submitted(START_TICK+1)['pid'])
+        self.assertIsNone(cp.get_completed(START_TICK+1))
+
+
+    def test_find_unfinished(self):
+        checkpoint.create(self.config, 'run1', self.rundata)
+        cp=checkpoint.create(self.config, 'run2', {'runid':'run2'})
+        cp.record_finished('COMPLETED')
+        self.assertEqual(['run1'], [c.rundata['runid'] for c in checkpoint.find_unfinished(self.testdir)])
+
+        # resuming reopens the run and a new run with the same id starts afresh
+        cp=checkpoint.create(self.config, 'run2', {'runid':'run2'}, resume=True)
+        self.assertEqual(2, len(checkpoint.find_unfinished(self.testdir)))
+        cp.record_submitted(_Job(START_TICK+1, '42', {'c':'c.xml'}))
+        cp=checkpoint.create(self.config, 'run2', {'runid':'run2'})
+        self.assertIsNone(cp.get_submitted(START_TICK+1))
+        self.assertFalse(Checkpoint(cp.path).submitted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from twisted.internet import defer
+
+from euclidwf.utilities import chunked_transfer
+from euclidwf.utilities.chunked_transfer import TransferStats, TransferError
+
+CONTENT=''.join(chr(i%256) for i in range(10000))
+
+
+class TestChunkedTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.stats=TransferStats()
+        self.sftp=MockSFTP()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _result(self, d):
+        results=[]
+        d.addBoth(results.append)
+        return results[0]
+
+
+    def test_fetch(self):
+        self.sftp.files['remote']=CONTENT
+        localpath=os.path.join(self.testdir, 'local')
+        transfer=self._result(chunked_transfer.fetch(self.sftp, 'remote', localpath, 1000, 4, self.stats))
+        self.assertEqual(len(CONTENT), transfer.done)
+        self.assertEqual(hashlib.md5(CONTENT).hexdigest(), transfer.md5)
+        with open(localpath, 'rb') as f:
+            self.assertEqual(CONTENT, f.read())
+        self.assertEqual(1, self.stats.files)
+
+
+    def test_fetch_size_mismatch(self):
+        # the remote file grows while being fetched
+        self.sftp.files['remote']=CONTENT
+        self.sftp.excess='x'
+        localpath=os.path.join(self.testdir, 'local')
+        result=self._result(chunked_transfer.fetch(self.sftp, 'remote', localpath, 1000, 4, self.stats))
+        self.assertTrue(result.check(TransferError))
+        self.assertEqual(0, self.stats.files)
+        self.assertEqual(1, self.stats.failures)
+
+
+    def test_upload(self):
+        localpath=os.path.join(self.testdir, 'local')
+        with open(localpath, 'wb') as f:
+            f.write(CONTENT)
+        transfer=self._result(chunked_transfer.upload(self.sftp, localpath, 'remote', 1000, 4, self.stats))
+        self.assertEqual(len(CONTENT), transfer.done)
+        self.assertEqual(CONTENT, self.sftp.files['remote'])
+
+
+    def test_upload_size_mismatch(self):
+        localpath=os.path.join(self.testdir, 'local')
+        with open(localpath, 'wb') as f:
+            f.write(CONTENT)
+        self.sftp.drop_writes=True
+        result=self._result(chunked_transfer.upload(self.sftp, localpath, 'remote', 1000, 4, self.stats))
+        self.assertTrue(result.check(TransferError))
+        self.assertEqual(1, self.stats.failures)
+
+
+    def test_upload_checksum_mismatch(self):
+        # chunks written out of order - the size of the target matches nevertheless
+        localpath=os.path.join(self.testdir, 'local')
+        with open(localpath, 'wb') as f:
+            f.write(CONTENT)
+        self.sftp.misorder=True
+        result=self._result(chunked_transfer.upload(self.sftp, localpath, 'remote', 1000, 4, self.stats))
+        self.assertTrue(result.check(TransferError))
+        self.assertEqual(len(CONTENT), len(self.sftp.files['remote']))
+        self.assertEqual(1, self.stats.failures)
+
+
+    def test_copy(self):
+        src=os.path.join(self.testdir, 'src')
+        dest=os.path.join(self.testdir, 'dest')
+        with open(src, 'wb') as f:
+            f.write(CONTENT)
+        transfer=chunked_transfer.copy(src, dest, 1000, self.stats)
+        self.assertEqual(len(CONTENT), transfer.done)
+        self.assertEqual(hashlib.md5(CONTENT).hexdigest(), transfer.md5)
+        with open(dest, 'rb') as f:
+            self.assertEqual(CONTENT, f.read())
+
+
+    def test_checksum(self):
+        self.sftp.files['remote']=CONTENT
+        transfer=self._result(chunked_transfer.checksum(self.sftp, 'remote', 1000, 4))
+        self.assertEqual(hashlib.md5(CONTENT).hexdigest(), transfer.md5)
+
+
+class MockSFTP(object):
+
+    def __init__(self):
+        self.files={}
+        self.excess=''
+        self.drop_writes=False
+        self.misorder=False
+
+    def open_file(self, path, flags):
+        if path not in self.files:
+            self.files[path]=''
+        return defer.succeed(MockRemoteFile(self, path))
+
+
+class MockRemoteFile(object):
+
+    def __init__(self, sftp, path):
+        self.sftp=sftp
+        self.path=path
+
+    def getAttrs(self):
+        return defer.succeed({'size':len(self.sftp.files[self.path])})
+
+    def readChunk(self, offset, length):
+        data=self.sftp.files[self.path][offset:offset+length]
+        if offset+length>=len(self.sftp.files[self.path]):
+            data+=self.sftp.excess
+        return defer.succeed(data)
+
+    def writeChunk(self, offset, data):
+        if self.sftp.misorder and offset==0:
+            offset=len(data)
+        elif self.sftp.misorder and offset==len(data):
+            offset=0
+        if not self.sftp.drop_writes:
+            content=self.sftp.files[self.path]
+            self.sftp.files[self.path]=content[:offset].ljust(offset, '\0')+data+content[offset+len(data):]
+        return defer.succeed(None)
+
+    def close(self):
+        return defer.succeed(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import unittest
+
+from pydron.dataflow.graph import Graph, Endpoint, START_TICK, FINAL_TICK
+
+from euclidwf.framework.critical_path import bottom_levels, CriticalPathEstimator
+from euclidwf.framework.graph_tasks import NestedGraphTask
+
+
+class TestCriticalPath(unittest.TestCase):
+
+    def setUp(self):
+        # a -> b -> FINAL, a -> c -> FINAL, d -> FINAL
+        self.g=Graph()
+        self.ticks={}
+        for i, name in enumerate(['a','b','c','d']):
+            self.ticks[name]=START_TICK+i+1
+            self.g.add_task(self.ticks[name], name)
+        self._connect('a','b')
+        self._connect('a','c')
+        self.g.connect(Endpoint(self.ticks['b'],'out'), Endpoint(FINAL_TICK,'b'))
+        self.g.connect(Endpoint(self.ticks['c'],'out'), Endpoint(FINAL_TICK,'c'))
+        self.g.connect(Endpoint(self.ticks['d'],'out'), Endpoint(FINAL_TICK,'d'))
+        self.walltimes={'a':1.0, 'b':5.0, 'c':2.0, 'd':4.0}
+
+
+    def _connect(self, source, dest):
+        self.g.connect(Endpoint(self.ticks[source],'out'), Endpoint(self.ticks[dest],source))
+
+
+    def test_bottom_levels(self):
+        levels=bottom_levels(self.g, lambda task: self.walltimes[task])
+        self.assertEqual({self.ticks['a']:6.0, self.ticks['b']:5.0, self.ticks['c']:2.0, self.ticks['d']:4.0},
+                         levels)
+
+
+    def test_nested_body(self):
+        estimator=_Estimator(self.walltimes)
+        nested=NestedGraphTask(self.g, 'nested')
+        self.assertEqual(6.0, estimator.walltime(nested))
+
+
+    def test_priority(self):
+        estimator=_Estimator(self.walltimes)
+        self.assertFalse(estimator.has_estimate())
+        self.assertEqual(0.0, estimator.priority(self.ticks['a']))
+        estimator.update(self.g)
+        self.assertTrue(estimator.has_estimate())
+        self.assertEqual(6.0, estimator.priority(self.ticks['a']))
+        self.assertEqual(0.0, estimator.priority(START_TICK+9))
+
+
+    def test_update_refined(self):
+        estimator=_Estimator(self.walltimes)
+        estimator.update(self.g)
+        # b refined into x -> y
+        b=self.ticks['b']
+        x=START_TICK+1<<b
+        y=START_TICK+2<<b
+        self.walltimes.update({'x':7.0, 'y':3.0})
+        self.g.disconnect(Endpoint(self.ticks['a'],'out'), Endpoint(b,'a'))
+        self.g.disconnect(Endpoint(b,'out'), Endpoint(FINAL_TICK,'b'))
+        self.g.remove_task(b)
+        self.g.add_task(x, 'x')
+        self.g.add_task(y, 'y')
+        self.g.connect(Endpoint(self.ticks['a'],'out'), Endpoint(x,'a'))
+        self.g.connect(Endpoint(x,'out'), Endpoint(y,'x'))
+        self.g.connect(Endpoint(y,'out'), Endpoint(FINAL_TICK,'b'))
+        self.assertEqual(set([x, y, self.ticks['a']]), estimator.update(self.g, b))
+        self.assertEqual(11.0, estimator.priority(self.ticks['a']))
+        self.assertEqual(10.0, estimator.priority(x))
+        self.assertEqual(4.0, estimator.priority(self.ticks['d']))
+
+
+    def test_priority_added_task(self):
+        estimator=_Estimator(self.walltimes)
+        estimator.update(self.g)
+        # added without an update - computed when needed
+        e=START_TICK+1<<self.ticks['a']
+        self.walltimes['e']=3.0
+        self.g.add_task(e, 'e')
+        self.g.connect(Endpoint(e,'out'), Endpoint(self.ticks['b'],'e'))
+        self.assertEqual(8.0, estimator.priority(e))
+
+
+class _Estimator(CriticalPathEstimator):
+
+    def __init__(self, walltimes):
+        CriticalPathEstimator.__init__(self)
+        self.walltimes=walltimes
+
+    def walltime(self, task):
+        if isinstance(task, str):
+            return self.walltimes[task]
+        return CriticalPathEstimator.walltime(self, task)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from twisted.internet import defer
+
+from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK
+from pydron.interpreter.traverser import Traverser, EvalResult
+
+from euclidwf.framework.context import TRANSPORTER, WSROOT, WORKDIR, LOCALWORKDIR
+from euclidwf.framework.graph_tasks import ExecTask, ParallelSplitTask, HelperTask,\
+    _elementTask, fuse_splits, fused_portname
+from euclidwf.framework.taskdefs import Package
+from euclidwf.utilities.error_handling import PipelineGraphError
+from euclidwf.utilities import listfile
+from euclidwf.utilities.file_transporter import LocalFileTransporter
+
+INPUT_LIST=['x%i'%i for i in range(1, 4)]
+
+
+def _body_graph(command):
+    step=ExecTask(command, Package('elementwisepkg'), ('a','b'), ('c',))
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        T(1, step, {'name':command, 'path':command}),
+        C(1, 'c', FINAL_TICK, 'c'),
+    )
+
+
+def _fused_task(bundle=False):
+    upstream=ParallelSplitTask(_body_graph('first'), 'a', 'c_list', 'first', bundle)
+    downstream=ParallelSplitTask(_body_graph('second'), 'a', 'e_list', 'second')
+    return fuse_splits(upstream, downstream)
+
+
+class TestElementwiseSplit(unittest.TestCase):
+
+    def setUp(self):
+        self.pending=[]
+        self.testdir=tempfile.mkdtemp()
+        self.context={TRANSPORTER:LocalFileTransporter(link_mode='copy'), WSROOT:os.path.join(self.testdir, 'ws'),
+                      WORKDIR:'run', LOCALWORKDIR:os.path.join(self.testdir, 'local')}
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _refine(self, g, tick, task, inputs):
+        if isinstance(task, ParallelSplitTask):
+            task.adjust_graph(g, tick, INPUT_LIST)
+            return defer.succeed(INPUT_LIST)
+        return task.refine(g, tick, inputs)
+
+
+    def _evaluate(self, g, tick, task, inputs):
+        if isinstance(task, HelperTask):
+            return task.evaluate(g, tick, task, inputs)
+        d=defer.Deferred()
+        self.pending.append((d, task, inputs))
+        return d
+
+
+    def _complete(self, index):
+        d, task, inputs=self.pending.pop(index)
+        d.callback(EvalResult({'c':"%s(%s,%s)"%(task.command, inputs['a'], inputs['b'])}))
+
+
+    def test_fused_body(self):
+        task=_fused_task()
+        self.assertEqual('second', task.name)
+        self.assertEqual('a', task.iterator_port)
+        self.assertEqual('e_list', task.outputname)
+        body=task.body_graph
+        self.assertEqual(['first.first', 'first.element', 'second.second'],
+                         [body.get_task_properties(t)['path'] for t in sorted(body.get_all_ticks())])
+        element=body.get_task(START_TICK+2)
+        self.assertTrue(isinstance(element, _elementTask))
+        self.assertEqual(['c'], element.inputnames)
+        inputs={dest.port:source for source, dest in body.get_in_connections(START_TICK+3)}
+        self.assertEqual(START_TICK+2, inputs['a'].tick)
+        self.assertEqual(fused_portname(task, 'b'), inputs['b'].port)
+        self.assertEqual(['c'], [dest.port for _, dest in body.get_in_connections(FINAL_TICK)])
+
+
+    def test_bundle_not_fused(self):
+        self.assertRaises(PipelineGraphError, _fused_task, True)
+
+
+    def test_pipelined(self):
+        task=_fused_task()
+        g=G(
+            C(START_TICK, 'a', 1, 'a'),
+            C(START_TICK, 'b', 1, 'b'),
+            C(START_TICK, 'b2', 1, fused_portname(task, 'b')),
+            C(START_TICK, 'context', 1, 'context'),
+            T(1, task, {'name':'second', 'path':'second'}),
+            C(1, 'e_list', FINAL_TICK, 'e_list'),
+        )
+        traverser=Traverser(self._refine, self._evaluate)
+        results=[]
+        traverser.execute(g, {'a':'list', 'b':'b', 'b2':'b2', 'context':self.context}).addBoth(results.append)
+
+        # the downstream step of the first element starts while the other upstream steps are running
+        self.assertEqual(['first']*len(INPUT_LIST), [task.command for _, task, _ in self.pending])
+        self._complete(0)
+        self.assertEqual(['first']*(len(INPUT_LIST)-1)+['second'], [task.command for _, task, _ in self.pending])
+
+        while self.pending:
+            self._complete(0)
+        outputlist=list(listfile.load_list(os.path.join(self.context[WSROOT], self.context[WORKDIR], results[0]['e_list'])))
+        # the downstream iterations see the elements of the upstream output list - tuples
+        self.assertEqual([("second(%s,b2)"%(("first(%s,b)"%x,),),) for x in INPUT_LIST], outputlist)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+from euclidwf.utilities import file_transporter
+from euclidwf.utilities.file_transporter import LocalFileTransporter
+
+SHM='/dev/shm'
+
+
+class TestLocalFileTransporter(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.transporter=LocalFileTransporter()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _result(self, d):
+        results=[]
+        d.addBoth(results.append)
+        return results[0]
+
+
+    def _write(self, path, content):
+        with open(path, 'w') as f:
+            f.write(content)
+
+
+    def _assert_moved(self, src, dest, content):
+        self.assertFalse(os.path.lexists(src))
+        self.assertFalse(os.path.islink(dest))
+        with open(dest, 'r') as f:
+            self.assertEqual(content, f.read())
+
+
+    def test_move(self):
+        src=os.path.join(self.testdir, 'src')
+        dest=os.path.join(self.testdir, 'cache', 'dest')
+        self._write(src, 'content')
+        self._result(self.transporter.move_file(src, dest))
+        self._assert_moved(src, dest, 'content')
+
+
+    def test_move_across_devices(self):
+        src=os.path.join(self.testdir, 'src')
+        dest=os.path.join(self.testdir, 'cache', 'dest')
+        self._write(src, 'content')
+
+        def rename(src, dest):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+        original_rename=file_transporter.os.rename
+        file_transporter.os.rename=rename
+        try:
+            self.assertEqual(None, self._result(self.transporter.move_file(src, dest)))
+        finally:
+            file_transporter.os.rename=original_rename
+        self._assert_moved(src, dest, 'content')
+        self.assertEqual({'copy':1}, self.transporter.get_statistics()['transfers'])
+
+
+    @unittest.skipUnless(os.path.isdir(SHM), "No %s to move to."%SHM)
+    def test_move_to_other_device(self):
+        src=os.path.join(self.testdir, 'src')
+        self._write(src, 'content')
+        shmdir=tempfile.mkdtemp(dir=SHM)
+        self.addCleanup(shutil.rmtree, shmdir)
+        if os.stat(shmdir).st_dev == os.stat(self.testdir).st_dev:
+            self.skipTest("%s is on the same device."%SHM)
+        dest=os.path.join(shmdir, 'dest')
+        self.assertEqual(None, self._result(self.transporter.move_file(src, dest)))
+        self._assert_moved(src, dest, 'content')
+
+
+if __name__ == '__main__':
+    unittest.main()
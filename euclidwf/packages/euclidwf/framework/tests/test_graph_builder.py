@@ -231,6 +231,22 @@ class TestGraphBuilder(unittest.TestCase):
         utils.assert_graph_equal(expected, graph)
 
 
+    def test_elementwise(self):
+        graph = build_graph(pipe_elementwise)
+        self.assertEqual(1, len(graph.get_all_ticks()))
+        fused=graph.get_task(graph.get_all_ticks()[0])
+        self.assertTrue(isinstance(fused,ParallelSplitTask))
+        self.assertEqual('second_split', fused.name)
+        self.assertEqual(['first_split.test_exec', 'first_split.element', 'second_split.test_exec2'],
+                         [fused.body_graph.get_task_properties(t)['path'] for t in sorted(fused.body_graph.get_all_ticks())])
+        self.assertEqual(set(['a', 'b', 'second_split.b', 'context']),
+                         set(dest.port for _, dest in graph.get_in_connections(graph.get_all_ticks()[0])))
+
+
+    def test_elementwise_output_used(self):
+        self.assertRaises(PipelineGraphError, build_graph, pipe_elementwise_output_used)
+
+
     def test_unsupported_invocation_type(self):
         def testpipe(x,y):
             u,v=test_exec(a=x, b=y)
@@ -279,3 +295,20 @@ def testpipe_parallel(x,y):
     return test_task_parallel(x=x,y=y)
 
 
+@parallel(iterable='a')
+def first_split(a,b):
+    c,d=test_exec(a=a, b=b)
+    return c,d
+
+@parallel(iterable='a', properties={'elementwise':True})
+def second_split(a,b):
+    c,d=test_exec(name="test_exec2", a=a, b=b)
+    return c
+
+def pipe_elementwise(x,y,z):
+    l=first_split(a=x,b=y)
+    return second_split(a=l,b=z)
+
+def pipe_elementwise_output_used(x,y,z):
+    l=first_split(a=x,b=y)
+    return second_split(a=l,b=z), l
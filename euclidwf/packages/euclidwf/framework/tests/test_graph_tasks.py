@@ -13,14 +13,15 @@ from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK, Graph, Endpoi
 
 from euclidwf.framework.graph_tasks import NestedGraphTask, ExecTask, get_ticks_by_property,\
     ParallelSplitTask, _mapPortsTask, _reducePortsTask
-from euclidwf.framework.taskprops import PackageSource
+from euclidwf.framework.taskdefs import Package
+from euclidwf.utilities import listfile
 from euclidwf.utilities.file_transporter import LocalFileTransporter
 
 
 class TestGraphTasks(unittest.TestCase):
 
     def test_nested_task(self):
-        pkg=PackageSource('testpkg', 'pkgfile', 'NONE')
+        pkg=Package('testpkg')
         exec_task = ExecTask("exec_name", pkg, ('a',), ('b',))
         subgraph =  G(
             C(START_TICK, 'a', 1,'a'),
@@ -57,7 +58,7 @@ class TestGraphTasks(unittest.TestCase):
         
     
     def test_parallel_split(self):
-        pkg=PackageSource('testpkg', 'pkgfile', 'NONE')
+        pkg=Package('testpkg')
         exec_task = ExecTask("exec_name", pkg, ('a','b'), ('c','d'))
         subgraph =  G(
             C(START_TICK, 'a', 1,'a'),
@@ -94,7 +95,7 @@ class TestGraphTasks(unittest.TestCase):
         os.mkdir(local_workdir)
         with open(testfile,'wb') as f:
             pickle.dump(['x','y','z'],f)
-        context={'transporter': LocalFileTransporter(), 'workdir':workdir, 'local_workdir':local_workdir}
+        context={'transporter': LocalFileTransporter(), 'wsroot':testdir, 'workdir':'workdir', 'local_workdir':local_workdir}
         task.refine(graph, Tick.parse_tick(1), {'b':'testfile.pickle', 'context':context})
 
         mapTask=_mapPortsTask('b', ['x','y','z'])
@@ -121,22 +122,17 @@ class TestGraphTasks(unittest.TestCase):
             C(START_TICK, 'context', task_tick_2,'context'),
             C(START_TICK, 'context', task_tick_3,'context'),
             T(map_task_tick, mapTask, {'name': 'map', 'path':'ps.map'}),
-            C(map_task_tick, 'b_1', task_tick_1,'b'),
-            C(map_task_tick, 'b_2', task_tick_2,'b'),
-            C(map_task_tick, 'b_3', task_tick_3,'b'),
             T(task_tick_1, exec_task, {'name': 'test_exec', 'path':'ps.iterations.1.test_exec'}),
             T(task_tick_2, exec_task, {'name': 'test_exec', 'path':'ps.iterations.2.test_exec'}),
             T(task_tick_3, exec_task, {'name': 'test_exec', 'path':'ps.iterations.3.test_exec'}),
-            C(task_tick_1, 'c', reduce_tick,'c_1'),
-            C(task_tick_2, 'c', reduce_tick,'c_2'),
-            C(task_tick_3, 'c', reduce_tick,'c_3'),
-            C(task_tick_1, 'd', reduce_tick,'d_1'),
-            C(task_tick_2, 'd', reduce_tick,'d_2'),
-            C(task_tick_3, 'd', reduce_tick,'d_3'),
             C(START_TICK, 'context', reduce_tick,'context'),
             T(reduce_tick, reduceTask, {'name': 'reduce', 'path':'ps.reduce'}),
             C(reduce_tick, 'cd_list', FINAL_TICK,'cd_list'),
         )
+        for i, task_tick in enumerate((task_tick_1, task_tick_2, task_tick_3)):
+            expected.connect(Endpoint(map_task_tick, 'b', i), Endpoint(task_tick, 'b'))
+            expected.connect(Endpoint(task_tick, 'c'), Endpoint(reduce_tick, 'c', i))
+            expected.connect(Endpoint(task_tick, 'd'), Endpoint(reduce_tick, 'd', i))
         utils.assert_graph_equal(expected, graph)        
         self.assertTrue(os.path.exists(os.path.join(local_workdir,'testfile.pickle')))
         
@@ -150,7 +146,7 @@ class TestGraphTasks(unittest.TestCase):
         testfile=os.path.join(local_workdir, 'ps.reduce','cd_list')
         with open(testfile,'wb') as f:
             pickle.dump([('x_1','y_1'), ('x_2','y_2'), ('x_3','y_3')],f)
-        context={'transporter': LocalFileTransporter(), 'workdir':workdir, 'local_workdir':local_workdir}
+        context={'transporter': LocalFileTransporter(), 'wsroot':testdir, 'workdir':'workdir', 'local_workdir':local_workdir}
 
         reduce_task=_reducePortsTask(3, ['c','d'], 'cd_list')
         reduce_tick=START_TICK+3<<Tick.parse_tick(1)        
@@ -162,23 +158,17 @@ class TestGraphTasks(unittest.TestCase):
         
         inputs={}
         inputs['context']=context
-        inputs['c_1']='x_1'
-        inputs['d_1']='y_1'
-        inputs['c_2']='x_2'
-        inputs['d_2']='y_2'
-        inputs['c_3']='x_3'
-        inputs['d_3']='y_3'                
+        inputs['c']=['x_1','x_2','x_3']
+        inputs['d']=['y_1','y_2','y_3']
         result=[('x_1','y_1'),('x_2','y_2'),('x_3','y_3')]
         reduce_task.evaluate(g, reduce_tick, reduce_task, inputs)
         outputfile=os.path.join(workdir,'ps.reduce','cd_list')
         self.assertTrue(os.path.exists(outputfile))
-        with open(outputfile,'r') as f:
-            output=pickle.load(f)
-            self.assertEqual(result, output)
+        self.assertEqual(result, list(listfile.load_list(outputfile)))
             
     
     def test_task_by_property(self):
-        pkg=PackageSource('testpkg', 'pkgfile', 'NONE')
+        pkg=Package('testpkg')
         exec_task1 = ExecTask("exec_name1", pkg, ('a',), ('b',))
         exec_task2 = ExecTask("exec_name2", pkg, ('a',), ('b',))
         exec_task3 = ExecTask("exec_name3", pkg, ('a',), ('b',))
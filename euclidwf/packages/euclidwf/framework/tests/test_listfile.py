@@ -0,0 +1,123 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from euclidwf.utilities import listfile
+from euclidwf.utilities.listfile import ListFile, ListFileWriter, ListFileError
+
+
+ELEMENTS=[('a', 1), ('b', {'x':2}), ('c', [3, 4]), ('d', None), ('e', 'five')]
+
+
+class TestListFile(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.path=os.path.join(self.testdir, 'list')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _load(self, path):
+        outputlist=listfile.load_list(path)
+        if isinstance(outputlist, ListFile):
+            self.addCleanup(outputlist.close)
+        return outputlist
+
+
+    def test_roundtrip(self):
+        listfile.write_list(self.path, ELEMENTS)
+        outputlist=self._load(self.path)
+        self.assertTrue(isinstance(outputlist, ListFile))
+        self.assertEqual(len(ELEMENTS), len(outputlist))
+        self.assertEqual(ELEMENTS, list(outputlist))
+
+
+    def test_empty(self):
+        listfile.write_list(self.path, [])
+        outputlist=self._load(self.path)
+        self.assertEqual(0, len(outputlist))
+        self.assertEqual([], list(outputlist))
+
+
+    def test_slices(self):
+        listfile.write_list(self.path, ELEMENTS)
+        outputlist=self._load(self.path)
+        self.assertEqual(ELEMENTS[1:3], outputlist[1:3])
+        self.assertEqual(ELEMENTS[::2], outputlist[::2])
+        self.assertEqual(ELEMENTS[-2:], outputlist[-2:])
+        self.assertEqual(ELEMENTS[::-1], outputlist[::-1])
+        self.assertEqual([], outputlist[4:2])
+        self.assertEqual(ELEMENTS, outputlist[:100])
+
+
+    def test_negative_indices(self):
+        listfile.write_list(self.path, ELEMENTS)
+        outputlist=self._load(self.path)
+        self.assertEqual(ELEMENTS[-1], outputlist[-1])
+        self.assertEqual(ELEMENTS[0], outputlist[-len(ELEMENTS)])
+        self.assertRaises(IndexError, outputlist.__getitem__, len(ELEMENTS))
+        self.assertRaises(IndexError, outputlist.__getitem__, -len(ELEMENTS)-1)
+
+
+    def test_legacy_pickle(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump(ELEMENTS, f)
+        self.assertFalse(listfile.is_listfile(self.path))
+        self.assertEqual(ELEMENTS, self._load(self.path))
+
+
+    def test_incomplete(self):
+        writer=ListFileWriter(self.path)
+        writer.append(ELEMENTS[0])
+        writer.flush()
+        self.assertRaises(ListFileError, ListFile, self.path)
+        writer.close()
+        self.assertEqual(ELEMENTS[:1], list(self._load(self.path)))
+
+
+    def test_incomplete_empty(self):
+        writer=ListFileWriter(self.path)
+        writer.flush()
+        self.assertRaises(ListFileError, ListFile, self.path)
+        writer.close()
+        self.assertEqual(0, len(self._load(self.path)))
+
+
+    def test_failed_write(self):
+        listfile.write_list(self.path, ELEMENTS)
+        def elements():
+            yield ELEMENTS[0]
+            raise ValueError("Element not available.")
+        self.assertRaises(ValueError, listfile.write_list, self.path, elements())
+        self.assertFalse(os.path.lexists(self.path))
+
+
+    def test_truncated(self):
+        listfile.write_list(self.path, ELEMENTS)
+        size=os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size-1)
+        self.assertRaises(ListFileError, ListFile, self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(len(listfile.MAGIC)+2)
+        self.assertRaises(ListFileError, ListFile, self.path)
+
+
+    def test_not_a_listfile(self):
+        with open(self.path, 'wb') as f:
+            f.write('X'*64)
+        self.assertRaises(ListFileError, ListFile, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
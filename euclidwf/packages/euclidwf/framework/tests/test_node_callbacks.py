@@ -7,17 +7,18 @@ from euclidwf.framework.node_callbacks import NodeCallbacks
 import tempfile
 import os
 from euclidwf.utilities.cmd_executor import AbstractCmdExecutor
-from euclidwf.framework.taskprops import PackageSource
+
 from euclidwf.framework.workflow_dsl import invoke_task, pipeline
 from euclidwf.framework.graph_builder import build_graph
-from euclidwf.framework.graph_tasks import ExecTask
+from euclidwf.framework.graph_tasks import ExecTask, BundleTask, BUNDLE_PLAN
 from euclidwf.framework.context import CONTEXT, CHECKSTATUS_TIMEOUT,\
-    CHECKSTATUS_TIME, WORKDIR, LOGDIR
+    CHECKSTATUS_TIME, WORKDIR, LOGDIR, WSROOT, LOCALWORKDIR, TRANSPORTER
+from euclidwf.utilities.file_transporter import LocalFileTransporter
 import unittest
 from twisted.internet import defer
 from twisted.python.failure import Failure
 from euclidwf.framework.drm_access import JOB_EXECUTING, JOB_COMPLETED, JOB_ERROR
-from pydron.dataflow.graph import Tick
+from pydron.dataflow.graph import Tick, G, C, T, START_TICK, FINAL_TICK
 from utwist._utwist import with_reactor
 import datetime
 from euclidwf.server.server_model import RunServerConfiguration, PKG_REPOSITORY,\
@@ -25,9 +26,9 @@ from euclidwf.server.server_model import RunServerConfiguration, PKG_REPOSITORY,
     DRM_CLEANUP_CMD, DRM_DELETE_CMD, DRM_STATUSCHECK_POLLTIME,\
     DRM_STATUSCHECK_TIMEOUT, DRM_PROTOCOL, WS_PROTOCOL, CONFIG_LOCALCACHE,\
     CONFIG_PROXYFCTS_DIR, PIPELINE_DIR, WS_USERNAME, WS_PASSWORD, DRM_USERNAME,\
-    DRM_PASSWORD, CONFIG_DRM, CONFIG_WS, DRM_HOST, DRM_PORT, WS_HOST, WS_PORT,\
-    HpcAccessCredentials
-from euclidwf.framework.taskdefs import TaskProperties
+    DRM_PASSWORD, CONFIG_DRM, CONFIG_WS, DRM_HOST, DRM_PORT, DRM_ACCESS_VERSION, WS_HOST, WS_PORT,\
+    CREDENTIALS
+from euclidwf.framework.taskdefs import TaskProperties, Package
 import sys
 
 
@@ -39,7 +40,7 @@ class TestNodeCallbacks(unittest.TestCase):
         self.node_callbacks=NodeCallbacks(self.config, self.config.credentials, self.config.pkgRepository)
         self.g = _create_graph(self.config.pkgRepository)
         execname='test_exec'
-        self.task = ExecTask(execname, PackageSource("testpkg", "pkgdefs"), ("a","b"), ("c",))
+        self.task = ExecTask(execname, Package("testpkg"), ("a","b"), ("c",))
         context={CHECKSTATUS_TIMEOUT : self.config.drmConfig.statusCheckTimeout, CHECKSTATUS_TIME : self.config.drmConfig.statusCheckPollTime}
         context[WORKDIR]=os.path.join(self.config.wsConfig.workspaceRoot,"testrun")
         context[LOGDIR]=os.path.join(self.config.wsConfig.workspaceRoot,"testrun","logs")        
@@ -191,6 +192,36 @@ class TestNodeCallbacks(unittest.TestCase):
         self.assertEqual("test_exec",taskprops['name'])
 
 
+    def test_submit_bundle(self):
+        body=G(
+            C(START_TICK, 'a', 1, 'a'),
+            C(START_TICK, 'b', 1, 'b'),
+            C(START_TICK, 'context', 1, 'context'),
+            T(1, ExecTask('test_exec', Package("testpkg"), ("a","b"), ("c",)), {'name':'test_exec', 'path':'test_exec'}),
+            C(1, 'c', FINAL_TICK, 'test_exec.c'),
+        )
+        task=BundleTask(body, 'bundle')
+        g=G(
+            C(START_TICK, 'a', 1, 'a'),
+            C(START_TICK, 'b', 1, 'b'),
+            C(START_TICK, 'context', 1, 'context'),
+            T(1, task, {'name':'bundle', 'path':'bundle'}),
+            C(1, 'test_exec.c', FINAL_TICK, 'c'),
+        )
+        context=self.inputs[CONTEXT]
+        context.update({WSROOT:self.config.wsConfig.workspaceRoot, WORKDIR:'testrun', LOGDIR:'logs',
+                        LOCALWORKDIR:os.path.join(self.config.localcache, 'testrun'), TRANSPORTER:LocalFileTransporter()})
+        test_executor=TestCmdExecutor(self.config, "1", False, 0, False, JOB_COMPLETED)
+        self.node_callbacks._cmd_executor=test_executor
+        d=self.node_callbacks.submit_task(g, Tick.parse_tick(1), task, self.inputs)
+        self.assertEqual({'test_exec.c':'bundle.test_exec/c.xml'}, d.result.result)
+        self.assertEqual(1, len(test_executor.submitted))
+        submit_cmd=test_executor.submitted[0]
+        self.assertEqual("--task=%s"%self.config.drmConfig.bundleCmd, submit_cmd[1])
+        self.assertTrue("'%s': 'bundle/%s.json'"%(BUNDLE_PLAN, BUNDLE_PLAN) in submit_cmd[3])
+        planpath=os.path.join(self.config.wsConfig.workspaceRoot, 'testrun', 'bundle', '%s.json'%BUNDLE_PLAN)
+        self.assertTrue(os.path.exists(planpath))
+
 
 def _testconfig():
     config={}
@@ -206,6 +237,7 @@ def _testconfig():
     drm[DRM_PROTOCOL]="local"
     drm[DRM_HOST]="localhost"
     drm[DRM_PORT]=""
+    drm[DRM_ACCESS_VERSION]=1
     config[CONFIG_DRM]=drm
 
     ws={}
@@ -219,6 +251,7 @@ def _testconfig():
     config[CONFIG_PROXYFCTS_DIR]=os.path.join(tmpdir,"code","proxyfcts")
     config[PKG_REPOSITORY]=os.path.join(tmpdir,"code","pkgdefs")
     config[PIPELINE_DIR]=os.path.join(tmpdir,"code","scripts")
+    config[CREDENTIALS]={WS_USERNAME:"euclid", WS_PASSWORD:"euclid",DRM_USERNAME:"euclid",DRM_PASSWORD:"euclid"}
     
     os.makedirs(config[CONFIG_WS][WS_ROOT])    
     os.makedirs(config[CONFIG_LOCALCACHE])
@@ -227,7 +260,6 @@ def _testconfig():
     os.makedirs(config[PIPELINE_DIR])
 
     configuration=RunServerConfiguration(config)
-    configuration.credentials=HpcAccessCredentials({WS_USERNAME:"euclid", WS_PASSWORD:"euclid",DRM_USERNAME:"euclid",DRM_PASSWORD:"euclid"})
     configuration.pkgRepository=config[PKG_REPOSITORY]
     return configuration
 
@@ -267,6 +299,7 @@ class TestCmdExecutor(AbstractCmdExecutor):
         self.checkstatus_process_final=self._get_checkstatus(final_status, fail_check)
         self.checked=0
         self.numofchecks=numofchecks
+        self.submitted=[]
         
             
     def _get_submit_process(self, fail):
@@ -301,12 +334,13 @@ class TestCmdExecutor(AbstractCmdExecutor):
 
 
     def _handle_submit(self, cmdArray):
+        self.submitted.append(cmdArray)
         taskname=cmdArray[1][len("--task="):]
         workdir=cmdArray[2][len("--workdir="):]
         inputs=cmdArray[3][len("--inputs="):]
         outputs=eval(cmdArray[4][len("--outputs="):])
         logdir=cmdArray[5][len("--logdir="):]
-        outputfilepath=os.path.join(workdir, outputs['c'])
+        outputfilepath=os.path.join(self.config.wsConfig.workspaceRoot, workdir, outputs.get('c', outputs.get('test_exec.c')))
         os.makedirs(os.path.dirname(outputfilepath))
         with open(outputfilepath, 'w') as outputfile:
             outputfile.write("%s\n"%taskname)
@@ -347,7 +381,7 @@ def _create_graph(pkgrepos):
     def test_exec(**kwargs):
         inputnames=("a","b")
         outputnames=("c")
-        pkgsource=PackageSource("testpkg", pkgrepos)
+        pkgsource=Package("testpkg")
         taskprops=TaskProperties("test_exec", pkgsource)
         return invoke_task(taskprops, inputnames, outputnames, **kwargs)
     
@@ -0,0 +1,79 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from euclidwf.utilities import pkgdef_index
+from euclidwf.utilities.pkgdef_index import PkgdefIndex
+
+PKGDEF='''
+from euclidwf.framework.taskdefs import Executable, Input, Output, ComputingResources
+
+step1=Executable("step1.sh",
+       inputs=[Input("a"), Input("b")],
+       outputs=[Output("c")],
+       resources=ComputingResources(cores=2, ram=1.0, walltime=0.5)
+    )
+'''
+
+
+class TestPkgdefIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.pkgrepos=os.path.join(self.testdir, 'pkgdefs')
+        self.cachedir=os.path.join(self.testdir, 'cache')
+        os.makedirs(self.pkgrepos)
+        with open(os.path.join(self.pkgrepos, 'testpkg.py'), 'w') as f:
+            f.write(PKGDEF)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _not_imported(self, pkgname):
+        self.fail("Package %s imported."%pkgname)
+
+
+    def test_cache_outside_repository(self):
+        path=pkgdef_index.cachepath(self.pkgrepos, self.cachedir)
+        self.assertEqual(self.cachedir, os.path.dirname(path))
+        self.assertNotEqual(path, pkgdef_index.cachepath(os.path.join(self.testdir, 'other'), self.cachedir))
+        index=PkgdefIndex(path)
+        executables=index.get_all_executables(self.pkgrepos, self._not_imported)
+        self.assertEqual(['step1'], executables.keys())
+        self.assertEqual(['a', 'b'], [i.name for i in executables['step1'].inputs])
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(['testpkg.py'], os.listdir(self.pkgrepos))
+
+
+    def test_cached(self):
+        path=pkgdef_index.cachepath(self.pkgrepos, self.cachedir)
+        PkgdefIndex(path).get_all_executables(self.pkgrepos, self._not_imported)
+        index=PkgdefIndex(path)
+        executables=index.get_all_executables(self.pkgrepos, self._not_imported)
+        self.assertEqual('step1.sh', executables['step1'].command)
+        self.assertEqual({'parsed':0, 'cached':1, 'imported':0}, index.get_statistics())
+
+
+    def test_default_cachedir(self):
+        xdg_cache_home=os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME']=self.cachedir
+        try:
+            path=pkgdef_index.cachepath(self.pkgrepos)
+        finally:
+            if xdg_cache_home is None:
+                del os.environ['XDG_CACHE_HOME']
+            else:
+                os.environ['XDG_CACHE_HOME']=xdg_cache_home
+        self.assertEqual(os.path.join(self.cachedir, pkgdef_index.INDEX_DIR), os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from euclidwf.framework.context import WSROOT, WORKDIR
+from euclidwf.framework.result_cache import ResultCache, ChecksumIndex, cache_key
+from euclidwf.framework.taskdefs import ComputingResources
+from euclidwf.utilities.file_transporter import LocalFileTransporter
+
+
+class _Executable(object):
+    def __init__(self, command, resources):
+        self.command=command
+        self.pkgname='pkg'
+        self.resources=resources
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir=tempfile.mkdtemp()
+        self.context={WSROOT:os.path.join(self.testdir, 'ws'), WORKDIR:'run1'}
+        self.indexpath=os.path.join(self.testdir, 'localcache', 'result_cache.json')
+        self.transporter=LocalFileTransporter(link_mode='copy')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _write(self, workdir, path, content):
+        abspath=os.path.join(self.context[WSROOT], workdir, path)
+        if not os.path.exists(os.path.dirname(abspath)):
+            os.makedirs(os.path.dirname(abspath))
+        with open(abspath, 'w') as f:
+            f.write(content)
+
+
+    def _read(self, workdir, path):
+        with open(os.path.join(self.context[WSROOT], workdir, path)) as f:
+            return f.read()
+
+
+    def _result(self, d):
+        results=[]
+        d.addBoth(results.append)
+        return results[0]
+
+
+    def test_cache_key(self):
+        executable=_Executable('cmd', ComputingResources(1, 1.0, 1.0))
+        key=cache_key(executable, {'a':'123', 'b':'456'})
+        self.assertEqual(key, cache_key(executable, {'b':'456', 'a':'123'}))
+        self.assertNotEqual(key, cache_key(executable, {'a':'123', 'b':'457'}))
+        self.assertNotEqual(key, cache_key(_Executable('cmd', ComputingResources(2, 1.0, 1.0)), {'a':'123', 'b':'456'}))
+        self.assertNotEqual(key, cache_key(_Executable('cmd2', ComputingResources(1, 1.0, 1.0)), {'a':'123', 'b':'456'}))
+
+
+    def test_store_and_fetch(self):
+        cache=ResultCache(self.indexpath, 'cache')
+        self._write('run1', 'task/c.xml', 'result')
+        self._result(cache.store('key', {'c':'task/c.xml'}, self.context, self.transporter))
+        self.assertTrue(cache.has_entry('key'))
+
+        context={WSROOT:self.context[WSROOT], WORKDIR:'run2'}
+        self.assertFalse(self._result(cache.fetch('other', {'c':'task/c.xml'}, context, self.transporter)))
+        self.assertTrue(self._result(cache.fetch('key', {'c':'task/c.xml'}, context, self.transporter)))
+        self.assertEqual('result', self._read('run2', 'task/c.xml'))
+        stats=cache.get_statistics()
+        self.assertEqual((1, 1, 1), (stats['hits'], stats['misses'], stats['stores']))
+
+        # the index is persistent
+        cache=ResultCache(self.indexpath, 'cache')
+        self.assertTrue(cache.has_entry('key'))
+
+
+    def test_workdir_cleaned(self):
+        cache=ResultCache(self.indexpath, 'cache')
+        self._write('run1', 'task/c.xml', 'result')
+        self._result(cache.store('key', {'c':'task/c.xml'}, self.context, self.transporter))
+        # the output is moved into the cache and linked back
+        self.assertEqual('result', self._read('run1', 'task/c.xml'))
+        shutil.rmtree(os.path.join(self.context[WSROOT], 'run1'))
+        context={WSROOT:self.context[WSROOT], WORKDIR:'run2'}
+        self.assertTrue(self._result(cache.fetch('key', {'c':'task/c.xml'}, context, self.transporter)))
+        self.assertEqual('result', self._read('run2', 'task/c.xml'))
+
+
+    def test_checksum_index(self):
+        indexpath=os.path.join(self.testdir, 'localcache', 'checksums.jsonl')
+        path=os.path.join(self.context[WSROOT], 'run1', 'a.xml')
+        self._write('run1', 'a.xml', 'input')
+        index=ChecksumIndex(indexpath)
+        md5=self._result(index.checksum(path, self.transporter))
+        self.assertEqual(md5, self._result(index.checksum(path, self.transporter)))
+        self.assertEqual((1, 1), (index.get_statistics()['computed'], index.get_statistics()['hits']))
+
+        # the index is persistent
+        index=ChecksumIndex(indexpath)
+        self.assertEqual(md5, self._result(index.checksum(path, self.transporter)))
+        self.assertEqual(0, index.get_statistics()['computed'])
+
+        # changed products are read again
+        self._write('run1', 'a.xml', 'changed input')
+        self.assertNotEqual(md5, self._result(index.checksum(path, self.transporter)))
+        self.assertEqual(1, index.get_statistics()['computed'])
+
+
+    def test_checksum_index_same_size_rewrite(self):
+        indexpath=os.path.join(self.testdir, 'localcache', 'checksums.jsonl')
+        path=os.path.join(self.context[WSROOT], 'run1', 'a.xml')
+        self._write('run1', 'a.xml', 'input')
+        index=ChecksumIndex(indexpath)
+        md5=self._result(index.checksum(path, self.transporter))
+
+        # rewritten with the same size and the same modification time
+        mtime=os.stat(path).st_mtime
+        self._write('run1', 'b.xml', 'INPUT')
+        os.rename(os.path.join(self.context[WSROOT], 'run1', 'b.xml'), path)
+        os.utime(path, (mtime, mtime))
+        self.assertNotEqual(md5, self._result(index.checksum(path, self.transporter)))
+        self.assertEqual(2, index.get_statistics()['computed'])
+
+
+    def test_store_failure(self):
+        cache=ResultCache(self.indexpath, 'cache')
+        self.assertEqual(None, self._result(cache.store('key', {'c':'task/c.xml'}, self.context, self.transporter)))
+        self.assertFalse(cache.has_entry('key'))
+        self.assertEqual(1, cache.get_statistics()['store_failures'])
+
+
+    def test_missing_outputs(self):
+        cache=ResultCache(self.indexpath, 'cache')
+        self._write('run1', 'task/c.xml', 'result')
+        self._result(cache.store('key', {'c':'task/c.xml'}, self.context, self.transporter))
+        os.remove(os.path.join(self.context[WSROOT], 'cache', 'key', 'c.xml'))
+        self.assertFalse(self._result(cache.fetch('key', {'c':'task/c.xml'}, self.context, self.transporter)))
+        self.assertFalse(cache.has_entry('key'))
+
+
+    def test_lru_eviction(self):
+        cache=ResultCache(self.indexpath, 'cache', max_entries=2)
+        for key in ('k1', 'k2'):
+            self._write('run1', '%s/c.xml'%key, key)
+            self._result(cache.store(key, {'c':'%s/c.xml'%key}, self.context, self.transporter))
+        self.assertTrue(self._result(cache.fetch('k1', {'c':'x/c.xml'}, self.context, self.transporter)))
+        self._write('run1', 'k3/c.xml', 'k3')
+        self._result(cache.store('k3', {'c':'k3/c.xml'}, self.context, self.transporter))
+        self.assertTrue(cache.has_entry('k1'))
+        self.assertFalse(cache.has_entry('k2'))
+        self.assertFalse(os.path.exists(os.path.join(self.context[WSROOT], 'cache', 'k2', 'c.xml')))
+        self.assertEqual(1, cache.get_statistics()['evictions'])
+
+
+    def test_size_eviction(self):
+        cache=ResultCache(self.indexpath, 'cache', max_bytes=10)
+        for key in ('k1', 'k2'):
+            self._write('run1', '%s/c.xml'%key, '123456')
+            self._result(cache.store(key, {'c':'%s/c.xml'%key}, self.context, self.transporter))
+        self.assertFalse(cache.has_entry('k1'))
+        self.assertTrue(cache.has_entry('k2'))
+        self.assertEqual(6, cache.size())
+
+
+if __name__ == '__main__':
+    unittest.main()
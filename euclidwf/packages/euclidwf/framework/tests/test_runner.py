@@ -6,6 +6,7 @@ Created on Jun 25, 2015
 import tempfile
 from inspect import isfunction
 import os
+import shutil
 import sys
 import unittest
 
@@ -16,16 +17,17 @@ from pydron.dataflow.graph import Graph
 from euclidwf.framework.context import CONTEXT
 from euclidwf.framework.drm_access import JOB_EXECUTING, JOB_COMPLETED, JOB_ERROR
 from euclidwf.framework.runner import PipelineExecution, RUNID, REPORT, PIPELINE,\
-    SUBMITTED, STATUS, CONFIG, INPUTS, OUTPUTS
+    SUBMITTED, STATUS, CONFIG, INPUTS, OUTPUTS, EXECSTATUS_ABORTED, EXECSTATUS_COMPLETED
 from euclidwf.utilities.cmd_executor import AbstractCmdExecutor
 from euclidwf.server.server_model import RunConfiguration, LOGDIR, WORKDIR,\
     DRM_CONFIGURE_CMD, DRM_SUBMIT_CMD, DRM_CHECKSTATUS_CMD, DRM_CLEANUP_CMD,\
     DRM_DELETE_CMD, DRM_STATUSCHECK_POLLTIME, DRM_STATUSCHECK_TIMEOUT, DRM_HOST,\
-    DRM_PORT, CONFIG_DRM, WS_HOST, WS_PORT, CONFIG_WS, CONFIG_LOCALCACHE,\
+    DRM_PORT, DRM_ACCESS_VERSION, CONFIG_DRM, WS_HOST, WS_PORT, CONFIG_WS, CONFIG_LOCALCACHE,\
     CONFIG_PROXYFCTS_DIR, PKG_REPOSITORY, PIPELINE_DIR, RunServerConfiguration,\
     WS_USERNAME, WS_PASSWORD, DRM_USERNAME, DRM_PASSWORD, INPUTDATA_PATHS, \
-    PIPELINE_SCRIPT, CREDENTIALS, WS_ROOT, DRM_PROTOCOL, WS_PROTOCOL
-from euclidwf.framework import node_callbacks, drm_access, drm_access2
+    PIPELINE_SCRIPT, CREDENTIALS, WS_ROOT, DRM_PROTOCOL, WS_PROTOCOL, RUN_WEIGHT
+from euclidwf.utilities.error_handling import RunConfigurationError
+from euclidwf.framework import admission, result_cache
 import json
 
 
@@ -39,6 +41,7 @@ class TestRunner(unittest.TestCase):
         data={RUNID:"1", WORKDIR:'testdir', LOGDIR:'logs', PIPELINE_SCRIPT:'testpipeline.py',
               PIPELINE_DIR:self.config.pipelineDir, PKG_REPOSITORY: self.config.pkgRepository, 
               INPUTDATA_PATHS:inputDataPaths, CREDENTIALS:self.config.credentials}
+        self.data = data
         self.inputs = RunConfiguration(data)
 
         workdir=os.path.join(self.config.wsConfig.workspaceRoot, self.inputs.workdir)
@@ -95,8 +98,95 @@ class TestRunner(unittest.TestCase):
         self.assertTrue(result_dict[OUTPUTS][WORKDIR])
             
 
+    def test_result_cache(self):
+        self.config.wsConfig.resultCacheDir='resultcache'
+        self.addCleanup(result_cache._caches.clear)
+        self.addCleanup(result_cache._checksum_indexes.clear)
+        execution = PipelineExecution(self.inputs, self.config)
+        execution.initialize()
+        execution.callbacks._cmd_executor=TestCmdExecutor(self.config, "1", False, 0, False, JOB_COMPLETED)
+        execution.start()
+        self.assertEquals(JOB_COMPLETED, execution.report[0]['status'])
+        self.assertEquals({'hits':0, 'misses':1}, {k:v for k,v in execution.get_statistics()['resultCache'].iteritems() if k not in ('cache', 'checksums')})
+
+        # run again with the same inputs in another workdir
+        self.inputs.runid="2"
+        self.inputs.workdir="testdir2"
+        workdir=os.path.join(self.config.wsConfig.workspaceRoot, self.inputs.workdir)
+        os.makedirs(workdir)
+        for path in ('a.xml', 'b.xml'):
+            shutil.copy(os.path.join(self.config.wsConfig.workspaceRoot, 'testdir', path), workdir)
+        execution = PipelineExecution(self.inputs, self.config)
+        execution.initialize()
+        execution.callbacks._cmd_executor=None # must not be used
+        execution.start()
+        self.assertEquals('test_exec/c.xml', execution.outputs['c'])
+        self.assertTrue(os.path.exists(os.path.join(workdir, 'test_exec', 'c.xml')))
+        self.assertEquals(JOB_COMPLETED, execution.report[0]['status'])
+        self.assertTrue(execution.report[0]['cached'])
+        self.assertEquals(1, execution.get_statistics()['resultCache']['hits'])
+
+
+    def test_resume_completed(self):
+        execution = PipelineExecution(self.inputs, self.config)
+        execution.initialize()
+        execution.callbacks._cmd_executor=TestCmdExecutor(self.config, "1", False, 0, False, JOB_COMPLETED)
+        execution.start()
+        self.assertEquals(EXECSTATUS_COMPLETED, execution.status)
+
+        # resumed after a restart - the job completed is not submitted again
+        execution = PipelineExecution(self.inputs, self.config, resume=True)
+        execution.initialize()
+        execution.callbacks._cmd_executor=None # must not be used
+        execution.start()
+        self.assertEquals(EXECSTATUS_COMPLETED, execution.status)
+        self.assertEquals('test_exec/c.xml', execution.outputs['c'])
+        self.assertEquals(JOB_COMPLETED, execution.report[0]['status'])
+        self.assertEquals('1', execution.report[0]['pid'])
+
+
+    def test_resume_submitted(self):
+        execution = PipelineExecution(self.inputs, self.config)
+        execution.initialize()
+        executor=TestCmdExecutor(self.config, "1", False, 1000, False, JOB_COMPLETED)
+        execution.callbacks._cmd_executor=executor
+        execution.start()
+        poller=execution.callbacks._status_poller
+        execution.cancel()
+        self.assertEquals(EXECSTATUS_ABORTED, execution.status)
+        # the job keeps running on the DRM - and keeps its admission slot until it has ended
+        self.assertEquals(1, len(poller.get_jobs()))
+        self.assertEquals(1, admission.controller.get_state()['runs'][self.inputs.runid]['inFlight'])
+        executor.numofchecks=0
+        poller._check_batch(poller.get_jobs())
+        self.assertFalse(poller.get_jobs())
+        self.assertNotIn(self.inputs.runid, admission.controller.get_state()['runs'])
+
+        # resumed - the job still in flight is re-attached and not submitted again
+        execution = PipelineExecution(self.inputs, self.config, resume=True)
+        execution.initialize()
+        test_executor=TestCmdExecutor(self.config, "1", True, 0, False, JOB_COMPLETED)
+        execution.callbacks._cmd_executor=test_executor
+        execution.start()
+        self.assertEquals(EXECSTATUS_COMPLETED, execution.status)
+        self.assertEquals('test_exec/c.xml', execution.outputs['c'])
+        self.assertEquals('1', execution.report[0]['pid'])
+        self.assertEquals(1, test_executor.checked)
+
+
+    def test_weight(self):
+        data=dict(self.data)
+        data[RUN_WEIGHT]=2.5
+        execution = PipelineExecution(RunConfiguration(data), self.config)
+        execution.initialize()
+        self.assertEquals(2.5, admission.controller.get_state()['runs'][self.inputs.runid]['weight'])
+        self.assertEquals(2.5, execution.rundata()[RUN_WEIGHT])
+        execution.callbacks.close()
+        data[RUN_WEIGHT]=0
+        self.assertRaises(RunConfigurationError, RunConfiguration, data)
+
+
     def test_start_error(self):
-        node_callbacks.DRM=drm_access
         execution = PipelineExecution(self.inputs, self.config)
         execution.initialize()
         test_executor=TestCmdExecutor(self.config, "1", False, 0, False, JOB_ERROR)
@@ -110,7 +200,7 @@ class TestRunner(unittest.TestCase):
         self.assertEquals('test_exec', execution.report[0]['path'])
     
     def test_start_error_drm2(self):
-        node_callbacks.DRM=drm_access2
+        self.config.drmConfig.accessVersion=2
         execution = PipelineExecution(self.inputs, self.config)
         execution.initialize()
         test_executor=TestCmdExecutor2(self.config, "1", False, 0, False, JOB_ERROR)
@@ -126,7 +216,6 @@ class TestRunner(unittest.TestCase):
 
 
     def test_start_failed_submit(self):
-        node_callbacks.DRM=drm_access
         execution = PipelineExecution(self.inputs, self.config)
         execution.initialize()
         test_executor=TestCmdExecutor(self.config, "1", True, 0, False, JOB_ERROR)
@@ -154,6 +243,7 @@ def _testconfig():
     drm[DRM_PROTOCOL]="local"
     drm[DRM_HOST]="localhost"
     drm[DRM_PORT]=""
+    drm[DRM_ACCESS_VERSION]=1
     config[CONFIG_DRM]=drm
 
     ws={}
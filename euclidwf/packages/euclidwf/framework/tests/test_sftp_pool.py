@@ -0,0 +1,150 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import unittest
+
+from twisted.internet import defer, error, task
+from twisted.python.failure import Failure
+
+from euclidwf.utilities.sftp_pool import SFTPSessionPool, SFTPSession
+
+
+class TestSFTPSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.clock=task.Clock()
+        self.connections=[]
+        self.pool=SFTPSessionPool('host', 'user', max_sessions=2, idle_timeout=300.0, keepalive_interval=60.0,
+                                  clock=self.clock, connect=self._connect)
+
+
+    def tearDown(self):
+        self.pool.close()
+
+
+    def _connect(self, hostname, username, password):
+        connection=MockConnection()
+        self.connections.append(connection)
+        return defer.succeed(connection)
+
+
+    def _idle_session(self):
+        sessions=[]
+        self.pool.run(lambda sftp: defer.succeed(sessions.append(sftp)))
+        return sessions[0]
+
+
+    def test_reuse(self):
+        sftp=self._idle_session()
+        self.assertIs(sftp, self._idle_session())
+        self.assertEqual(1, self.pool.stats['sessions_opened'])
+        self.assertEqual(1, self.pool.stats['sessions_reused'])
+
+
+    def test_closed_session_not_reused(self):
+        sftp=self._idle_session()
+        sftp.close()
+        self.assertIsNot(sftp, self._idle_session())
+        self.assertEqual(2, self.pool.stats['sessions_opened'])
+
+
+    def test_keep_alive(self):
+        sftp=self._idle_session()
+        self.clock.advance(60.0)
+        self.assertEqual(['.'], sftp.session.stats)
+        self.assertIs(sftp, self._idle_session())
+
+
+    def test_keep_alive_connection_lost(self):
+        sftp=self._idle_session()
+        sftp.session.failure=error.ConnectionLost()
+        self.clock.advance(60.0)
+        self.assertTrue(self.connections[0].closed_called)
+        self.assertIsNot(sftp, self._idle_session())
+        self.assertEqual(2, len(self.connections))
+
+
+    def test_keep_alive_session_failed(self):
+        sftp=self._idle_session()
+        sftp.session.failure=IOError("Channel closed.")
+        self.clock.advance(60.0)
+        self.assertTrue(sftp.session.closed_called)
+        self.assertFalse(self.connections[0].closed_called)
+        self.assertIsNot(sftp, self._idle_session())
+        self.assertEqual(1, len(self.connections))
+
+
+    def test_session(self):
+        sftp=self._idle_session()
+        self.assertIsInstance(sftp, SFTPSession)
+        results=[]
+        sftp.stat('path').addCallback(results.append)
+        sftp.make_link('target', 'link').addCallback(results.append)
+        sftp.rename_file('src', 'dest').addCallback(results.append)
+        self.assertEqual([{'size':0}, None, None], results)
+        self.assertEqual(['path'], sftp.session.stats)
+        self.assertEqual([('link', 'target', 'link'), ('rename', 'src', 'dest')], sftp.session.requests)
+
+
+class MockEvent(object):
+
+    def __init__(self):
+        self.callbacks=[]
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def fire(self, value):
+        for callback in self.callbacks:
+            callback(value)
+
+
+class MockConnection(object):
+
+    def __init__(self):
+        self.closed=MockEvent()
+        self.closed_called=False
+
+    def open_sftp(self):
+        return defer.succeed(MockSFTP())
+
+    def close(self):
+        self.closed_called=True
+        return defer.succeed(None)
+
+
+class MockSFTP(object):
+
+    def __init__(self):
+        self.closed=MockEvent()
+        self.closed_called=False
+        self.failure=None
+        self.stats=[]
+        self.requests=[]
+        # the SFTP client of the remoot session
+        self._client=self
+
+    def getAttrs(self, path):
+        self.stats.append(path)
+        if self.failure:
+            return defer.fail(Failure(self.failure))
+        return defer.succeed({'size':0})
+
+    def makeLink(self, target, linkpath):
+        self.requests.append(('link', target, linkpath))
+        return defer.succeed(None)
+
+    def renameFile(self, src, dest):
+        self.requests.append(('rename', src, dest))
+        return defer.succeed(None)
+
+    def close(self):
+        self.closed_called=True
+        self.closed.fire(None)
+        return defer.succeed(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
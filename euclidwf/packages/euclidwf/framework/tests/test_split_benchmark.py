@@ -0,0 +1,102 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import unittest
+
+from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK, Graph, Endpoint, GraphObserver
+from pydron.interpreter import graphdecorator
+
+from euclidwf.framework.graph_tasks import ExecTask, ParallelSplitTask
+from euclidwf.framework.taskdefs import Package
+
+WIDTH=1000
+
+
+def _body_graph():
+    pkg=Package('benchpkg')
+    step1=ExecTask('step1', pkg, ('a','b'), ('c',))
+    step2=ExecTask('step2', pkg, ('c',), ('d',))
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        C(START_TICK, 'context', 2, 'context'),
+        T(1, step1, {'name':'step1', 'path':'step1'}),
+        C(1, 'c', 2, 'c'),
+        T(2, step2, {'name':'step2', 'path':'step2'}),
+        C(2, 'd', FINAL_TICK, 'd'),
+    )
+
+
+class _EventCounter(GraphObserver):
+    """
+    Counts the events of a graph and the scans of all its ticks.
+    """
+    def __init__(self, g):
+        self.events=[]
+        self.bulk_events=[]
+        self.scans=0
+        g.subscribe(self)
+        get_all_ticks=g.get_all_ticks
+        def counting_get_all_ticks():
+            self.scans+=1
+            return get_all_ticks()
+        g.get_all_ticks=counting_get_all_ticks
+
+    def connected(self, source, dest):
+        self.events.append('connected')
+
+    def task_added(self, tick, task, properties):
+        self.events.append('task_added')
+
+    def task_removed(self, tick):
+        self.events.append('task_removed')
+
+    def bulk_inserted(self, ticks, connections):
+        self.bulk_events.append((len(ticks), len(connections)))
+
+
+class TestSplitBenchmark(unittest.TestCase):
+
+    def _refine(self, width):
+        # the graph as seen by the traverser
+        base=Graph()
+        g=graphdecorator.ReadyDecorator(graphdecorator.RefineDecorator(graphdecorator.DataGraphDecorator(base)))
+        task=ParallelSplitTask(_body_graph(), 'a', 'd_list', 'ps')
+        tick=START_TICK+1
+        g.add_task(tick, task, {'name':'ps', 'path':'ps'})
+        for port in ('a','b','context'):
+            g.connect(Endpoint(START_TICK, port), Endpoint(tick, port))
+        g.connect(Endpoint(tick, 'd_list'), Endpoint(FINAL_TICK, 'd_list'))
+        counter=_EventCounter(base)
+        task.adjust_graph(g, tick, ['item%i'%i for i in range(width)])
+        return g, tick, counter
+
+
+    def test_refine_wide_split(self):
+        g, tick, counter=self._refine(WIDTH)
+
+        # map and reduce task plus two tasks per iteration
+        self.assertEqual(2*WIDTH+2, len(g.get_all_ticks()))
+        # the tasks and connections of all iterations are added in one bulk insert
+        self.assertEqual([(2*WIDTH, 6*WIDTH)], counter.bulk_events)
+
+        iteration_tick=START_TICK+WIDTH<<((START_TICK+2)<<tick)
+        self.assertEqual('ps.iterations.%i.step2'%WIDTH, g.get_task_properties(START_TICK+2<<iteration_tick)['path'])
+        # inputs a, b and context of the first step
+        self.assertEqual(3, g.get_task_properties(START_TICK+1<<iteration_tick)['ready_count'])
+
+
+    def test_operations_independent_of_width(self):
+        _, _, narrow=self._refine(10)
+        _, _, wide=self._refine(WIDTH)
+        # no events per iteration and no scan of all ticks per iteration
+        self.assertEqual(narrow.events, wide.events)
+        self.assertEqual(len(narrow.bulk_events), len(wide.bulk_events))
+        self.assertEqual(narrow.scans, wide.scans)
+
+
+if __name__ == '__main__':
+    unittest.main()
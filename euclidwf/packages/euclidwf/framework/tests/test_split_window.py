@@ -0,0 +1,171 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from twisted.internet import defer
+
+from pydron.dataflow.graph import G, C, T, START_TICK, FINAL_TICK
+from pydron.interpreter.traverser import Traverser, EvalResult
+
+from euclidwf.framework import admission
+from euclidwf.framework.context import TRANSPORTER, WSROOT, WORKDIR, LOCALWORKDIR
+from euclidwf.framework.graph_tasks import ExecTask, ParallelSplitTask, HelperTask,\
+    _ListManifest, DEFAULT_WINDOW, WINDOW_AUTO
+from euclidwf.framework.taskdefs import Package
+from euclidwf.utilities import listfile
+from euclidwf.utilities.file_transporter import LocalFileTransporter
+
+INPUT_LIST=['x%i'%i for i in range(1, 6)]
+
+
+def _body_graph():
+    pkg=Package('windowpkg')
+    step1=ExecTask('step1', pkg, ('a','b'), ('c',))
+    step2=ExecTask('step2', pkg, ('c',), ('d',))
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        C(START_TICK, 'context', 2, 'context'),
+        T(1, step1, {'name':'step1', 'path':'step1'}),
+        C(1, 'c', 2, 'c'),
+        T(2, step2, {'name':'step2', 'path':'step2'}),
+        C(2, 'd', FINAL_TICK, 'd'),
+    )
+
+
+def _pipeline_graph(task):
+    return G(
+        C(START_TICK, 'a', 1, 'a'),
+        C(START_TICK, 'b', 1, 'b'),
+        C(START_TICK, 'context', 1, 'context'),
+        T(1, task, {'name':'ps', 'path':'ps'}),
+        C(1, 'd_list', FINAL_TICK, 'd_list'),
+    )
+
+
+class TestSplitWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.pending=[]
+        self.max_jobs=0
+        self.testdir=tempfile.mkdtemp()
+        self.context={TRANSPORTER:LocalFileTransporter(link_mode='copy'), WSROOT:os.path.join(self.testdir, 'ws'),
+                      WORKDIR:'run', LOCALWORKDIR:os.path.join(self.testdir, 'local')}
+
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+
+    def _refine(self, g, tick, task, inputs):
+        if isinstance(task, ParallelSplitTask):
+            task.adjust_graph(g, tick, INPUT_LIST)
+            return defer.succeed(INPUT_LIST)
+        return task.refine(g, tick, inputs)
+
+
+    def _evaluate(self, g, tick, task, inputs):
+        if isinstance(task, HelperTask):
+            return task.evaluate(g, tick, task, inputs)
+        jobs=[t for t in g.get_all_ticks() if isinstance(g.get_task(t), ExecTask)]
+        self.max_jobs=max(self.max_jobs, len(jobs))
+        d=defer.Deferred()
+        self.pending.append((d, task, inputs))
+        return d
+
+
+    def _run(self, task):
+        traverser=Traverser(self._refine, self._evaluate)
+        results=[]
+        traverser.execute(_pipeline_graph(task), {'a':'list', 'b':'b', 'context':self.context}).addBoth(results.append)
+        # complete the jobs in the reverse order of their submission
+        while self.pending:
+            d, task, inputs=self.pending.pop()
+            value="%s(%s)"%(task.command, inputs['a'] if 'a' in inputs else inputs['c'])
+            d.callback(EvalResult({list(task.outputnames)[0]:value}))
+        return traverser, results[0]
+
+
+    def _outputlist(self, result):
+        return list(listfile.load_list(os.path.join(self.context[WSROOT], self.context[WORKDIR], result['d_list'])))
+
+
+    def test_window(self):
+        task=ParallelSplitTask(_body_graph(), 'a', 'd_list', 'ps', window=2)
+        traverser, result=self._run(task)
+        self.assertEqual({'d_list':'ps.reduce/d_list'}, result)
+        self.assertEqual([('step2(step1(%s))'%x,) for x in INPUT_LIST], self._outputlist(result))
+        # two steps for each of the two iterations in the window
+        self.assertEqual(4, self.max_jobs)
+
+        g=traverser.get_graph()
+        reduce_tick=START_TICK+3<<(START_TICK+1)
+        records=g.get_task_properties(reduce_tick)['collapsed']
+        self.assertEqual(range(5), sorted(record.iteration for record in records))
+        self.assertFalse([t for t in g.get_all_ticks() if isinstance(g.get_task(t), ExecTask)])
+
+
+    def test_window_larger_than_list(self):
+        task=ParallelSplitTask(_body_graph(), 'a', 'd_list', 'ps', window=10)
+        _, result=self._run(task)
+        self.assertEqual([('step2(step1(%s))'%x,) for x in INPUT_LIST], self._outputlist(result))
+        self.assertEqual(2*len(INPUT_LIST), self.max_jobs)
+
+
+    def test_window_size(self):
+        task=ParallelSplitTask(_body_graph(), 'a', 'd_list', 'ps', window=WINDOW_AUTO)
+        max_jobs, max_jobs_per_run=admission.controller.max_jobs, admission.controller.max_jobs_per_run
+        try:
+            admission.controller.configure(None, None)
+            self.assertEqual(DEFAULT_WINDOW, task._window_size(10*DEFAULT_WINDOW))
+            admission.controller.configure(100, 20)
+            self.assertEqual(40, task._window_size(1000))
+            self.assertEqual(30, task._window_size(30))
+        finally:
+            admission.controller.configure(max_jobs, max_jobs_per_run)
+
+
+    def test_list_manifest(self):
+        path=os.path.join(self.testdir, 'list')
+        manifest=_ListManifest(path, 3)
+        manifest.append(2, ('c', 3))
+        manifest.append(0, ('a', 1))
+        self.assertEqual([2], manifest.pending.keys())
+        self.assertRaises(ValueError, manifest.seal)
+        manifest.append(1, ('b', {'x':2}))
+        manifest.seal()
+        outputlist=listfile.load_list(path)
+        self.assertEqual(3, len(outputlist))
+        self.assertEqual(('c', 3), outputlist[-1])
+        self.assertEqual([('a', 1), ('b', {'x':2})], outputlist[:2])
+
+
+    def test_list_manifest_rewritten_after_link(self):
+        path=os.path.join(self.testdir, 'local', 'list')
+        wspath=os.path.join(self.testdir, 'ws', 'list')
+        os.makedirs(os.path.dirname(path))
+        manifest=_ListManifest(path, 1)
+        manifest.append(0, ('a', 1))
+        manifest.seal()
+        transporter=LocalFileTransporter(link_mode='hardlink')
+        transporter.upload_file(path, wspath)
+        self.assertEqual(os.stat(path).st_ino, os.stat(wspath).st_ino)
+        # rewritten - e.g. after a reset - while the linked copy is still in use
+        manifest=_ListManifest(path, 2)
+        self.assertEqual([('a', 1)], list(listfile.load_list(wspath)))
+        manifest.append(0, ('b', 2))
+        manifest.append(1, ('c', 3))
+        manifest.seal()
+        self.assertEqual([('a', 1)], list(listfile.load_list(wspath)))
+        self.assertEqual([('b', 2), ('c', 3)], list(listfile.load_list(path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
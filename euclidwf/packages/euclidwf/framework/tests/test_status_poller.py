@@ -0,0 +1,196 @@
+'''
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import json
+import unittest
+
+from twisted.internet import defer, task
+from twisted.python.failure import Failure
+
+from euclidwf.framework import drm_access, drm_access2
+from euclidwf.framework.node_callbacks import drm_module
+from euclidwf.framework.status_poller import StatusPoller, PollSchedule, _PollState
+from euclidwf.framework.taskdefs import ComputingResources
+from euclidwf.framework.tests.test_runner import MockProcess
+from euclidwf.server.server_model import JOB_EXECUTING, JOB_COMPLETED, JOB_QUEUED,\
+    DrmConfiguration, DRM_STATUSCHECK_POLLTIME, DRM_STATUSCHECK_TIMEOUT, DRM_PROTOCOL,\
+    DRM_HOST, DRM_PORT, DRM_ACCESS_VERSION
+
+
+class TestStatusPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.clock=task.Clock()
+        self.executor=BatchCmdExecutor()
+        self.statuses=[]
+        self.failures=[]
+
+
+    def _create_poller(self, drm=drm_access2, max_jobids=500):
+        return StatusPoller(self.executor.execute, drm, 'checkstatus', 10.0, self._on_status, self._on_failure,
+                            max_jobids, self.clock)
+
+
+    def _on_status(self, job, response):
+        self.statuses.append((job.pid, response.status))
+        if response.status==JOB_COMPLETED:
+            self.poller.remove(job)
+
+
+    def _on_failure(self, job, failure):
+        self.failures.append(job.pid)
+
+
+    def test_one_command_for_all_jobs(self):
+        self.poller=self._create_poller()
+        for pid in ['1','2','3']:
+            self.poller.add(MockJob(pid))
+        self.assertEqual([['1']], self.executor.commands)
+        self.statuses=[]
+        self.clock.advance(10.0)
+        self.assertEqual([['1'],['1','2','3']], self.executor.commands)
+        self.assertEqual([('1',JOB_EXECUTING),('2',JOB_EXECUTING),('3',JOB_EXECUTING)], self.statuses)
+
+
+    def test_batches(self):
+        self.poller=self._create_poller(max_jobids=2)
+        jobs=[MockJob(pid) for pid in ['1','2','3','4','5']]
+        for job in jobs:
+            self.poller._jobs[job.pid]=_PollState(job, 0.0)
+        self.poller.poll()
+        self.assertEqual([['1','2'],['3','4'],['5']], self.executor.commands)
+        self.assertEqual(5, len(self.statuses))
+
+
+    def test_drm_limit(self):
+        self.poller=self._create_poller(drm=drm_access)
+        self.assertEqual(1, self.poller.max_jobids)
+
+
+    def test_default_drm(self):
+        data={DRM_STATUSCHECK_POLLTIME:10.0, DRM_STATUSCHECK_TIMEOUT:100, DRM_PROTOCOL:'local', DRM_HOST:'localhost', DRM_PORT:''}
+        self.assertEqual(drm_access, drm_module(DrmConfiguration(data)))
+
+
+    def test_drm2_one_command(self):
+        data={DRM_STATUSCHECK_POLLTIME:10.0, DRM_STATUSCHECK_TIMEOUT:100, DRM_PROTOCOL:'local', DRM_HOST:'localhost', DRM_PORT:'',
+              DRM_ACCESS_VERSION:2}
+        config=DrmConfiguration(data)
+        self.poller=self._create_poller(drm=drm_module(config), max_jobids=config.statusCheckBatchSize)
+        pids=[str(i) for i in range(1,11)]
+        for pid in pids:
+            self.poller._jobs[pid]=_PollState(MockJob(pid), 0.0)
+        self.poller.poll()
+        self.assertEqual([pids], self.executor.commands)
+        self.assertEqual(10, len(self.statuses))
+
+
+    def test_stops_when_all_jobs_final(self):
+        self.poller=self._create_poller()
+        self.executor.final.add('1')
+        self.poller.add(MockJob('1'))
+        self.poller.add(MockJob('2'))
+        self.assertEqual([('1',JOB_COMPLETED)], self.statuses[:1])
+        self.assertEqual(['2'], [job.pid for job in self.poller.get_jobs()])
+        self.executor.final.add('2')
+        self.clock.advance(10.0)
+        self.assertEqual(['2'], self.executor.commands[-1])
+        self.assertEqual([], self.poller.get_jobs())
+        self.assertFalse(self.poller._loop.running)
+
+
+    def test_failed_check(self):
+        self.poller=self._create_poller()
+        self.executor.fail=True
+        self.poller.add(MockJob('1'))
+        self.assertEqual(['1'], self.failures)
+        self.assertEqual([], self.poller.get_jobs())
+
+
+    def test_backoff_while_queued(self):
+        schedule=PollSchedule(10.0, 300.0)
+        state=_PollState(MockJob('1'), 0.0)
+        delays=[]
+        for now in range(5):
+            state.update(JOB_QUEUED, now)
+            delays.append(schedule.next_delay(state, now))
+        self.assertEqual([20.0, 40.0, 80.0, 160.0, 300.0], delays)
+
+
+    def test_walltime_while_executing(self):
+        schedule=PollSchedule(10.0, 600.0)
+        state=_PollState(MockJob('1', walltime=1.0), 0.0)
+        state.update(JOB_QUEUED, 0.0)
+        state.update(JOB_EXECUTING, 100.0)
+        self.assertEqual(100.0, state.executing_since)
+        # long before the expected end the delay is bounded by max_delay
+        self.assertEqual(600.0, schedule.next_delay(state, 100.0))
+        self.assertEqual(100.0, schedule.next_delay(state, 3300.0))
+        # close to and after the expected end the job is checked with every poll
+        self.assertEqual(10.0, schedule.next_delay(state, 3690.0))
+        self.assertEqual(10.0, schedule.next_delay(state, 4000.0))
+
+
+    def test_polltime_without_walltime(self):
+        schedule=PollSchedule(10.0, 600.0)
+        state=_PollState(MockJob('1'), 0.0)
+        state.update(JOB_EXECUTING, 100.0)
+        self.assertEqual(10.0, schedule.next_delay(state, 100.0))
+
+
+    def test_only_due_jobs_polled(self):
+        self.poller=self._create_poller()
+        self.poller.schedule=PollSchedule(10.0, 100.0)
+        self.executor.queued.add('1')
+        self.poller.add(MockJob('1'))
+        self.assertEqual(20.0, self.poller.get_due(MockJob('1')))
+        self.clock.advance(10.0)
+        self.assertEqual([['1']], self.executor.commands)
+        self.clock.advance(10.0)
+        self.assertEqual([['1'],['1']], self.executor.commands)
+        self.assertEqual(60.0, self.poller.get_due(MockJob('1')))
+
+
+class BatchCmdExecutor():
+
+    def __init__(self):
+        self.commands=[]
+        self.final=set()
+        self.queued=set()
+        self.fail=False
+
+
+    def execute(self, command):
+        jobids=json.loads(command[-1])
+        self.commands.append(jobids)
+        statuses=[{"job_id":pid, "status":self._status(pid)} for pid in jobids]
+        reason=Failure(ValueError("Exception occurred")) if self.fail else None
+        return defer.succeed(MockProcess(json.dumps(statuses), "", reason))
+
+
+    def _status(self, pid):
+        if pid in self.final:
+            return JOB_COMPLETED
+        elif pid in self.queued:
+            return JOB_QUEUED
+        return JOB_EXECUTING
+
+
+class MockJob():
+
+    def __init__(self, pid, walltime=None):
+        self.pid=pid
+        if walltime:
+            self.executable=MockExecutable(ComputingResources(1, 1.0, walltime))
+
+
+class MockExecutable():
+
+    def __init__(self, resources):
+        self.resources=resources
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,9 +35,13 @@ When decorating such a function with @nested() a nested dataflow is defined.
 In contrast to the inline functions the sub-dataflow defined in by the method is 
 added to the overall dataflow in 'detached mode' - i.e. inputs and outputs are 
 connected with the parent dataflow only at runtime - when executing the dataflow. 
-Nested dataflows could be used (in the future) to define dataflow levels and 
-submit jobs that process sub-dataflows defined at a given level to a single compute 
-node in the processing infrastructure.
+Nested dataflows can be submitted as a single job that processes the sub-dataflow 
+on a single compute node in the processing infrastructure: set the property 'bundle' 
+(i.e. @nested(properties={'bundle':True})). The same applies to each iteration of a 
+parallel split (@parallel(iterable=myarg, properties={'bundle':True})). The steps 
+of a bundle run one after the other in a single job - which saves the time spent 
+in the queue of the DRM for all but the first step. Bundles may only contain 
+task invocations (and inline functions).
 
 Parallel splits are defined by setting the @parallel decorator to a function. 
 The function defines the logic to be executed per split ('body'). As an argument to the 
@@ -45,9 +49,21 @@ The function defines the logic to be executed per split ('body'). As an argument
 - the name of one of the arguments defined in the signature of the function. The split 
 will be defined on the basis of this 'iterable'. It means that as 'iterable' a 'list file' 
 is passed into the parallel split. The function body then sees the individual elements 
-of this list. This list is only available at runtime - it is a pickled python list of file
-paths. At runtime, the output from the parallel split, a pickled list of output tuples will
-be returned - each tuple containing the output returned from the body method.
+of this list. This list is only available at runtime - it is a list file (see 
+euclidwf.utilities.listfile; a pickled python list is accepted as well) of file paths. At runtime, 
+the output from the parallel split, a list file of output tuples will be returned - each tuple 
+containing the output returned from the body method.
+For long lists, set the property 'window' (i.e. @parallel(iterable=myarg, properties={'window':200}))
+to expand at most the given number of splits at a time - a split is removed from the dataflow as 
+soon as its outputs are available and the next one is expanded. With 'window' set to 'auto', the 
+number is derived from the number of jobs the processing infrastructure may run at a time.
+With a window, the output tuples are appended to the output list as the splits complete - 
+only sealing and uploading the list is left when the last split is done.
+A parallel split iterating over the output list of another parallel split waits for all the 
+splits of the latter to complete. If each of its splits only depends on the matching element, 
+declare it with the property 'elementwise' (i.e. @parallel(iterable=myarg, properties={'elementwise':True})): 
+both are then run as a single parallel split - each split of the second one starts as soon as the 
+matching split of the first one is done. The output list of the first split must not be used elsewhere.
     
 A pipeline consists of a pipeline function - a python function decorated with
 @pipeline which contains invocations of task proxy functions, inline functions, 
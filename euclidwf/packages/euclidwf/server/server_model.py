@@ -112,6 +112,10 @@ class ConfigurationResponse():
 # These should map to the fields in the DrmConfiguration class in java.       
 DRM_STATUSCHECK_POLLTIME = 'statusCheckPollTime'
 DRM_STATUSCHECK_TIMEOUT = 'statusCheckTimeout'
+DRM_STATUSCHECK_BATCHSIZE = 'statusCheckBatchSize'
+DRM_STATUSCHECK_MAXDELAY = 'statusCheckMaxDelay'
+DRM_MAX_JOBS = 'maxJobs'
+DRM_MAX_JOBS_PER_RUN = 'maxJobsPerRun'
 DRM_PROTOCOL = 'protocol'
 DRM_HOST = 'host'
 DRM_PORT = 'port'
@@ -120,11 +124,17 @@ DRM_SUBMIT_CMD = 'submitCmd'
 DRM_CHECKSTATUS_CMD = 'checkStatusCmd'
 DRM_CLEANUP_CMD = 'cleanupCmd'
 DRM_DELETE_CMD = 'deleteCmd'
+DRM_BUNDLE_CMD = 'bundleCmd'
+DRM_ACCESS_VERSION = 'accessVersion'
 IALDRM_CONFIGURE_CMD = 'ialdrm_config'
 IALDRM_SUBMIT_CMD = 'ialdrm_submit_job'
 IALDRM_CHECKSTATUS_CMD = 'ialdrm_check_job_status'
 IALDRM_CLEANUP_CMD = 'ialdrm_workdir_cleanup'
 IALDRM_DELETE_CMD = 'ialdrm_delete_job'
+BUNDLE_RUNNER_CMD = 'bundle_runner.py'
+DEFAULT_STATUSCHECK_BATCHSIZE = 500
+DRM_ACCESS_VERSIONS = (1, 2)
+DEFAULT_DRM_ACCESS_VERSION = 1
 class DrmConfiguration():
      
     def __init__(self, data):
@@ -134,6 +144,22 @@ class DrmConfiguration():
         if DRM_STATUSCHECK_TIMEOUT not in data:
             raise ConfigurationError("DrmConfig(" + DRM_STATUSCHECK_TIMEOUT + ") not set.")
         self.statusCheckTimeout = data[DRM_STATUSCHECK_TIMEOUT]
+        if DRM_STATUSCHECK_BATCHSIZE not in data:
+            self.statusCheckBatchSize = DEFAULT_STATUSCHECK_BATCHSIZE
+        else:
+            self.statusCheckBatchSize = int(data[DRM_STATUSCHECK_BATCHSIZE])
+        if DRM_STATUSCHECK_MAXDELAY not in data:
+            self.statusCheckMaxDelay = None
+        else:
+            self.statusCheckMaxDelay = float(data[DRM_STATUSCHECK_MAXDELAY])
+        if DRM_MAX_JOBS not in data:
+            self.maxJobs = None
+        else:
+            self.maxJobs = int(data[DRM_MAX_JOBS])
+        if DRM_MAX_JOBS_PER_RUN not in data:
+            self.maxJobsPerRun = None
+        else:
+            self.maxJobsPerRun = int(data[DRM_MAX_JOBS_PER_RUN])
         if DRM_PROTOCOL not in data:
             raise ConfigurationError("DrmConfig(" + DRM_PROTOCOL + ") not set.")
         self.protocol = data[DRM_PROTOCOL]
@@ -163,12 +189,26 @@ class DrmConfiguration():
             self.deleteCmd = IALDRM_DELETE_CMD
         else:
             self.deleteCmd = data[DRM_DELETE_CMD]
+        if DRM_BUNDLE_CMD not in data:
+            self.bundleCmd = BUNDLE_RUNNER_CMD
+        else:
+            self.bundleCmd = data[DRM_BUNDLE_CMD]
+        if DRM_ACCESS_VERSION not in data:
+            self.accessVersion = DEFAULT_DRM_ACCESS_VERSION
+        else:
+            self.accessVersion = int(data[DRM_ACCESS_VERSION])
+        if self.accessVersion not in DRM_ACCESS_VERSIONS:
+            raise ConfigurationError("DrmConfig(" + DRM_ACCESS_VERSION + ") not supported: %s."%self.accessVersion)
             
     def __eq__(self, other):
         if other == None:
             return False
         return self.statusCheckPollTime == other.statusCheckPollTime \
             and self.statusCheckTimeout == other.statusCheckTimeout \
+            and self.statusCheckBatchSize == other.statusCheckBatchSize \
+            and self.statusCheckMaxDelay == other.statusCheckMaxDelay \
+            and self.maxJobs == other.maxJobs \
+            and self.maxJobsPerRun == other.maxJobsPerRun \
             and self.protocol == other.protocol \
             and self.host == other.host \
             and self.port == other.port \
@@ -176,7 +216,9 @@ class DrmConfiguration():
             and self.submitCmd == other.submitCmd \
             and self.checkStatusCmd == other.checkStatusCmd \
             and self.cleanupCmd == other.cleanupCmd \
-            and self.deleteCmd == other.deleteCmd
+            and self.deleteCmd == other.deleteCmd \
+            and self.bundleCmd == other.bundleCmd \
+            and self.accessVersion == other.accessVersion
                     
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -187,11 +229,17 @@ class DrmConfiguration():
         output+="%s:%s\n"%(DRM_PORT,self.port)
         output+="%s:%s\n"%(DRM_STATUSCHECK_POLLTIME,self.statusCheckPollTime)
         output+="%s:%s\n"%(DRM_STATUSCHECK_TIMEOUT,self.statusCheckTimeout)
+        output+="%s:%s\n"%(DRM_STATUSCHECK_BATCHSIZE,self.statusCheckBatchSize)
+        output+="%s:%s\n"%(DRM_STATUSCHECK_MAXDELAY,self.statusCheckMaxDelay)
+        output+="%s:%s\n"%(DRM_MAX_JOBS,self.maxJobs)
+        output+="%s:%s\n"%(DRM_MAX_JOBS_PER_RUN,self.maxJobsPerRun)
         output+="%s:%s\n"%(DRM_CONFIGURE_CMD,self.configureCmd)
         output+="%s:%s\n"%(DRM_SUBMIT_CMD,self.submitCmd)
         output+="%s:%s\n"%(DRM_CHECKSTATUS_CMD,self.checkStatusCmd)
         output+="%s:%s\n"%(DRM_CLEANUP_CMD,self.cleanupCmd)
         output+="%s:%s\n"%(DRM_DELETE_CMD,self.deleteCmd)
+        output+="%s:%s\n"%(DRM_BUNDLE_CMD,self.bundleCmd)
+        output+="%s:%s\n"%(DRM_ACCESS_VERSION,self.accessVersion)
         return output
          
 # These should map to the fields in the WsConfiguration class in java.       
@@ -199,6 +247,15 @@ WS_PROTOCOL="protocol"
 WS_HOST="host"
 WS_PORT="port"
 WS_ROOT="workspaceRoot"       
+WS_MAX_SESSIONS="maxSessions"
+WS_SESSION_IDLETIMEOUT="sessionIdleTimeout"
+WS_KEEPALIVE_INTERVAL="keepAliveInterval"
+WS_TRANSFER_CHUNKSIZE="transferChunkSize"
+WS_TRANSFER_WINDOW="transferWindow"
+WS_LINK_MODE="linkMode"
+WS_RESULTCACHE_DIR="resultCacheDir"
+WS_RESULTCACHE_MAXENTRIES="resultCacheMaxEntries"
+WS_RESULTCACHE_MAXBYTES="resultCacheMaxBytes"
 class WsConfiguration():
      
     def __init__(self, data):
@@ -214,6 +271,42 @@ class WsConfiguration():
         if WS_ROOT not in data:
             raise ConfigurationError("WsConfig(" + WS_ROOT + ") not set.")
         self.workspaceRoot = data[WS_ROOT]
+        if WS_MAX_SESSIONS not in data:
+            self.maxSessions = None
+        else:
+            self.maxSessions = int(data[WS_MAX_SESSIONS])
+        if WS_SESSION_IDLETIMEOUT not in data:
+            self.sessionIdleTimeout = None
+        else:
+            self.sessionIdleTimeout = float(data[WS_SESSION_IDLETIMEOUT])
+        if WS_KEEPALIVE_INTERVAL not in data:
+            self.keepAliveInterval = None
+        else:
+            self.keepAliveInterval = float(data[WS_KEEPALIVE_INTERVAL])
+        if WS_TRANSFER_CHUNKSIZE not in data:
+            self.transferChunkSize = None
+        else:
+            self.transferChunkSize = int(data[WS_TRANSFER_CHUNKSIZE])
+        if WS_TRANSFER_WINDOW not in data:
+            self.transferWindow = None
+        else:
+            self.transferWindow = int(data[WS_TRANSFER_WINDOW])
+        if WS_LINK_MODE not in data:
+            self.linkMode = None
+        else:
+            self.linkMode = data[WS_LINK_MODE]
+        if WS_RESULTCACHE_DIR not in data:
+            self.resultCacheDir = None
+        else:
+            self.resultCacheDir = data[WS_RESULTCACHE_DIR]
+        if WS_RESULTCACHE_MAXENTRIES not in data:
+            self.resultCacheMaxEntries = None
+        else:
+            self.resultCacheMaxEntries = int(data[WS_RESULTCACHE_MAXENTRIES])
+        if WS_RESULTCACHE_MAXBYTES not in data:
+            self.resultCacheMaxBytes = None
+        else:
+            self.resultCacheMaxBytes = int(data[WS_RESULTCACHE_MAXBYTES])
                 
     def __eq__(self, other):
         if other == None:
@@ -221,7 +314,16 @@ class WsConfiguration():
         return self.protocol == other.protocol \
             and self.host == other.host \
             and self.port == other.port \
-            and self.workspaceRoot == other.workspaceRoot
+            and self.workspaceRoot == other.workspaceRoot \
+            and self.maxSessions == other.maxSessions \
+            and self.sessionIdleTimeout == other.sessionIdleTimeout \
+            and self.keepAliveInterval == other.keepAliveInterval \
+            and self.transferChunkSize == other.transferChunkSize \
+            and self.transferWindow == other.transferWindow \
+            and self.linkMode == other.linkMode \
+            and self.resultCacheDir == other.resultCacheDir \
+            and self.resultCacheMaxEntries == other.resultCacheMaxEntries \
+            and self.resultCacheMaxBytes == other.resultCacheMaxBytes
                         
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -231,6 +333,15 @@ class WsConfiguration():
         output+="%s:%s\n"%(WS_HOST,self.host)
         output+="%s:%s\n"%(WS_PORT,self.port)
         output+="%s:%s\n"%(WS_ROOT,self.workspaceRoot)
+        output+="%s:%s\n"%(WS_MAX_SESSIONS,self.maxSessions)
+        output+="%s:%s\n"%(WS_SESSION_IDLETIMEOUT,self.sessionIdleTimeout)
+        output+="%s:%s\n"%(WS_KEEPALIVE_INTERVAL,self.keepAliveInterval)
+        output+="%s:%s\n"%(WS_TRANSFER_CHUNKSIZE,self.transferChunkSize)
+        output+="%s:%s\n"%(WS_TRANSFER_WINDOW,self.transferWindow)
+        output+="%s:%s\n"%(WS_LINK_MODE,self.linkMode)
+        output+="%s:%s\n"%(WS_RESULTCACHE_DIR,self.resultCacheDir)
+        output+="%s:%s\n"%(WS_RESULTCACHE_MAXENTRIES,self.resultCacheMaxEntries)
+        output+="%s:%s\n"%(WS_RESULTCACHE_MAXBYTES,self.resultCacheMaxBytes)
         return output
 
 
@@ -307,6 +418,8 @@ PIPELINE_DIR = 'pipelineDir'
 PKG_REPOSITORY = 'pkgRepository'
 INPUTDATA_PATHS = 'inputDataPaths' # A MAP OF <string,string>
 CREDENTIALS = 'credentials' # see HPcAccessCredentials
+RUN_WEIGHT = 'weight' # share of the DRM relative to other runs, optional
+DEFAULT_RUN_WEIGHT = 1.0
 
 class RunConfiguration():
      
@@ -332,6 +445,12 @@ class RunConfiguration():
         if INPUTDATA_PATHS not in data:
             raise RunConfigurationError("RunConfiguration(" + INPUTDATA_PATHS + ") not set.")
         self.inputDataPaths = data[INPUTDATA_PATHS]
+        if RUN_WEIGHT not in data:
+            self.weight = DEFAULT_RUN_WEIGHT
+        else:
+            self.weight = float(data[RUN_WEIGHT])
+        if self.weight <= 0:
+            raise RunConfigurationError("RunConfiguration(" + RUN_WEIGHT + ") must be positive: %s."%self.weight)
         if CREDENTIALS not in data:
             raise RunConfigurationError("RunConfiguration(" + CREDENTIALS + ") not set.")
         if isinstance(data[CREDENTIALS], HpcAccessCredentials):
@@ -349,6 +468,7 @@ class RunConfiguration():
             and self.pipelineDir == other.pipelineDir \
             and self.pkgRepository == other.pkgRepository \
             and self.inputDataPaths == other.inputDataPaths \
+            and self.weight == other.weight \
             and self.credentials == other.credentials
                    
     def __ne__(self, other):
@@ -364,6 +484,7 @@ class RunConfiguration():
         output+=INPUTDATA_PATHS+":\n"
         for k,v in self.inputDataPaths.iteritems():
             output+="    %s:%s\n"%(k,v)
+        output+="%s:%s\n"%(RUN_WEIGHT,self.weight)
         output+=CREDENTIALS+":\n"
         output+=repr(self.credentials)
         return output
@@ -512,24 +633,28 @@ class PipelineTaskRun():
 
 # These should map to the fields in the RunReport class in java.
 class RunReport():    
-    def __init__(self, runid, responseStatus, message, status, tasks, outputs):
+    def __init__(self, runid, responseStatus, message, status, tasks, outputs, statistics=None):
         self.runid=runid
         self.status=status
         self.tasks=tasks
         self.outputs=outputs
         self.responseStatus=responseStatus
         self.message=message
+        self.statistics=statistics
 
     def default(self):
-        return {'runid' : self.runid, 
+        _dict = {'runid' : self.runid, 
                 'status': self.status,
                 'responseStatus': self.responseStatus,
                 'message': self.message,
                 'outputs': [o.__dict__ for o in self.outputs], 
                 'tasks': [t.__dict__ for t in self.tasks]}            
+        if self.statistics:
+            _dict['statistics']=self.statistics
+        return _dict
         
 
     @classmethod
     def createFromPipelineExecution(cls, run):
         return RunReport(   run.runid, STATUS_RESPONSE_OK, "Run report successfully created", 
-                            run.status, run.get_task_runs(), run.get_outputs())
\ No newline at end of file
+                            run.status, run.get_task_runs(), run.get_outputs(), run.get_statistics())
\ No newline at end of file
@@ -19,21 +19,21 @@ from twisted.python.failure import Failure
 from euclidwf.framework.runner import PipelineExecution, REPORT, STATUS, SUBMITTED,\
     PIPELINE, EXECSTATUS_ERROR, EXECSTATUS_EXECUTING, EXECSTATUS_ABORTED
 from euclidwf.server import server_model, server_config
-from euclidwf.utilities import visualizer, cmd_executor
+from euclidwf.utilities import visualizer, cmd_executor, chunked_transfer, exec_loader
 from euclidwf.server.server_model import SUBM_NOT_ACCEPTED,\
     SubmissionResponse, SUBM_ALREADY_SUBMITTED, SUBM_FAILED,\
     CONFIG_OK, CONFIG_NOT_ACCEPTED, CONFIG_ERROR,\
     RunServerConfiguration, ConfigurationResponse, RUNID, RunConfiguration,\
     SUBM_EXECUTING, RunStatus, STATUS_RESPONSE_UNKNOWN_RUNID, STATUS_RESPONSE_OK,\
-    RunDetailedStatus, RunReport, SUBM_ERROR, PRSJsonEncoder
+    RunDetailedStatus, RunReport, SUBM_ERROR, PRSJsonEncoder, CREDENTIALS,\
+    INPUTDATA_PATHS
 from euclidwf.utilities.error_handling import ConfigurationError
 
-from euclidwf.framework import drm_access, drm_access2
+from euclidwf.framework import drm_access2, admission, checkpoint
+from euclidwf.framework.node_callbacks import drm_module
 from twisted.internet.threads import blockingCallFromThread
 from twisted.internet.defer import Deferred
 
-DRM=drm_access
-
 app = Flask(__name__)
 
 logger = logging.getLogger(__name__)
@@ -73,6 +73,11 @@ def configure():
             if drm_status != CONFIG_OK:
                 status=CONFIG_ERROR
 
+        if status==CONFIG_OK:
+            resumed = resume_runs()
+            if resumed:
+                msg += "\nRuns resumed from their checkpoints: %s"%', '.join(resumed)
+
         logger.info(msg)
         response = ConfigurationResponse(status, msg)
         return Response(json.dumps(response.__dict__), mimetype="application/json")
@@ -154,10 +159,11 @@ def run_details(runid):
 def _configure_drm(serverconfig):
     drmconfig_cmd=serverconfig.drmConfig.configureCmd
     drmconfig={"SYSTEM":{"work_dir_host":serverconfig.wsConfig.workspaceRoot}}
-    if DRM==drm_access2:
-        cmd=DRM.create_configure_cmd(drmconfig_cmd, drmconfig)
+    drm=drm_module(serverconfig.drmConfig)
+    if drm==drm_access2:
+        cmd=drm.create_configure_cmd(drmconfig_cmd, drmconfig)
         executor = cmd_executor.create(serverconfig.drmConfig, serverconfig.localcache, serverconfig.credentials.drmUsername, serverconfig.credentials.drmPassword)
-        drm_response = _call_drm_configure(cmd, executor, drmconfig) 
+        drm_response = _call_drm_configure(drm, cmd, executor, drmconfig) 
                
         def on_success(result):            
             if result==CONFIG_OK:
@@ -176,7 +182,7 @@ def _configure_drm(serverconfig):
     return drm_response
 
 
-def _call_drm_configure(cmd, executor, expected):
+def _call_drm_configure(drm, cmd, executor, expected):
     logger.info("Configure DRM with the command:\n %s"%' '.join(cmd))
     d=executor.execute(cmd)
     
@@ -190,7 +196,7 @@ def _call_drm_configure(cmd, executor, expected):
         if reason:
             return Failure(ValueError("Exception occurred while configuring DRM. Reason: %s \ Stdout: %s"%(reason.getTraceback(), ''.join(data))))
         else:
-            response=DRM.read_configure_response(data)
+            response=drm.read_configure_response(data)
             if response["SYSTEM"]["work_dir_host"]==expected["SYSTEM"]["work_dir_host"]:
                 return CONFIG_OK
             else:
@@ -206,20 +212,42 @@ def _call_drm_configure(cmd, executor, expected):
     return d
 
 
-def _submit(runConfig):
+def resume_runs():
+    '''
+    Resumes the runs that have not finished before the server has been stopped - from 
+    their checkpoints in the local cache and with the credentials of the server configuration.
+    :returns: the ids of the runs resumed.
+    '''
+    config=server_model.config
+    resumed=[]
+    for cp in checkpoint.find_unfinished(config.localcache):
+        rundata=dict(cp.rundata)
+        if registry.has_run(rundata[RUNID]):
+            continue
+        rundata[INPUTDATA_PATHS]={str(k):str(v) for k,v in rundata[INPUTDATA_PATHS].iteritems()}
+        rundata[CREDENTIALS]=config.credentials
+        response=_submit(RunConfiguration(rundata), resume=True)
+        if response.status==SUBM_EXECUTING:
+            resumed.append(response.runid)
+        else:
+            logger.warn("Run %s could not be resumed: %s"%(response.runid, response.message))
+    return resumed
+
+
+def _submit(runConfig, resume=False):
     if registry.has_run(runConfig.runid):
         msg = "Runid %s does already exist" % runConfig.runid
         return SubmissionResponse(runConfig.runid, SUBM_ALREADY_SUBMITTED, msg)
         
     try:
-        pipeline_exec = PipelineExecution(runConfig, server_model.config)
+        pipeline_exec = PipelineExecution(runConfig, server_model.config, resume=resume)
         logger.debug("PipelineExecution object for runid %s created."%runConfig.runid)
         pipeline_exec.initialize()
         logger.debug("PipelineExecution object for runid %s initialized."%runConfig.runid)
         registry.add_run(runConfig.runid, pipeline_exec)
         logger.debug("PipelineExecution object for runid %s registered."%runConfig.runid)
         _ = pipeline_exec.start()
-        msg = "Pipeline execution for runid %s started."%runConfig.runid
+        msg = "Pipeline execution for runid %s %s."%(runConfig.runid, "resumed" if resume else "started")
         logger.info(msg)
     except ConfigurationError as ce:
         msg = 'Submission failed with exception %s.' % str(ce)
@@ -232,7 +260,7 @@ def _submit(runConfig):
         logger.error(msg)
         return SubmissionResponse(runConfig.runid, SUBM_ERROR, msg, stacktrace)
     try:
-        history.add_entry("Runid %s submitted to the system" % runConfig.runid, datetime.datetime.now())
+        history.add_entry("Runid %s %s" % (runConfig.runid, "resumed from its checkpoint" if resume else "submitted to the system"), datetime.datetime.now())
     except Exception as e:
         logger.warn("Runid %s could not be appended to the history."%runConfig.runid)
         msg=msg+"\n But not entry could be added the server history."
@@ -275,6 +303,24 @@ def _draw_pygraph(pygraph, pngname, mapname):
     pygraph.draw(path=mappath, format="cmapx")
 
 
+@app.route('/transfers', methods=['GET'])
+def transfers():
+    stats = blockingCallFromThread(reactor, chunked_transfer.transfer_stats.todict)
+    return Response(json.dumps(stats), mimetype="application/json")
+
+
+@app.route('/executables', methods=['GET'])
+def executables():
+    stats = blockingCallFromThread(reactor, exec_loader.registry.get_statistics)
+    return Response(json.dumps(stats), mimetype="application/json")
+
+
+@app.route('/admission', methods=['GET'])
+def admission_state():
+    state = blockingCallFromThread(reactor, admission.controller.get_state)
+    return Response(json.dumps(state), mimetype="application/json")
+
+
 @app.route('/runs/<runid>/script', methods=['GET'])
 def run_script(runid):
     if not registry.has_run(runid):
@@ -0,0 +1,426 @@
+'''
+Streaming, chunked file transfers for the workspace transporters.
+
+Files are never held in memory as a whole: they are transferred in chunks, with
+a bounded number of chunk requests in flight at the same time (the window). For
+SFTP, the requests of the window are pipelined on the channel, which hides the
+round-trip latency for large files. Chunks arriving out of order are reassembled
+in order before they are written. The MD5 checksum of the source is computed on
+the fly from the chunks in order. At the end, the size and the checksum of the
+target file are verified against those of the source - the transfer fails on a
+mismatch. Uploaded files are read back for this.
+
+Progress and throughput of all transfers of the server process are collected in
+:data:`transfer_stats`.
+'''
+import collections
+import hashlib
+import logging
+import os
+import time
+
+from twisted.internet import defer
+from twisted.python.failure import Failure
+from twisted.conch.ssh import filetransfer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE=64*1024
+DEFAULT_WINDOW=16
+LOCAL_CHUNK_SIZE=1024*1024
+RECENT_TRANSFERS=100
+
+
+class TransferError(IOError):
+    pass
+
+
+class Transfer(object):
+    """
+    Progress of a single transfer.
+    """
+
+    def __init__(self, source, target, size):
+        self.source=source
+        self.target=target
+        self.size=size
+        self.done=0
+        self.md5=None
+        self.started=time.time()
+        self.finished=None
+
+    def duration(self):
+        end=self.finished if self.finished else time.time()
+        return end-self.started
+
+    def todict(self):
+        return {'source':self.source, 'target':self.target, 'size':self.size, 'done':self.done,
+                'seconds':self.duration()}
+
+
+class TransferStats(object):
+    """
+    Counters on the transfers: number of files and bytes transferred, time spent
+    and resulting throughput, the transfers currently active and the most
+    recently completed ones.
+    """
+
+    def __init__(self):
+        self.files=0
+        self.bytes=0
+        self.seconds=0.0
+        self.failures=0
+        self._active=set()
+        self._recent=collections.deque(maxlen=RECENT_TRANSFERS)
+
+    def start(self, source, target, size):
+        transfer=Transfer(source, target, size)
+        self._active.add(transfer)
+        return transfer
+
+    def completed(self, transfer):
+        transfer.finished=time.time()
+        self._active.discard(transfer)
+        self._recent.append(transfer)
+        self.files+=1
+        self.bytes+=transfer.done
+        self.seconds+=transfer.duration()
+
+    def failed(self, transfer):
+        transfer.finished=time.time()
+        self._active.discard(transfer)
+        self.failures+=1
+
+    def throughput(self):
+        '''
+        Average throughput in bytes per second over all completed transfers.
+        '''
+        return self.bytes/self.seconds if self.seconds>0 else 0.0
+
+    def todict(self):
+        return {'files':self.files, 'bytes':self.bytes, 'seconds':self.seconds,
+                'throughput':self.throughput(), 'failures':self.failures,
+                'active':[t.todict() for t in self._active],
+                'recent':[t.todict() for t in self._recent]}
+
+
+transfer_stats=TransferStats()
+
+
+def fetch(sftp, remotepath, localpath, chunk_size=DEFAULT_CHUNK_SIZE, window=DEFAULT_WINDOW, stats=transfer_stats):
+    '''
+    Fetches the remote file to the local path using the given SFTP session.
+    :returns: Deferred :class:`Transfer`.
+    '''
+    def opened(remotefile):
+        d=remotefile.getAttrs()
+
+        def start(attrs):
+            parentdir=os.path.dirname(localpath)
+            if parentdir and not os.path.exists(parentdir):
+                os.makedirs(parentdir)
+            transfer=stats.start(remotepath, localpath, attrs['size'])
+            localfile=open(localpath, 'wb')
+            d=_ChunkedRead(remotefile, localfile, transfer, chunk_size, window).run()
+            d.addBoth(_closing(localfile.close))
+            d.addCallback(lambda transfer: _verify_size(transfer, os.path.getsize(localpath)))
+            d.addCallback(lambda transfer: _verify_checksum(transfer, file_checksum(localpath)))
+            _track(d, transfer, stats)
+            return d
+
+        d.addCallback(start)
+        d.addBoth(_closing(remotefile.close))
+        return d
+
+    d=sftp.open_file(remotepath, filetransfer.FXF_READ)
+    d.addCallback(opened)
+    return d
+
+
+def upload(sftp, localpath, remotepath, chunk_size=DEFAULT_CHUNK_SIZE, window=DEFAULT_WINDOW, stats=transfer_stats):
+    '''
+    Uploads the local file to the remote path using the given SFTP session.
+    :returns: Deferred :class:`Transfer`.
+    '''
+    size=os.path.getsize(localpath)
+
+    def opened(remotefile):
+        transfer=stats.start(localpath, remotepath, size)
+        localfile=open(localpath, 'rb')
+        d=_ChunkedWrite(remotefile, localfile, transfer, chunk_size, window).run()
+        d.addBoth(_closing(localfile.close))
+
+        def verify(transfer):
+            d=remotefile.getAttrs()
+            d.addCallback(lambda attrs: _verify_size(transfer, attrs['size']))
+            d.addCallback(read_back)
+            return d
+
+        def read_back(transfer):
+            target=Transfer(remotepath, None, transfer.size)
+            d=_ChunkedRead(remotefile, _NullFile(), target, chunk_size, window).run()
+            d.addCallback(lambda target: _verify_checksum(transfer, target.md5))
+            return d
+
+        d.addCallback(verify)
+        d.addBoth(_closing(remotefile.close))
+        _track(d, transfer, stats)
+        return d
+
+    flags=filetransfer.FXF_READ|filetransfer.FXF_WRITE|filetransfer.FXF_CREAT|filetransfer.FXF_TRUNC
+    d=sftp.open_file(remotepath, flags)
+    d.addCallback(opened)
+    return d
+
+
+def copy(src, dest, chunk_size=LOCAL_CHUNK_SIZE, stats=transfer_stats):
+    '''
+    Copies a local file in chunks.
+    :returns: the :class:`Transfer`.
+    '''
+    transfer=stats.start(src, dest, os.path.getsize(src))
+    md5=hashlib.md5()
+    try:
+        with open(src, 'rb') as fsrc:
+            with open(dest, 'wb') as fdest:
+                while True:
+                    chunk=fsrc.read(chunk_size)
+                    if not chunk:
+                        break
+                    fdest.write(chunk)
+                    md5.update(chunk)
+                    transfer.done+=len(chunk)
+        transfer.md5=md5.hexdigest()
+        _verify_size(transfer, os.path.getsize(dest))
+        _verify_checksum(transfer, file_checksum(dest, chunk_size))
+    except:
+        stats.failed(transfer)
+        raise
+    stats.completed(transfer)
+    return transfer
+
+
+def checksum(sftp, remotepath, chunk_size=DEFAULT_CHUNK_SIZE, window=DEFAULT_WINDOW):
+    '''
+    Computes the MD5 checksum of the remote file by streaming it - without storing it.
+    :returns: Deferred :class:`Transfer` with the checksum and the size of the file.
+    '''
+    def opened(remotefile):
+        d=remotefile.getAttrs()
+
+        def start(attrs):
+            transfer=Transfer(remotepath, None, attrs['size'])
+            return _ChunkedRead(remotefile, _NullFile(), transfer, chunk_size, window).run()
+
+        d.addCallback(start)
+        d.addBoth(_closing(remotefile.close))
+        return d
+
+    d=sftp.open_file(remotepath, filetransfer.FXF_READ)
+    d.addCallback(opened)
+    return d
+
+
+def file_checksum(path, chunk_size=LOCAL_CHUNK_SIZE):
+    '''
+    Computes the MD5 checksum of a local file.
+    '''
+    md5=hashlib.md5()
+    with open(path, 'rb') as f:
+        while True:
+            chunk=f.read(chunk_size)
+            if not chunk:
+                break
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class _NullFile(object):
+
+    def write(self, data):
+        pass
+
+
+class _ChunkedRead(object):
+    """
+    Reads a remote file with up to `window` chunk requests in flight and writes
+    the chunks to the local file in order - computing the MD5 checksum of the
+    file on the fly.
+    """
+
+    def __init__(self, remotefile, localfile, transfer, chunk_size, window):
+        self.remotefile=remotefile
+        self.localfile=localfile
+        self.transfer=transfer
+        self.chunk_size=chunk_size
+        self.window=window
+        self.md5=hashlib.md5()
+        self.requested=0
+        self.inflight=0
+        self.pending={}
+        self.result=defer.Deferred()
+
+    def run(self):
+        self._fill()
+        self._check_done()
+        return self.result
+
+    def _fill(self):
+        while self.inflight<self.window and self.requested<self.transfer.size and not self.result.called:
+            offset=self.requested
+            length=min(self.chunk_size, self.transfer.size-offset)
+            self.requested+=length
+            self._request(offset, length)
+
+    def _request(self, offset, length):
+        self.inflight+=1
+        d=defer.maybeDeferred(self.remotefile.readChunk, offset, length)
+        d.addCallbacks(self._received, self._failed, callbackArgs=(offset, length))
+
+    def _received(self, data, offset, length):
+        self.inflight-=1
+        if self.result.called:
+            return
+        if not data:
+            self._fail(Failure(TransferError("Unexpected end of file %s at offset %i."%(self.transfer.source, offset))))
+            return
+        self.pending[offset]=data
+        if len(data)<length:
+            # short read - request the remainder of the chunk
+            self._request(offset+len(data), length-len(data))
+        try:
+            self._flush()
+        except:
+            self._fail(Failure())
+            return
+        self._fill()
+        self._check_done()
+
+    def _flush(self):
+        while self.transfer.done in self.pending:
+            data=self.pending.pop(self.transfer.done)
+            self.localfile.write(data)
+            self.md5.update(data)
+            self.transfer.done+=len(data)
+
+    def _check_done(self):
+        if self.inflight==0 and self.transfer.done>=self.transfer.size and not self.result.called:
+            self.transfer.md5=self.md5.hexdigest()
+            self.result.callback(self.transfer)
+
+    def _failed(self, reason):
+        self.inflight-=1
+        if reason.check(EOFError):
+            reason=Failure(TransferError("Unexpected end of file %s."%self.transfer.source))
+        self._fail(reason)
+
+    def _fail(self, reason):
+        if not self.result.called:
+            self.result.errback(reason)
+
+
+class _ChunkedWrite(object):
+    """
+    Reads the local file sequentially and writes the chunks to the remote file
+    with up to `window` chunk requests in flight - computing the MD5 checksum of
+    the local file on the fly.
+    """
+
+    def __init__(self, remotefile, localfile, transfer, chunk_size, window):
+        self.remotefile=remotefile
+        self.localfile=localfile
+        self.transfer=transfer
+        self.chunk_size=chunk_size
+        self.window=window
+        self.md5=hashlib.md5()
+        self.offset=0
+        self.eof=False
+        self.inflight=0
+        self.result=defer.Deferred()
+
+    def run(self):
+        self._fill()
+        self._check_done()
+        return self.result
+
+    def _fill(self):
+        while self.inflight<self.window and not self.eof and not self.result.called:
+            try:
+                data=self.localfile.read(self.chunk_size)
+            except:
+                self._fail(Failure())
+                return
+            if not data:
+                self.eof=True
+                return
+            self.md5.update(data)
+            offset=self.offset
+            self.offset+=len(data)
+            self.inflight+=1
+            d=defer.maybeDeferred(self.remotefile.writeChunk, offset, data)
+            d.addCallbacks(self._written, self._failed, callbackArgs=(len(data),))
+
+    def _written(self, _, length):
+        self.inflight-=1
+        self.transfer.done+=length
+        self._fill()
+        self._check_done()
+
+    def _check_done(self):
+        if self.inflight==0 and self.eof and not self.result.called:
+            self.transfer.md5=self.md5.hexdigest()
+            self.result.callback(self.transfer)
+
+    def _failed(self, reason):
+        self.inflight-=1
+        self._fail(reason)
+
+    def _fail(self, reason):
+        if not self.result.called:
+            self.result.errback(reason)
+
+
+def _verify_size(transfer, size):
+    '''
+    Fails the transfer if the size of the target - or the number of bytes transferred - differs 
+    from the size of the source.
+    '''
+    if size!=transfer.size or transfer.done!=transfer.size:
+        raise TransferError("Size of %s (%i bytes, %i bytes transferred) does not match the size of %s (%i bytes)."
+                            %(transfer.target, size, transfer.done, transfer.source, transfer.size))
+    return transfer
+
+
+def _verify_checksum(transfer, md5):
+    '''
+    Fails the transfer if the checksum of the target differs from the checksum of the source
+    computed while transferring it - e.g. if chunks have been corrupted or written out of order.
+    '''
+    if md5!=transfer.md5:
+        raise TransferError("Checksum of %s (%s) does not match the checksum of %s (%s)."
+                            %(transfer.target, md5, transfer.source, transfer.md5))
+    return transfer
+
+
+def _track(d, transfer, stats):
+    def completed(result):
+        stats.completed(transfer)
+        logger.debug("Transferred %s to %s: %i bytes."%(transfer.source, transfer.target, transfer.done))
+        return result
+
+    def failed(reason):
+        stats.failed(transfer)
+        return reason
+
+    d.addCallbacks(completed, failed)
+
+
+def _closing(close):
+    '''
+    Returns a callback closing a file, passing on the result (or failure).
+    '''
+    def do_close(result):
+        d=defer.maybeDeferred(close)
+        d.addBoth(lambda _: result)
+        return d
+    return do_close
@@ -1,58 +1,178 @@
 '''
+Loads the executables defined in the package definitions (pkgdefs) - python modules in the
+package repository, each defining the executables of a package.
+
+The package modules are indexed by a process-wide registry: a module is imported once and the
+executables it defines are kept - it is only imported again when its file has changed. Listing 
+all the executables of a repository does not import the modules but uses the static index of the 
+package definitions (see pkgdef_index).
+
 Created on Apr 28, 2015
 
 @author: martin.melchior
 '''
 import sys
 import inspect
+import threading
 from euclidwf.framework import taskdefs
 from euclidwf.utilities.error_handling import ConfigurationError
+from euclidwf.utilities import pkgdef_index
 import os
 
+
+class _PackageEntry(object):
+    """
+    A package module indexed by the registry - with the executables it defines.
+    """
+    def __init__(self, pkgname, module):
+        self.pkgname=pkgname
+        self.module=module
+        self.path=_source_path(module)
+        self.stamp=_stamp(self.path)
+        self.executables={name:obj for name, obj in inspect.getmembers(module) if isinstance(obj, taskdefs.Executable)}
+
+    def get_executable(self, taskname):
+        if taskname in self.executables:
+            return self.executables[taskname]
+        if not hasattr(self.module, taskname):
+            raise ConfigurationError("No executable with name %s found in package %s."%(taskname, self.pkgname))
+        return getattr(self.module, taskname)
+
+    def is_current(self):
+        if sys.modules.get(self.pkgname) is not self.module:
+            return False # imported again or removed in the meantime
+        if not self.path:
+            return True
+        return self.stamp is not None and self.stamp == _stamp(self.path)
+
+
+class ExecutableRegistry(object):
+    """
+    Process-wide index of the package modules and the executables they define. A lookup is a hit
+    if the module indexed is still current, i.e. its file has not changed since it was imported.
+    The static indexes of the repositories are cached in index_dir - the user's cache directory
+    if not set (see pkgdef_index.cachepath).
+    """
+
+    def __init__(self, index_dir=None):
+        self.index_dir=index_dir
+        self._packages={}
+        self._indexes={}
+        self._lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.imports=0
+        self.reloads=0
+
+
+    def get_executable(self, taskname, pkgname):
+        return self._package(pkgname).get_executable(taskname)
+
+
+    def get_package(self, pkgname):
+        return self._package(pkgname).module
+
+
+    def get_all_executables(self, pkgrepos):
+        '''
+        Returns the executables defined in all the package modules of the given repository - 
+        from the static index, only the modules that cannot be indexed statically are imported.
+        '''
+        if not '__init__.py' in os.listdir(pkgrepos):
+            initpath = os.path.join(pkgrepos,'__init__.py')
+            with open(initpath, 'w') as initfile:
+                initfile.write("# generated by pipeline framework")
+        if not pkgrepos in sys.path:
+            sys.path.append(pkgrepos)
+        with self._lock:
+            if pkgrepos not in self._indexes:
+                self._indexes[pkgrepos]=pkgdef_index.PkgdefIndex(pkgdef_index.cachepath(pkgrepos, self.index_dir))
+            index=self._indexes[pkgrepos]
+        return index.get_all_executables(pkgrepos, lambda pkgname: self._package(pkgname).executables)
+
+
+    def _package(self, pkgname):
+        with self._lock:
+            entry=self._packages.get(pkgname)
+            if entry and entry.is_current():
+                self.hits+=1
+                return entry
+            self.misses+=1
+            entry=_PackageEntry(pkgname, self._import(pkgname, entry))
+            self._packages[pkgname]=entry
+            return entry
+
+
+    def _import(self, pkgname, entry):
+        try:
+            if pkgname in sys.modules and (entry is None or entry.module is not sys.modules[pkgname]):
+                # imported elsewhere - e.g. by a pipeline script
+                return sys.modules[pkgname]
+            if pkgname in sys.modules:
+                self.reloads+=1
+                _remove_compiled(entry.path)
+                return reload(sys.modules[pkgname])
+            self.imports+=1
+            return __import__(pkgname)
+        except Exception:
+            raise ConfigurationError("Package with name %s not found - maybe the package repository is not on the python path."%(pkgname))
+
+
+    def clear(self):
+        with self._lock:
+            self._packages.clear()
+
+
+    def get_statistics(self):
+        lookups=self.hits+self.misses
+        return {'packages':len(self._packages), 'hits':self.hits, 'misses':self.misses,
+                'imports':self.imports, 'reloads':self.reloads,
+                'hitRate':float(self.hits)/lookups if lookups else None,
+                'index':{pkgrepos:index.get_statistics() for pkgrepos, index in self._indexes.iteritems()}}
+
+
+registry=ExecutableRegistry()
+
+
 def load_executable(taskname, pkgname):
-    if pkgname in sys.modules.keys():
-        pkg=sys.modules[pkgname]
-    else:
-        pkg = load_package(pkgname)
-        
-    if not hasattr(pkg, taskname):
-        raise ConfigurationError("No executable with name %s found in package %s."%(taskname, pkgname))
-
-    return getattr(pkg, taskname)
-
-
-def load_package(pkgname, doreload=True):
-    if pkgname in sys.modules.keys():
-        pkg = sys.modules[pkgname]
-        if not reload:
-            return pkg
-        else:
-            return reload(pkg)
-    try:
-        return __import__(pkgname)
-    except:
-        raise ConfigurationError("Package with name %s not found - maybe the package repository is not on the python path."%(pkgname))
+    return registry.get_executable(taskname, pkgname)
+
+
+def load_package(pkgname):
+    return registry.get_package(pkgname)
 
 
 def get_all_executables(pkgrepos):
-    if not '__init__.py' in os.listdir(pkgrepos):
-        initpath = os.path.join(pkgrepos,'__init__.py')
-        with open(initpath, 'w') as initfile:
-            initfile.write("# generated by pipeline framework")
-    if not pkgrepos in sys.path:
-        sys.path.append(pkgrepos)
-    executables = {}
-    for f in os.listdir(pkgrepos):
-        fpath=os.path.join(pkgrepos,f)
-        if os.path.isfile(fpath) and f.endswith('.py'):
-            pkgname=f[:-3]
-            pkg=load_package(pkgname)
-            for _name,_obj in inspect.getmembers(pkg):
-                if isinstance(_obj,taskdefs.Executable):
-                    executables[_name]=_obj
-    return executables    
-    
-    
+    return registry.get_all_executables(pkgrepos)
+
+
+def _source_path(module):
+    path=getattr(module, '__file__', None)
+    if path and path.endswith(('.pyc', '.pyo')):
+        path=path[:-1]
+    return path
+
+
+def _stamp(path):
+    if not path:
+        return None
+    try:
+        stat=os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def _remove_compiled(path):
+    # the compiled module is only recompiled if the modification time (in seconds) has changed
+    for compiled in (path+'c', path+'o') if path else ():
+        if os.path.exists(compiled):
+            try:
+                os.remove(compiled)
+            except OSError:
+                pass
+
+
 if __name__ == '__main__':
     pkgrepos="/Users/martinm/Projects/euclid/pipeline_framework/prototype/wfm/trunk/euclidwf_examples/packages/pkgdefs"
     execs=get_all_executables(pkgrepos)
@@ -3,24 +3,42 @@ Created on April 21, 2015
 
 @author: martin.melchior
 '''
+import errno
+import logging
 import os
-import shutil
+import stat
+try:
+    import fcntl
+except ImportError:
+    fcntl=None
 
 from twisted.python.failure import Failure
 from twisted.internet import defer
 
-from remoot import ssh
-from remoot.ssh import sftp
-
+from euclidwf.utilities import sftp_pool, chunked_transfer
 from euclidwf.utilities.error_handling import ConfigurationError
 
+logger = logging.getLogger(__name__)
+
+LINK_AUTO="auto"
+LINK_REFLINK="reflink"
+LINK_HARDLINK="hardlink"
+LINK_SYMLINK="symlink"
+LINK_COPY="copy"
+LINK_MODES=[LINK_REFLINK, LINK_HARDLINK, LINK_SYMLINK, LINK_COPY]
+
+# ioctl request to clone a file (copy-on-write) on linux - btrfs, xfs, ...
+FICLONE=0x40049409
+
 
 def create(config, username=None, password=None):
     protocol=config.protocol
     if protocol=="sftp":
-        return SFTPFileTransporter(config.host, username, password)
+        return SFTPFileTransporter(config.host, username, password, config.maxSessions,
+                                   config.sessionIdleTimeout, config.keepAliveInterval,
+                                   config.transferChunkSize, config.transferWindow, config.workspaceRoot)
     elif protocol=="file":
-        return LocalFileTransporter()
+        return LocalFileTransporter(link_mode=config.linkMode)
     else:
         raise ConfigurationError("Protocol %s for accessing the workspace not supported."%protocol)
     
@@ -30,140 +48,225 @@ class AbstractFileTransporter(object):
     def fetch_file(self, remotepath, localpath):
         raise NotImplementedError()
 
+    def get_statistics(self):
+        return {}
 
-class SFTPFileTransporter(AbstractFileTransporter):
 
-    def __init__(self, hostname, username, password):
+class SFTPFileTransporter(AbstractFileTransporter):
+    """
+    Transfers files from and to the workspace over SFTP. The SFTP sessions are
+    taken from the pool shared by all transporters for the same host and user.
+    Files are streamed in chunks of `chunk_size` bytes with at most `window`
+    chunks in flight - see :mod:`chunked_transfer`. Remote directories known
+    to exist are remembered in the :class:`RemoteDirectoryCache` of the workspace.
+    """
+
+    def __init__(self, hostname, username, password, max_sessions=None, idle_timeout=None, keepalive_interval=None,
+                 chunk_size=None, window=None, rootpath=None):
         self.hostname=hostname
         self.username=username
         self.password=password
-        self.sftp=sftp(self.hostname, self.username, self.password) 
+        self.chunk_size=chunk_size or chunked_transfer.DEFAULT_CHUNK_SIZE
+        self.window=window or chunked_transfer.DEFAULT_WINDOW
+        self.stats=chunked_transfer.transfer_stats
+        self.pool=sftp_pool.get_pool(hostname, username, password, max_sessions, idle_timeout, keepalive_interval)
+        self.directories=get_directory_cache(hostname, rootpath)
 
     def fetch_file(self, remotepath, localpath):
+        d = self.pool.run(lambda sftp: chunked_transfer.fetch(sftp, remotepath, localpath, self.chunk_size, self.window, self.stats))
+        d.addCallback(lambda _: localpath)
+        return d
 
-        def on_connected(connection):
-                       
-            def transmit_file(sftp):
-                d = sftp.read_file(remotepath)
-                                
-                def close(data):
-                    d_close=sftp.close()
-                    d_close.addCallback(lambda _: data)
-                    return d_close
-                    
-                d.addCallback(close)
-                return d
-            
-            def error_while_connection_open(failure):
-                d = connection.close()
-                d.addBoth(lambda _:failure)
-                return d
- 
-            def write_file(data):
-                parentdir=os.path.dirname(localpath)
-                if not os.path.exists(parentdir):
-                    os.makedirs(parentdir)
-                with open(localpath,'w') as f:
-                    f.write(data)
-                return localpath
-                    
-            d = connection.open_sftp()
-            d.addCallback(lambda sftp: transmit_file(sftp))
-            d.addCallback(write_file)
-            d.addErrback(error_while_connection_open)
+
+    def upload_file(self, localpath, remotepath):
+
+        parentdir = os.path.dirname(remotepath)
+
+        def transmit_file(sftp):
+            d = self.directories.ensure_directory(sftp, parentdir)
+            d.addCallback(lambda _: chunked_transfer.upload(sftp, localpath, remotepath, self.chunk_size, self.window, self.stats))
+            d.addCallback(lambda _: remotepath)
             return d
-            
-        d = ssh.connect(self.hostname, self.username, self.password)
-        d.addCallback(on_connected)
-        
+
+        def file_not_copied(reason):
+            self.directories.invalidate(parentdir)
+            if reason.check(*sftp_pool.CONNECTION_ERRORS):
+                return reason
+            return Failure(ValueError("Exception while copying file to remote path %s. \n Reason:%s."%(remotepath, reason.getTraceback())))
+
+        d = self.pool.run(transmit_file)
+        d.addErrback(file_not_copied)
         return d
 
 
-    def upload_file(self, localpath, remotepath):
+    def file_exists(self, path):
+        if self.directories.is_known(path):
+            return defer.succeed(True)
+        return self.pool.run(lambda sftp: paths_exist(sftp, path))
 
-        def on_connected(connection):
-                       
-            def transmit_file(sftp):
-                with open(localpath,'r') as f:
-                    content = f.read()
-
-                parentdir = os.path.dirname(remotepath)
-                
-                d = self.file_exists(parentdir)
-                
-                def create_dir(exists):
-                    if not exists:   
-                        createdir_d = sftp.create_directory(parentdir)
-
-                        def dir_not_created(reason):
-                            return Failure(ValueError("Target directory %s could not be created. \n Reason:%s."%(parentdir, reason.getTraceback())))
-        
-                        createdir_d.addErrback(dir_not_created)
-                        return createdir_d
 
-                    else:
-                        return defer.succeed(None) 
+    def checksum(self, path):
+        '''
+        Returns the (deferred) MD5 checksum of the remote file - streamed, not stored locally.
+        '''
+        d = self.pool.run(lambda sftp: chunked_transfer.checksum(sftp, path, self.chunk_size, self.window))
+        d.addCallback(lambda transfer: transfer.md5)
+        return d
+
 
-                d.addCallback(create_dir)
+    def link_file(self, src, dest):
+        '''
+        Makes the remote file available at the destination by a symbolic link.
+        :returns: Deferred size of the file - fails if the source does not exist.
+        '''
+        parentdir = os.path.dirname(dest)
 
-                d.addCallback(lambda _: sftp.write_file(remotepath, content))
-                                
-                def close(_):
-                    d_close=sftp.close()
-                    d_close.addCallback(lambda _: remotepath)
-                    return d_close
+        def link(sftp):
+            d = sftp.stat(src)
 
-                def file_not_copied(reason):
-                    return Failure(ValueError("Exception while copying file to remote path %s. \n Reason:%s."%(remotepath, reason.getTraceback())))
-                    
-                d.addCallback(close)
-                d.addErrback(file_not_copied)
+            def remove_existing(_):
+                d = sftp.delete_file(dest)
+                d.addErrback(lambda _: None)
                 return d
-            
-            def error_while_connection_open(failure):
-                d = connection.close()
-                d.addBoth(lambda _:failure)
+
+            def exists(attrs):
+                d = self.directories.ensure_directory(sftp, parentdir)
+                d.addCallback(remove_existing)
+                d.addCallback(lambda _: sftp.make_link(src, dest))
+                d.addCallback(lambda _: attrs['size'])
                 return d
-                     
-            d = connection.open_sftp()
-            d.addCallback(lambda sftp: transmit_file(sftp))
-            d.addErrback(error_while_connection_open)
+
+            d.addCallback(exists)
             return d
-            
-        d = ssh.connect(self.hostname, self.username, self.password)
-        d.addCallback(on_connected)
-        
-        return d
-    
-    
-    def file_exists(self, path):
 
-        d = ssh.connect(self.hostname, self.username, self.password)                
- 
-        def on_connected(connection):
-                        
-            def check(sftp):
-                d = paths_exist(sftp,path)
-                def close(result):
-                    d_close=sftp.close()
-                    d_close.addCallback(lambda _: result)                    
-                    return d_close 
-                d.addCallback(close)
-                return d
+        return self.pool.run(link)
 
-            def error_while_connection_open(failure):
-                d = connection.close()
-                d.addBoth(lambda _:failure)
-                return d
-    
-            d = connection.open_sftp()
-            d.addCallback(check)
-            d.addErrback(error_while_connection_open)
+
+    def move_file(self, src, dest):
+        '''
+        Moves the remote file to the destination - an existing file is replaced.
+        '''
+        parentdir = os.path.dirname(dest)
+
+        def move(sftp):
+            d = self.directories.ensure_directory(sftp, parentdir)
+            d.addCallback(lambda _: sftp.delete_file(dest))
+            d.addErrback(lambda _: None)
+            d.addCallback(lambda _: sftp.rename_file(src, dest))
             return d
-            
-        d.addCallback(on_connected)        
+
+        return self.pool.run(move)
+
+
+    def stat(self, path):
+        '''
+        Returns the (deferred) size and modification time of the remote file - SFTP
+        provides the modification time in whole seconds only.
+        '''
+        d = self.pool.run(lambda sftp: sftp.stat(path))
+        d.addCallback(lambda attrs: (attrs['size'], attrs['mtime']))
         return d
-        
+
+
+    def remove_file(self, path):
+        return self.pool.run(lambda sftp: sftp.delete_file(path))
+
+
+_directory_caches={}
+
+def get_directory_cache(hostname, rootpath=None):
+    '''
+    Returns the directory cache for the workspace at the given host and root path - 
+    shared by all transporters accessing the workspace.
+    '''
+    key=(hostname, rootpath)
+    if key not in _directory_caches:
+        _directory_caches[key]=RemoteDirectoryCache(rootpath)
+    return _directory_caches[key]
+
+
+class RemoteDirectoryCache(object):
+    """
+    Remembers the remote directories known to exist. Missing directories are
+    created together with all their missing ancestors by issuing the make
+    directory requests for all of them at once - they are pipelined on the SFTP
+    channel and processed in order by the server. Entries are invalidated
+    whenever an operation on a directory fails.
+    """
+
+    def __init__(self, rootpath=None):
+        self._known=set()
+        self.hits=0
+        self.misses=0
+        if rootpath:
+            self._known.add(_normalized(rootpath))
+
+    def is_known(self, path):
+        return _normalized(path) in self._known
+
+    def missing(self, path):
+        '''
+        Returns the path and its ancestors not known to exist - top-down, up to
+        the closest ancestor known to exist.
+        '''
+        missing=[]
+        path=_normalized(path)
+        while path not in self._known:
+            missing.insert(0, path)
+            parent=os.path.dirname(path)
+            if parent==path:
+                break
+            path=parent
+        return missing
+
+    def add(self, path):
+        path=_normalized(path)
+        while path not in self._known:
+            self._known.add(path)
+            parent=os.path.dirname(path)
+            if parent==path:
+                break
+            path=parent
+
+    def invalidate(self, path):
+        path=_normalized(path)
+        prefix=path.rstrip('/')+'/'
+        self._known=set(p for p in self._known if p!=path and not p.startswith(prefix))
+
+    def ensure_directory(self, sftp, path):
+        '''
+        Makes sure the remote directory exists - creating it if needed.
+        '''
+        missing=self.missing(path)
+        if not missing:
+            self.hits+=1
+            return defer.succeed(path)
+        self.misses+=1
+        # failures are ignored here: the directory may exist already
+        deferreds=[sftp.create_directory(p) for p in missing]
+        for d in deferreds:
+            d.addErrback(lambda _: None)
+        d=defer.gatherResults(deferreds)
+        d.addCallback(lambda _: sftp.stat(path))
+
+        def created(attrs):
+            if not stat.S_ISDIR(attrs['permissions']):
+                raise ValueError("%s is not a directory."%path)
+            self.add(path)
+            return path
+
+        def dir_not_created(reason):
+            self.invalidate(path)
+            return Failure(ValueError("Target directory %s could not be created. \n Reason:%s."%(path, reason.getTraceback())))
+
+        d.addCallbacks(created, dir_not_created)
+        return d
+
+
+def _normalized(path):
+    path=os.path.normpath(path)
+    return path if path!='//' else '/'
+
 
 def paths_exist(sftp, path):
     elms_to_check=pathelms_to_check(path, "/")
@@ -189,25 +292,86 @@ def paths_exist(sftp, path):
 
 
 class LocalFileTransporter(AbstractFileTransporter):
-
-    def __init__(self):
-        pass
+    """
+    Transfers files within the local file system. Instead of copying, files may
+    be linked: with link mode 'auto' (or 'reflink'), a copy-on-write clone is
+    tried first, then a hardlink, then a symlink, and finally a copy. A mode
+    further down the list limits the modes tried accordingly. The mode that works
+    is remembered per pair of source and target file system.
+
+    Note that hard- and symlinked files share their content with the source:
+    files must not be modified in place after they have been transferred. A
+    transferred file that is written again (e.g. a list file rewritten when a
+    run is reset) must be removed first and written anew - opening it for
+    writing would truncate the other copy as well.
+    """
+
+    def __init__(self, chunk_size=None, link_mode=None):
+        self.chunk_size=chunk_size or chunked_transfer.LOCAL_CHUNK_SIZE
+        self.stats=chunked_transfer.transfer_stats
+        link_mode=link_mode or LINK_AUTO
+        if link_mode==LINK_AUTO:
+            link_mode=LINK_REFLINK
+        if link_mode not in LINK_MODES:
+            raise ConfigurationError("Link mode %s not supported."%link_mode)
+        self.link_mode=link_mode
+        self._fs_modes={}
+        self._counts={mode:0 for mode in LINK_MODES}
         
     def copy_file(self, src, dest):
-        d = defer.Deferred()
         if src==dest:
-            return
-        else:
+            return defer.succeed(None)
+        try:
             destdir=os.path.dirname(dest)
             if not os.path.exists(destdir):
                 os.makedirs(destdir)
+            self._transfer(src, dest)
+        except:
+            return defer.fail()
+        return defer.succeed(None)
+
+    def _transfer(self, src, dest):
+        key=(os.stat(src).st_dev, os.stat(os.path.dirname(dest)).st_dev)
+        modes=LINK_MODES[LINK_MODES.index(self._fs_modes.get(key, self.link_mode)):]
+        for mode in modes:
+            if os.path.lexists(dest):
+                os.remove(dest)
             try:
-                shutil.copyfile(src, dest)
-            except:
-                d.errback()
-        
-        d.callback(None)
-        return d
+                _LINK_METHODS[mode](self, src, dest)
+            except (OSError, IOError) as e:
+                if mode==LINK_COPY:
+                    raise
+                logger.debug("Transfer of %s by %s not possible: %s"%(src, mode, e))
+                continue
+            if self._fs_modes.get(key)!=mode:
+                logger.info("Using %s to transfer files from device %i to device %i."%(mode, key[0], key[1]))
+                self._fs_modes[key]=mode
+            self._counts[mode]+=1
+            return mode
+
+    def _reflink(self, src, dest):
+        if not fcntl:
+            raise OSError("Reflinks not supported on this platform.")
+        with open(src, 'rb') as fsrc:
+            with open(dest, 'wb') as fdest:
+                fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+
+    def _hardlink(self, src, dest):
+        os.link(src, dest)
+
+    def _symlink(self, src, dest):
+        os.symlink(os.path.abspath(src), dest)
+
+    def _copy(self, src, dest):
+        chunked_transfer.copy(src, dest, self.chunk_size, self.stats)
+
+    def get_statistics(self):
+        '''
+        Returns the link modes used per pair of source and target device and the number
+        of files transferred per mode.
+        '''
+        return {'linkModes':{"%i:%i"%key:mode for key,mode in self._fs_modes.iteritems()},
+                'transfers':{mode:count for mode,count in self._counts.iteritems() if count}}
 
     def fetch_file(self, remotepath, localpath):
         return self.copy_file(remotepath, localpath)
@@ -217,8 +381,65 @@ class LocalFileTransporter(AbstractFileTransporter):
     
     def file_exists(self, path, rootpath="/"):
         return defer.succeed(os.path.exists(path))
+
+    def checksum(self, path):
+        try:
+            return defer.succeed(chunked_transfer.file_checksum(path, self.chunk_size))
+        except:
+            return defer.fail()
+
+    def link_file(self, src, dest):
+        '''
+        Makes the file available at the destination - using the link mode configured.
+        :returns: Deferred size of the file.
+        '''
+        d = self.copy_file(src, dest)
+        d.addCallback(lambda _: os.path.getsize(dest))
+        return d
+
+    def move_file(self, src, dest):
+        try:
+            destdir=os.path.dirname(dest)
+            if not os.path.exists(destdir):
+                os.makedirs(destdir)
+            if os.path.lexists(dest):
+                os.remove(dest)
+            try:
+                os.rename(src, dest)
+            except OSError as e:
+                if e.errno!=errno.EXDEV:
+                    raise
+                # across devices the data is copied - a link would not outlive the removal of the source
+                self._copy(src, dest)
+                self._counts[LINK_COPY]+=1
+                os.remove(src)
+        except:
+            return defer.fail()
+        return defer.succeed(None)
+
+    def stat(self, path):
+        try:
+            st=os.stat(path)
+        except:
+            return defer.fail()
+        # sub-second modification time, inode and change time: a product rewritten with the
+        # same size within the same second must not pass for unchanged
+        return defer.succeed((st.st_size, st.st_mtime, st.st_ino, st.st_ctime))
+
+    def remove_file(self, path):
+        try:
+            os.remove(path)
+        except:
+            return defer.fail()
+        return defer.succeed(None)
     
 
+_LINK_METHODS={LINK_REFLINK:LocalFileTransporter._reflink,
+               LINK_HARDLINK:LocalFileTransporter._hardlink,
+               LINK_SYMLINK:LocalFileTransporter._symlink,
+               LINK_COPY:LocalFileTransporter._copy}
+
+
 def pathelms_to_check(path, rootpath=""):
     if rootpath.endswith("/"):
         rootpath=rootpath[:-1]
@@ -0,0 +1,168 @@
+'''
+Compact list files - the lists a parallel split iterates over and the lists of output tuples it
+produces.
+
+A list file consists of a header, the records of the elements and an index with the offsets of
+the records (all integers little endian):
+
+ * header: magic 'EWLIST', format version (uint16), number of elements (uint64) and offset of
+   the index (uint64);
+ * records: for each element, the length of its data (uint32) followed by the element pickled;
+ * index: for each element, the offset of its record (uint64).
+
+The file is written in a single pass - the header is completed when the writer is closed. Until
+then, the header holds the index offset 0 which marks the file as incomplete: it cannot be read.
+A file whose writing fails is removed.
+It is read through a memory map: the number of elements is taken from the header and an element is
+only unpickled when it is accessed. Files with a pickled python list - the format used before -
+are still read (see load_list).
+'''
+import mmap
+import os
+import pickle
+import struct
+
+MAGIC='EWLIST'
+VERSION=1
+
+_HEADER=struct.Struct('<6sHQQ')
+_LENGTH=struct.Struct('<I')
+_OFFSET=struct.Struct('<Q')
+
+
+class ListFileError(IOError):
+    pass
+
+
+class ListFileWriter(object):
+    """
+    Writes a list file element by element. An existing file is replaced - not truncated - so that
+    the copies linked to it (see LocalFileTransporter) keep their content.
+    """
+
+    def __init__(self, path):
+        self.path=path
+        self.offsets=[]
+        if os.path.lexists(path):
+            os.remove(path)
+        self._file=open(path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+
+
+    def append(self, element):
+        data=pickle.dumps(element, pickle.HIGHEST_PROTOCOL)
+        self.offsets.append(self._file.tell())
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+
+
+    def flush(self):
+        self._file.flush()
+
+
+    def close(self):
+        index_offset=self._file.tell()
+        self._file.write(''.join(_OFFSET.pack(offset) for offset in self.offsets))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self.offsets), index_offset))
+        self._file.close()
+
+
+    def abort(self):
+        '''
+        Closes the file without completing it and removes it - nothing is left that might be
+        taken for the complete list.
+        '''
+        self._file.close()
+        if os.path.lexists(self.path):
+            os.remove(self.path)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ListFile(object):
+    """
+    Read-only, random access view of a list file - supports len(), indices, slices and iteration.
+    """
+
+    def __init__(self, path):
+        self.path=path
+        with open(path, 'rb') as f:
+            size=os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ListFileError("List file %s is truncated."%path)
+            self._map=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self._index_offset=_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ListFileError("%s is not a list file."%path)
+        if version > VERSION:
+            self._map.close()
+            raise ListFileError("List file %s has version %i - only versions up to %i are supported."%(path, version, VERSION))
+        if self._index_offset < _HEADER.size:
+            self._map.close()
+            raise ListFileError("List file %s is incomplete - it is still being written."%path)
+        if self._index_offset+self.count*_OFFSET.size > size:
+            self._map.close()
+            raise ListFileError("List file %s is truncated."%path)
+
+
+    def __len__(self):
+        return self.count
+
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._element(i) for i in xrange(*key.indices(self.count))]
+        if key < 0:
+            key+=self.count
+        if key < 0 or key >= self.count:
+            raise IndexError("List index %i out of range."%key)
+        return self._element(key)
+
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self._element(i)
+
+
+    def _element(self, i):
+        offset,=_OFFSET.unpack_from(self._map, self._index_offset+i*_OFFSET.size)
+        length,=_LENGTH.unpack_from(self._map, offset)
+        start=offset+_LENGTH.size
+        return pickle.loads(self._map[start:start+length])
+
+
+    def close(self):
+        self._map.close()
+
+
+def write_list(path, elements):
+    with ListFileWriter(path) as writer:
+        for element in elements:
+            writer.append(element)
+
+
+def is_listfile(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_list(path):
+    '''
+    Returns the list stored in the given file - a ListFile, or a python list if the file
+    contains a pickled list.
+    '''
+    if is_listfile(path):
+        return ListFile(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,247 @@
+'''
+Static index of the package definitions (pkgdefs) - the executables defined in a package
+repository are listed without importing the package modules.
+
+Each pkgdef file is parsed (python ast) and its module level definitions of the form
+'name=Executable(command=..., inputs=[...], outputs=[...], resources=ComputingResources(...))'
+are extracted - with literals or names bound to literals as arguments. A file with other
+definitions of executables (e.g. computed arguments) cannot be indexed statically: it is
+imported instead. The definitions are cached on disk, keyed by the hash of the file content,
+so that unchanged files are not even parsed again. The cache file of a repository is kept in the
+user's cache directory (or the directory configured, see cachepath) - not in the repository.
+
+Created on Oct 18, 2026
+
+@author: martin.melchior
+'''
+import ast
+import hashlib
+import json
+import logging
+import os
+
+from euclidwf.framework import taskdefs
+from euclidwf.framework.taskdefs import Executable, Input, Output, ComputingResources
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR=os.path.join('euclidwf', 'pkgdef_index')
+INDEX_VERSION=1
+
+_EXECUTABLE_PARAMS=('command', 'inputs', 'outputs', 'resources')
+_INPUT_PARAMS=('inputname', 'dm_type', 'content_type')
+_OUTPUT_PARAMS=('outputname', 'dm_type', 'mime_type', 'content_type')
+_RESOURCES_PARAMS=('cores', 'ram', 'walltime')
+
+# names of taskdefs that may be used as arguments in the definitions
+_TASKDEFS_NAMES={name:getattr(taskdefs, name) for name in ('MIME_XML', 'MIME_TXT', 'TYPE_FILE', 'TYPE_LISTFILE')}
+
+
+class _NotStatic(Exception):
+    pass
+
+
+def default_cachedir():
+    '''
+    Returns the directory for the cache files in the user's cache directory ($XDG_CACHE_HOME or ~/.cache).
+    '''
+    usercache=os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(usercache, INDEX_DIR)
+
+
+def cachepath(pkgrepos, cachedir=None):
+    '''
+    Returns the path of the cache file for the given repository - named by the hash of the path
+    of the repository, in the given directory or the default one.
+    '''
+    key=hashlib.sha1(os.path.realpath(pkgrepos)).hexdigest()
+    return os.path.join(cachedir or default_cachedir(), '%s.json'%key)
+
+
+class PkgdefIndex(object):
+    """
+    Index of the executables defined in the pkgdef files of a repository - with the definitions
+    of the files parsed kept in a cache file.
+    """
+
+    def __init__(self, cachepath):
+        self.cachepath=cachepath
+        self.parsed=0
+        self.cached=0
+        self.imported=0
+        self._entries=self._load()
+
+
+    def get_all_executables(self, pkgrepos, import_executables):
+        '''
+        Returns the executables defined in the pkgdef files of the repository (by name).
+        :param import_executables: f(pkgname) returning the executables of a package by importing
+        its module - for the files that cannot be indexed statically.
+        '''
+        executables={}
+        entries={}
+        for f in sorted(os.listdir(pkgrepos)):
+            fpath=os.path.join(pkgrepos, f)
+            if not os.path.isfile(fpath) or not f.endswith('.py') or f == '__init__.py':
+                continue
+            pkgname=f[:-3]
+            with open(fpath, 'rb') as pkgfile:
+                source=pkgfile.read()
+            key=hashlib.sha1(source).hexdigest()
+            if key in self._entries:
+                self.cached+=1
+                definitions=self._entries[key]
+            else:
+                self.parsed+=1
+                definitions=parse_definitions(source, fpath)
+            entries[key]=definitions
+            if definitions is None:
+                self.imported+=1
+                executables.update(import_executables(pkgname))
+            else:
+                for name, definition in definitions.iteritems():
+                    executables[str(name)]=_executable(definition, pkgname, fpath)
+        if entries != self._entries:
+            self._entries=entries
+            self._save()
+        return executables
+
+
+    def get_statistics(self):
+        return {'parsed':self.parsed, 'cached':self.cached, 'imported':self.imported}
+
+
+    def _load(self):
+        if not self.cachepath or not os.path.exists(self.cachepath):
+            return {}
+        try:
+            with open(self.cachepath, 'r') as f:
+                index=json.load(f)
+        except (IOError, ValueError) as e:
+            logger.warn("Index of package definitions %s ignored: %s"%(self.cachepath, e))
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        return index['files']
+
+
+    def _save(self):
+        if not self.cachepath:
+            return
+        try:
+            cachedir=os.path.dirname(self.cachepath)
+            if cachedir and not os.path.exists(cachedir):
+                os.makedirs(cachedir)
+            with open(self.cachepath, 'w') as f:
+                json.dump({'version':INDEX_VERSION, 'files':self._entries}, f)
+        except (IOError, OSError) as e:
+            logger.warn("Index of package definitions could not be written to %s: %s"%(self.cachepath, e))
+
+
+def parse_definitions(source, fpath='<pkgdef>'):
+    '''
+    Returns the definitions of the executables in the given source of a pkgdef file - as dicts
+    with the arguments of the Executable by name of the variable it is bound to. Returns None
+    if the executables cannot be extracted statically.
+    '''
+    try:
+        module=ast.parse(source, fpath)
+    except SyntaxError:
+        return None
+    names=dict(_TASKDEFS_NAMES)
+    definitions={}
+    try:
+        for stmt in module.body:
+            if not isinstance(stmt, ast.Assign) or len(stmt.targets) != 1 or not isinstance(stmt.targets[0], ast.Name):
+                continue
+            target=stmt.targets[0].id
+            if _is_call(stmt.value, 'Executable'):
+                definitions[target]=_definition(stmt.value, names)
+            else:
+                try:
+                    names[target]=ast.literal_eval(stmt.value)
+                except ValueError:
+                    names.pop(target, None)
+    except _NotStatic:
+        return None
+    # all the executables must be defined at module level
+    calls=[node for node in ast.walk(module) if _is_call(node, 'Executable')]
+    if len(calls) != len(definitions):
+        return None
+    return definitions
+
+
+def _definition(call, names):
+    args=_arguments(call, _EXECUTABLE_PARAMS, names, {'inputs':_inputs, 'outputs':_outputs, 'resources':_resources})
+    if not isinstance(args.get('command'), basestring):
+        raise _NotStatic()
+    return args
+
+
+def _inputs(node, names):
+    return [_port(elt, 'Input', _INPUT_PARAMS, names) for elt in _elements(node)]
+
+
+def _outputs(node, names):
+    return [_port(elt, 'Output', _OUTPUT_PARAMS, names) for elt in _elements(node)]
+
+
+def _port(node, classname, params, names):
+    if _is_call(node, classname):
+        args=_arguments(node, params, names)
+        args['name']=args.pop(params[0], None)
+    else:
+        args={'name':_literal(node, names)}
+    if not isinstance(args['name'], basestring):
+        raise _NotStatic()
+    return args
+
+
+def _resources(node, names):
+    if not _is_call(node, 'ComputingResources'):
+        raise _NotStatic()
+    return _arguments(node, _RESOURCES_PARAMS, names)
+
+
+def _elements(node):
+    if not isinstance(node, (ast.List, ast.Tuple)):
+        raise _NotStatic()
+    return node.elts
+
+
+def _arguments(call, params, names, handlers={}):
+    if call.starargs or call.kwargs or len(call.args) > len(params):
+        raise _NotStatic()
+    nodes=dict(zip(params, call.args))
+    for keyword in call.keywords:
+        if keyword.arg not in params:
+            raise _NotStatic()
+        nodes[keyword.arg]=keyword.value
+    return {param:handlers.get(param, _literal)(node, names) for param, node in nodes.iteritems()}
+
+
+def _literal(node, names):
+    if isinstance(node, ast.Name) and node.id in names:
+        return names[node.id]
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise _NotStatic()
+
+
+def _is_call(node, name):
+    if not isinstance(node, ast.Call):
+        return False
+    func=node.func
+    return (isinstance(func, ast.Name) and func.id == name) or (isinstance(func, ast.Attribute) and func.attr == name)
+
+
+def _executable(definition, pkgname, pkgfile):
+    def text(value):
+        return str(value) if isinstance(value, basestring) else value
+    def kwargs(args):
+        return {str(k):text(v) for k, v in args.iteritems() if k != 'name'}
+    inputs=[Input(text(args['name']), **kwargs(args)) for args in definition.get('inputs', [])]
+    outputs=[Output(text(args['name']), **kwargs(args)) for args in definition.get('outputs', [])]
+    resources=ComputingResources(**kwargs(definition['resources'])) if 'resources' in definition else ComputingResources()
+    return Executable(text(definition['command']), inputs, outputs, resources, pkgname=pkgname, pkgfile=pkgfile)
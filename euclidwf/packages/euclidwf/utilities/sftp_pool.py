@@ -0,0 +1,338 @@
+'''
+Pool of persistent SSH connections and SFTP sessions.
+
+Opening an SSH connection (TCP connect, key exchange, authentication) is much
+more expensive than a typical file operation in the workspace. The pools kept
+by this module are shared by all transporters (and hence all pipeline runs)
+of the server process. Per host and user, one SSH connection is kept open with
+a bounded number of SFTP channels on top of it. Idle channels are closed after
+a configurable time, the connection is kept alive by a cheap request (a stat of
+the home directory) on an idle session - which also detects a lost connection -
+and a connection that has been lost is re-established transparently with the
+next request.
+'''
+import logging
+
+from twisted.internet import defer, error, task, reactor
+from twisted.python.failure import Failure
+
+from remoot import ssh
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS=4
+DEFAULT_IDLE_TIMEOUT=300.0
+DEFAULT_KEEPALIVE_INTERVAL=60.0
+
+CONNECTION_ERRORS=(error.ConnectionLost, error.ConnectionDone, error.ConnectError)
+
+_pools={}
+
+
+def get_pool(hostname, username, password=None, max_sessions=None, idle_timeout=None, keepalive_interval=None):
+    '''
+    Returns the pool for the given host and user - creating it if it does not yet exist.
+    The settings are only applied if a new pool is created.
+    '''
+    key=(hostname, username)
+    if key not in _pools:
+        _pools[key]=SFTPSessionPool(hostname, username, password,
+                                    max_sessions or DEFAULT_MAX_SESSIONS,
+                                    idle_timeout or DEFAULT_IDLE_TIMEOUT,
+                                    keepalive_interval or DEFAULT_KEEPALIVE_INTERVAL)
+    return _pools[key]
+
+
+def close_all():
+    '''
+    Closes all pools - to be called when the server shuts down.
+    '''
+    ds=[pool.close() for pool in _pools.values()]
+    _pools.clear()
+    return defer.DeferredList(ds)
+
+
+class SFTPSessionPool(object):
+    """
+    Keeps one SSH connection to a host and at most `max_sessions` SFTP sessions on
+    top of it. Requests for a session beyond that limit are queued until a session
+    is released.
+    """
+
+    def __init__(self, hostname, username, password=None, max_sessions=DEFAULT_MAX_SESSIONS,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL,
+                 clock=reactor, connect=ssh.connect):
+        self.hostname=hostname
+        self.username=username
+        self.password=password
+        self.max_sessions=max_sessions
+        self.idle_timeout=idle_timeout
+        self.keepalive_interval=keepalive_interval
+        self._clock=clock
+        self._connect=connect
+        self._connection=None
+        self._connecting=None
+        self._idle=[]  # list of (session, released at)
+        self._busy=set()
+        self._opening=0
+        self._waiting=[]
+        self._housekeeping=task.LoopingCall(self._keep_alive)
+        self._housekeeping.clock=clock
+        self.stats={'connects':0, 'sessions_opened':0, 'sessions_reused':0, 'retries':0}
+
+
+    def run(self, operation):
+        '''
+        Acquires a session, calls `operation(sftp)` - which must return a deferred -
+        and releases the session as soon as the deferred has fired. If the operation
+        fails because the connection was lost, it is retried once with a new session.
+        '''
+        def attempt(retry):
+            d=self.acquire()
+
+            def acquired(sftp):
+                d_op=defer.maybeDeferred(operation, sftp)
+
+                def done(result):
+                    broken=isinstance(result, Failure) and result.check(*CONNECTION_ERRORS)
+                    self.release(sftp, broken)
+                    if broken and retry:
+                        self.stats['retries']+=1
+                        logger.info("SFTP session to %s broken - retrying with a new session."%self.hostname)
+                        return attempt(False)
+                    return result
+
+                d_op.addBoth(done)
+                return d_op
+
+            d.addCallback(acquired)
+            return d
+
+        return attempt(True)
+
+
+    def acquire(self):
+        '''
+        Returns a deferred SFTP session - an idle one if available, a new one
+        if the limit is not yet reached, otherwise the next one released.
+        '''
+        while self._idle:
+            # closed sessions are already removed from the idle ones (see _forget)
+            sftp,_=self._idle.pop()
+            if self._connection is None:
+                continue
+            self._busy.add(sftp)
+            self.stats['sessions_reused']+=1
+            return defer.succeed(sftp)
+        if len(self._busy)+self._opening<self.max_sessions:
+            return self._open_session()
+        d=defer.Deferred()
+        self._waiting.append(d)
+        return d
+
+
+    def release(self, sftp, broken=False):
+        '''
+        Returns the session to the pool - or closes it if it is broken.
+        '''
+        self._busy.discard(sftp)
+        if broken:
+            self._drop_connection()
+        elif self._waiting:
+            self._busy.add(sftp)
+            self.stats['sessions_reused']+=1
+            self._waiting.pop(0).callback(sftp)
+            return
+        else:
+            self._idle.append((sftp, self._clock.seconds()))
+        self._serve_waiting()
+
+
+    def close(self):
+        if self._housekeeping.running:
+            self._housekeeping.stop()
+        for d in self._waiting:
+            d.errback(Failure(error.ConnectionDone("SFTP session pool closed.")))
+        self._waiting=[]
+        return self._drop_connection()
+
+
+    def _serve_waiting(self):
+        while self._waiting and len(self._busy)+self._opening<self.max_sessions:
+            self._open_session().chainDeferred(self._waiting.pop(0))
+
+
+    def _open_session(self):
+        self._opening+=1
+        d=self._get_connection()
+        d.addCallback(lambda connection: connection.open_sftp())
+
+        def opened(session):
+            self._opening-=1
+            sftp=SFTPSession(session)
+            self._busy.add(sftp)
+            self.stats['sessions_opened']+=1
+            sftp.closed.add_callback(lambda _: self._forget(sftp))
+            return sftp
+
+        def failed(reason):
+            self._opening-=1
+            return reason
+
+        d.addCallbacks(opened, failed)
+        return d
+
+
+    def _get_connection(self):
+        if self._connection:
+            return defer.succeed(self._connection)
+        if self._connecting is not None:
+            d=defer.Deferred()
+            self._connecting.append(d)
+            return d
+        self._connecting=[]
+        logger.debug("Opening SSH connection to %s for the SFTP session pool."%self.hostname)
+        d=self._connect(self.hostname, self.username, self.password)
+
+        def connected(connection):
+            self._connection=connection
+            self.stats['connects']+=1
+            connection.closed.add_callback(lambda _: self._on_connection_closed(connection))
+            if not self._housekeeping.running:
+                self._housekeeping.start(self.keepalive_interval, False)
+            for waiting in self._notify_connecting():
+                waiting.callback(connection)
+            return connection
+
+        def failed(reason):
+            for waiting in self._notify_connecting():
+                waiting.errback(reason)
+            return reason
+
+        d.addCallbacks(connected, failed)
+        return d
+
+
+    def _notify_connecting(self):
+        waiting=self._connecting
+        self._connecting=None
+        return waiting
+
+
+    def _on_connection_closed(self, connection):
+        if connection is self._connection:
+            logger.info("SSH connection to %s lost."%self.hostname)
+            self._drop_connection()
+
+
+    def _drop_connection(self):
+        '''
+        Forgets the current connection and its idle sessions - the next request
+        opens a new connection.
+        '''
+        connection=self._connection
+        self._connection=None
+        self._idle=[]
+        if connection:
+            d=defer.maybeDeferred(connection.close)
+            d.addErrback(lambda reason: logger.debug("Closing SSH connection to %s failed: %s"%(self.hostname, reason.getErrorMessage())))
+            return d
+        return defer.succeed(None)
+
+
+    def _forget(self, sftp):
+        self._busy.discard(sftp)
+        self._idle=[(s,t) for (s,t) in self._idle if s is not sftp]
+
+
+    def _keep_alive(self):
+        '''
+        Closes sessions idle for longer than the idle timeout - and the connection
+        if no session is left - and keeps the connection alive otherwise by a stat 
+        on an idle session.
+        '''
+        now=self._clock.seconds()
+        expired=[s for (s,t) in self._idle if now-t>self.idle_timeout]
+        self._idle=[(s,t) for (s,t) in self._idle if now-t<=self.idle_timeout]
+        for sftp in expired:
+            sftp.close()
+        if self._connection is None:
+            return
+        if not self._idle and not self._busy and not self._opening:
+            logger.debug("Closing idle SSH connection to %s."%self.hostname)
+            self._drop_connection()
+            self._housekeeping.stop()
+            return
+        if self._idle:
+            self._probe(self._idle[-1][0])
+
+
+    def _probe(self, sftp):
+        '''
+        Stats the home directory with the given idle session - the session is closed if
+        the request fails, and the connection dropped if it has been lost.
+        '''
+        connection=self._connection
+        d=sftp.stat('.')
+
+        def failed(reason):
+            logger.info("SFTP session to %s not alive: %s"%(self.hostname, reason.getErrorMessage()))
+            if reason.check(*CONNECTION_ERRORS):
+                if connection is self._connection:
+                    self._drop_connection()
+            elif sftp in [s for (s,_) in self._idle]:
+                self._forget(sftp)
+                d=defer.maybeDeferred(sftp.close)
+                d.addErrback(lambda _: None)
+
+        d.addErrback(failed)
+        return d
+
+
+class SFTPSession(object):
+    """
+    SFTP session handed out by the pool - wraps the session of remoot, which provides
+    whole file reads and writes only, and adds the requests needed for chunked transfers,
+    links and renames. These are sent by the SFTP client of the remoot session (twisted's
+    FileTransferClient) - this is the only place relying on it.
+    """
+
+    def __init__(self, session):
+        self.session=session
+        self.closed=session.closed
+
+    def stat(self, path):
+        '''
+        Returns the deferred attributes (size, mtime, permissions, ...) of the remote path.
+        '''
+        return defer.maybeDeferred(self.session._client.getAttrs, path)
+
+    def open_file(self, path, flags):
+        '''
+        Returns the deferred remote file (twisted's ISFTPFile) opened with the given
+        flags (`filetransfer.FXF_*`).
+        '''
+        return defer.maybeDeferred(self.session._client.openFile, path, flags, {})
+
+    def make_link(self, target, linkpath):
+        '''
+        Creates a symbolic link at `linkpath` pointing to `target`. The request is sent
+        with the target first - as expected by OpenSSH, contrary to the order of the SFTP
+        draft followed by twisted.
+        '''
+        return defer.maybeDeferred(self.session._client.makeLink, target, linkpath)
+
+    def rename_file(self, src, dest):
+        return defer.maybeDeferred(self.session._client.renameFile, src, dest)
+
+    def delete_file(self, path):
+        return self.session.delete_file(path)
+
+    def create_directory(self, path):
+        return self.session.create_directory(path)
+
+    def list_directory(self, path):
+        return self.session.list_directory(path)
+
+    def close(self):
+        return self.session.close()
@@ -27,7 +27,7 @@ setup(
     author_email='martin.melchior@fhnw.ch',
     url=None,
 	install_requires = install_requires,
-    scripts=['bin/client_for_test.py','bin/pipeline_runner.py','bin/pipeline_server_flask.py'],
+    scripts=['bin/bundle_runner.py','bin/client_for_test.py','bin/pipeline_runner.py','bin/pipeline_server_flask.py'],
     package_dir = {'': 'packages'},
     packages = find_packages("packages")
 )
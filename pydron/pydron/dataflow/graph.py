@@ -2,6 +2,7 @@
 
 import threading
 from frozendict import frozendict
+from sortedcontainers import SortedSet
 
 class Tick(object):
     """
@@ -32,6 +33,19 @@ class Tick(object):
                 raise ValueError("elements must be non-negative.")
         self._elements = elements
         self._loopmask = loopmask
+        self._hash = hash(elements)
+        
+    @staticmethod
+    def _create(elements, loopmask):
+        """
+        Creates a tick without checking the elements - for ticks derived
+        from valid ticks.
+        """
+        tick = object.__new__(Tick)
+        tick._elements = elements
+        tick._loopmask = loopmask
+        tick._hash = hash(elements)
+        return tick
     
     def mark_loop_iteration(self):
         """
@@ -71,7 +85,7 @@ class Tick(object):
         """
         if other == FINAL_TICK:
             raise ValueError("Cannot move beyond FINAL_TICK")
-        return Tick(other._elements + self._elements[1:], other._loopmask + self._loopmask[1:])
+        return Tick._create(other._elements + self._elements[1:], other._loopmask + self._loopmask[1:])
     
     def __rshift__(self, positions):
         """
@@ -85,7 +99,13 @@ class Tick(object):
         return cmp(self._elements, other._elements)
     
     def __hash__(self):
-        return hash(self._elements)
+        return self._hash
+    
+    def __eq__(self, other):
+        return isinstance(other, Tick) and self._elements == other._elements
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
     
     def __repr__(self):
         if self == START_TICK:
@@ -138,6 +158,12 @@ class Tick(object):
         else:
             return Tick((0, tick), (False, False))
 
+def tick_key(tick):
+    """
+    Key to order ticks by - e.g. in sorted containers, faster than comparing the ticks.
+    """
+    return tick._elements
+
 START_TICK = Tick((0,0), (False, False))
 FINAL_TICK = Tick((1,0), (False, False))
 
@@ -165,25 +191,63 @@ class GraphObserver(object):
 class Endpoint(object):
     """
     Port of a specific node.
+    
+    With an `index` the endpoint refers to an element of a vector port:
+    as source it provides the element at that index of the sequence
+    set as output value of the port; as destination it receives the
+    element at that index of the list passed as input value of the port
+    (see :func:`gather_inputs`). A single value is passed for each
+    connection, so a task can provide the values for many consumers
+    with one port instead of one port per consumer.
     """
-    def __init__(self, tick, port):
+    def __init__(self, tick, port, index=None):
         assert isinstance(tick, Tick)
         assert isinstance(port, str)
         assert port is not None
+        assert index is None or isinstance(index, int)
         self.tick = tick
         self.port = port
+        self.index = index
+        
+        #: Identifies the endpoint among the inputs of the task.
+        self.key = port if index is None else (port, index)
+        
+        # endpoints are hashed for every lookup of a connection
+        self._hash = hash(tick) + 7*hash(port) + 13*hash(index)
 
     def __repr__(self):
-        return "Endpoint(%s, %s)" % (repr(self.tick), repr(self.port))
+        if self.index is None:
+            return "Endpoint(%s, %s)" % (repr(self.tick), repr(self.port))
+        return "Endpoint(%s, %s, %s)" % (repr(self.tick), repr(self.port), repr(self.index))
 
     def __eq__(self, other):
-        return self.tick == other.tick and self.port == other.port
+        return self.tick == other.tick and self.port == other.port and self.index == other.index
 
     def __ne__(self, other):
         return not self.__eq__(other)
     
     def __hash__(self):
-        return hash(self.tick) + 7*hash(self.port)
+        return self._hash
+
+
+def gather_inputs(inputs):
+    """
+    Returns the values passed to the input ports of a task as `port -> value`
+    dict given `(dest endpoint, value)` pairs. The values received by
+    the elements of a vector port are passed as list, ordered by index.
+    """
+    values = {}
+    vectors = {}
+    for dest, value in inputs:
+        if dest.index is None:
+            values[dest.port] = value
+        else:
+            vectors.setdefault(dest.port, {})[dest.index] = value
+    for port, elements in vectors.iteritems():
+        if len(elements) != max(elements) + 1:
+            raise ValueError("Elements of vector port %s are missing." % port)
+        values[port] = [elements[index] for index in xrange(len(elements))]
+    return values
 
 
 class _TaskNode(object):
@@ -200,6 +264,9 @@ class _TaskNode(object):
     def set_property(self, key, value):
         self.properties = self.properties.copy(**{key:value})
         
+    def set_properties(self, properties):
+        self.properties = self.properties.copy(**properties)
+        
     def __eq__(self, other):
         if self.task != other.task:
             return False
@@ -234,6 +301,7 @@ class _Connection(object):
         assert isinstance(dest, Endpoint)
         self.source = source
         self.dest = dest
+        self._hash = 1 * hash(source) + 3 * hash(dest)
 
     def __eq__(self, other):
         return (self.source == other.source and
@@ -243,8 +311,7 @@ class _Connection(object):
         return not self.__eq__(other)
     
     def __hash__(self):
-        return (1 *hash(self.source) + 
-                3 * hash(self.dest))
+        return self._hash
         
     def __repr__(self):
         return "(%s, %s)" % (repr(self.source), repr(self.dest))
@@ -280,10 +347,20 @@ class Graph(object):
     
     .. py:function:: disconnected(graph, source, dest)
     
+    Observers may also implement
+    
+    .. py:function:: bulk_inserted(ticks, connections)
+    
+    to be notified once for all tasks and connections added by :meth:`insert_subgraphs` 
+    and :meth:`connect_all`. Otherwise, they are notified for each task and connection.
+    
     The methods are called *after* the graph has been changed. During those calls
     the graph may *not* be changed with the exception of task properties. Exceptions
     thrown in those methods leave the graph in an undefined state. Changes to
     task properties are not reported.
+    
+    The ticks of the tasks are kept in order as well, so that the tasks inserted
+    at a tick (see :meth:`get_descendant_ticks`) are found without a scan of the graph.
     """
     
 
@@ -291,6 +368,7 @@ class Graph(object):
     def __init__(self):
         self._ticks = {START_TICK:_TaskNode(None, {}),
                        FINAL_TICK:_TaskNode(None, {})}
+        self._tick_index = SortedSet(key=tick_key)
         self._observers = []
 
     def add_task(self, tick, task, properties={}):
@@ -311,6 +389,7 @@ class Graph(object):
         if tick in self._ticks:
             raise ValueError("Tick already has a task")
         self._ticks[tick] = tasknode
+        self._tick_index.add(tick)
         
         self._fire_task_added(tick, task, properties)
 
@@ -324,6 +403,7 @@ class Graph(object):
         if self.get_in_connections(tick) or self.get_out_connections(tick):
             raise ValueError("Task is connected")
         del self._ticks[tick]
+        self._tick_index.discard(tick)
         
         self._fire_task_removed(tick)
             
@@ -339,6 +419,11 @@ class Graph(object):
         connection already exists and `throw_exists` is `False`.
         """
         
+        self._connect(source, dest)
+        self._fire_connected(source, dest)
+        return True
+    
+    def _connect(self, source, dest):
         if dest.tick < source.tick:
             raise ValueError("Destination executes before source")
         
@@ -354,8 +439,8 @@ class Graph(object):
         source_task = self._ticks[source.tick]
         dest_task = self._ticks[dest.tick]
         
-        if dest.port in dest_task.in_connections:
-            if dest_task.in_connections[dest.port] == conn:
+        if dest.key in dest_task.in_connections:
+            if dest_task.in_connections[dest.key] == conn:
                 # connection already exists
                 raise ValueError("The connection %s already exists" % repr(conn))
             else:
@@ -364,11 +449,82 @@ class Graph(object):
         if conn in source_task.out_connections:
             raise ValueError("This connection already exists")
         
-        dest_task.in_connections[dest.port] = conn
+        dest_task.in_connections[dest.key] = conn
         source_task.out_connections.add(conn)
-
-        self._fire_connected(source, dest)
-        return True
+    
+    def connect_all(self, connections):
+        """
+        Creates all the given connections - like :meth:`connect` for each
+        `(source, dest)` tuple, but the observers are notified once.
+        """
+        connections = list(connections)
+        for source, dest in connections:
+            self._connect(source, dest)
+        self._fire_bulk_inserted([], connections)
+    
+    def insert_subgraphs(self, subgraph, superticks, properties=None, connections=()):
+        """
+        Inserts a copy of all tasks and connections between them from `subgraph` 
+        for each tick in `superticks` - with all ticks shifted by that tick. 
+        Same as :func:`pydron.dataflow.refine.insert_subgraph` for each tick 
+        but in one operation: the connections within the subgraph are resolved 
+        once and the observers are notified once. The connections to START_TICK 
+        and FINAL_TICK are NOT copied.
+        
+        :param properties: Optional function `f(supertick, tick, properties)` 
+          returning the properties of the copy at `tick << supertick` of the task
+          at `tick` in `subgraph`. It is passed a new `dict` with the properties
+          of the task in `subgraph` which it may change and return. By default 
+          the properties are copied as they are.
+          
+        :param connections: Further `(source, dest)` tuples to connect once the
+          tasks are inserted - typically the connections of the copies to the
+          tasks around them. Like :meth:`connect_all`, but within the same
+          operation.
+          
+        :returns: The ticks of the tasks added.
+        """
+        template = subgraph.get_all_ticks()
+        template_properties = {tick : dict(subgraph.get_task_properties(tick).iteritems()) for tick in template}
+        edges = [(source.tick, source.port, source.index, dest.tick, dest.port, dest.index) 
+                 for tick in template
+                 for source, dest in subgraph.get_in_connections(tick)
+                 if source.tick != START_TICK]
+        
+        shifted = []
+        newticks = set()
+        for supertick in superticks:
+            ticks = {tick : tick << supertick for tick in template}
+            for newtick in ticks.itervalues():
+                if newtick in self._ticks or newtick in newticks:
+                    raise ValueError("Tick already has a task")
+                newticks.add(newtick)
+            shifted.append((supertick, ticks))
+            
+        added = []
+        inserted = []
+        for supertick, ticks in shifted:
+            for tick in template:
+                props = dict(template_properties[tick])
+                if properties is not None:
+                    props = properties(supertick, tick, props)
+                self._ticks[ticks[tick]] = _TaskNode(subgraph.get_task(tick), props)
+                added.append(ticks[tick])
+            for source_tick, source_port, source_index, dest_tick, dest_port, dest_index in edges:
+                source = Endpoint(ticks[source_tick], source_port, source_index)
+                dest = Endpoint(ticks[dest_tick], dest_port, dest_index)
+                conn = _Connection(source, dest)
+                self._ticks[dest.tick].in_connections[dest.key] = conn
+                self._ticks[source.tick].out_connections.add(conn)
+                inserted.append((source, dest))
+        self._tick_index.update(added)
+        
+        for source, dest in connections:
+            self._connect(source, dest)
+            inserted.append((source, dest))
+        
+        self._fire_bulk_inserted(added, inserted)
+        return added
     
     def disconnect(self, source, dest):
         """
@@ -385,7 +541,7 @@ class Graph(object):
         if conn not in source_task.out_connections:
             raise ValueError("This connection does not exists")
         
-        del dest_task.in_connections[dest.port]
+        del dest_task.in_connections[dest.key]
         source_task.out_connections.remove(conn)
         
         self._fire_disconnected(source, dest)
@@ -400,6 +556,18 @@ class Graph(object):
                     yield tick
         return list(gen())
     
+    def get_descendant_ticks(self, parent):
+        """
+        Returns, in order, the ticks of all tasks shifted by `parent`, i.e. the
+        ticks `t << parent` of a sub-graph inserted at `parent`. The parent tick 
+        itself is not included.
+        
+        Takes time in the order of the number of ticks returned.
+        """
+        if parent == FINAL_TICK:
+            return []
+        return list(self._tick_index.irange_key(parent._elements, (parent + 1)._elements, inclusive=(False, False)))
+    
     def get_task(self, tick):
         """
         Returns the task at the given tick.
@@ -421,6 +589,19 @@ class Graph(object):
         
         self._fire_task_property_changed(tick, key, value)
         
+    def set_task_properties(self, changes):
+        """
+        Change properties of several tasks at once - like :meth:`set_task_property`
+        for each key and value, but the properties of each task are replaced once.
+        
+        :param changes: Dict with a `key -> value` dict per tick.
+        """
+        for tick, properties in changes.iteritems():
+            self._ticks[tick].set_properties(properties)
+        for tick, properties in changes.iteritems():
+            for key, value in properties.iteritems():
+                self._fire_task_property_changed(tick, key, value)
+        
     def get_in_connections(self, tick):
         """
         Returns `(source, dest)` tuples for each input
@@ -471,6 +652,16 @@ class Graph(object):
         for obs in self._observers:
             obs.disconnected(source, dest)
             
+    def _fire_bulk_inserted(self, ticks, connections):
+        for obs in self._observers:
+            if hasattr(obs, "bulk_inserted"):
+                obs.bulk_inserted(ticks, connections)
+            else:
+                for tick in ticks:
+                    obs.task_added(tick, self.get_task(tick), self.get_task_properties(tick))
+                for source, dest in connections:
+                    obs.connected(source, dest)
+            
     def _fire_task_property_changed(self, tick, key, value):
         for obs in self._observers:
             obs.task_property_changed(tick, key, value)  
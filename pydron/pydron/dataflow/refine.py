@@ -51,7 +51,7 @@ def replace_task(g, tick, subgraph, subgraph_tick=None, additional_inputs={}):
         if dest.tick == graph.FINAL_TICK:
             continue # direct connection are treated as output connecions.
         else:
-            subgraph_dest = graph.Endpoint(dest.tick << subgraph_tick, dest.port)
+            subgraph_dest = graph.Endpoint(dest.tick << subgraph_tick, dest.port, dest.index)
             input_connections.append((task_input, subgraph_dest))
         
     # Prepare the connections to replace the ones of the removed task.
@@ -65,7 +65,7 @@ def replace_task(g, tick, subgraph, subgraph_tick=None, additional_inputs={}):
                 # START_TICK to FINAL_TICK. We have to find the task input for this.
                 source = task_input_map[source.port]
             else:
-                source = graph.Endpoint(source.tick << subgraph_tick, source.port)
+                source = graph.Endpoint(source.tick << subgraph_tick, source.port, source.index)
         elif source.port in task_input_map:
             # output is not assigned, but is an input to the replaced task.
             # Just pass it through.
@@ -106,7 +106,7 @@ def insert_subgraph(g, subgraph, supertick):
         for source, dest in subgraph.get_in_connections(tick):
             if source.tick == graph.START_TICK or dest.tick == graph.FINAL_TICK:
                 continue
-            g.connect(graph.Endpoint(source.tick << supertick, source.port),
-                      graph.Endpoint(dest.tick << supertick, dest.port))
+            g.connect(graph.Endpoint(source.tick << supertick, source.port, source.index),
+                      graph.Endpoint(dest.tick << supertick, dest.port, dest.index))
         
         
\ No newline at end of file
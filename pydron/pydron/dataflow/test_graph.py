@@ -3,7 +3,7 @@
 import unittest
 from pydron.dataflow import graph
 from pydron.dataflow.graph import START_TICK, G, T, C
-from pydron.dataflow import utils
+from pydron.dataflow import utils, refine
 import pickle
 
 class TestTick(unittest.TestCase):
@@ -149,6 +149,20 @@ class TestGraph(unittest.TestCase):
         self.target.remove_task(START_TICK + 100)
         self.assertEqual([], list(self.target.get_all_ticks()))
         
+    def test_get_descendant_ticks(self):
+        parent = START_TICK + 2
+        inner = START_TICK + 1 << parent
+        ticks = [START_TICK + 1, parent, inner, START_TICK + 3 << inner,
+                 (START_TICK + 2 << parent).mark_loop_iteration(), 
+                 START_TICK + 3, START_TICK + 1 << START_TICK + 3]
+        for tick in reversed(ticks):
+            self.target.add_task(tick, None, {})
+        self.assertEqual(ticks[2:5], self.target.get_descendant_ticks(parent))
+        self.assertEqual([START_TICK + 3 << inner], self.target.get_descendant_ticks(inner))
+        self.assertEqual([], self.target.get_descendant_ticks(START_TICK + 1))
+        self.target.remove_task(ticks[4])
+        self.assertEqual(ticks[2:4], self.target.get_descendant_ticks(parent))
+        
     def test_get_task_properies(self):
         self.target.add_task(START_TICK + 100, None, {'nicename':'test'})
         self.assertEqual({'nicename':'test'}, self.target.get_task_properties(START_TICK + 100))
@@ -158,6 +172,16 @@ class TestGraph(unittest.TestCase):
         self.target.set_task_property(START_TICK + 100, 'syncpoint', True)
         self.assertEqual({'nicename':'test', 'syncpoint': True}, self.target.get_task_properties(START_TICK + 100))
         
+    def test_set_task_properties(self):
+        self.target.add_task(START_TICK + 100, None, {'nicename':'test'})
+        self.target.add_task(START_TICK + 101, None)
+        self.target.subscribe(self.observer)
+        self.target.set_task_properties({START_TICK + 100: {'syncpoint': True, 'count': 1},
+                                         START_TICK + 101: {'count': 2}})
+        self.assertEqual({'nicename':'test', 'syncpoint': True, 'count': 1}, self.target.get_task_properties(START_TICK + 100))
+        self.assertEqual({'count': 2}, self.target.get_task_properties(START_TICK + 101))
+        self.assertEqual(3, len([c for c in self.observer.calls if c[0] == "task_property_changed"]))
+        
     def test_get_in_connections(self):
         self.target.add_task(START_TICK + 100, None, {'nicename':'test1'})
         self.target.add_task(START_TICK + 101, None, {'nicename':'test2'})
@@ -196,6 +220,29 @@ class TestGraph(unittest.TestCase):
         expected = []
         self.assertEqual(actual, expected)
         
+    def test_connect_vector_port(self):
+        self.target.add_task(START_TICK + 100, None, {'nicename':'test1'})
+        self.target.add_task(START_TICK + 101, None, {'nicename':'test2'})
+        
+        for index in range(2):
+            self.target.connect(graph.Endpoint(START_TICK + 100, 'out', index), 
+                                graph.Endpoint(START_TICK + 101, 'in', index))
+        self.assertRaises(ValueError, self.target.connect, graph.Endpoint(START_TICK + 100, 'out', 0), 
+                          graph.Endpoint(START_TICK + 101, 'in', 1))
+        
+        self.target.disconnect(graph.Endpoint(START_TICK + 100, 'out', 0), 
+                               graph.Endpoint(START_TICK + 101, 'in', 0))
+        actual = list(self.target.get_in_connections(START_TICK + 101))
+        expected = [(graph.Endpoint(START_TICK + 100, 'out', 1), graph.Endpoint(START_TICK + 101, 'in', 1))]
+        self.assertEqual(actual, expected)
+        
+    def test_gather_inputs(self):
+        inputs = [(graph.Endpoint(START_TICK + 1, 'a', 1), 'a1'),
+                  (graph.Endpoint(START_TICK + 1, 'b'), 'b'),
+                  (graph.Endpoint(START_TICK + 1, 'a', 0), 'a0')]
+        self.assertEqual({'a':['a0', 'a1'], 'b':'b'}, graph.gather_inputs(inputs))
+        self.assertRaises(ValueError, graph.gather_inputs, inputs[:2])
+        
     def test_same_tick(self):
         self.target.add_task(START_TICK + 100, None, {'nicename':'test1'})
         self.assertRaises(ValueError, self.target.add_task, START_TICK + 100, {'nicename':'test2'})
@@ -276,6 +323,53 @@ class TestGraph(unittest.TestCase):
         self.target.set_task_property(START_TICK + 100, "foo", "bar")
         self.assertEquals([("task_property_changed", START_TICK + 100, "foo", "bar")], self.observer.calls)
         
+    def _subgraph(self):
+        return G(
+            C(START_TICK, "a", 1, "x"),
+            T(1, "task1", {'path':'t1'}),
+            C(1, "y", 2, "z"),
+            T(2, "task2", {'path':'t2'}),
+            C(2, "w", graph.FINAL_TICK, "out")
+        )
+        
+    def test_insert_subgraphs(self):
+        expected = graph.Graph()
+        for supertick in (START_TICK + 5, START_TICK + 6):
+            refine.insert_subgraph(expected, self._subgraph(), supertick)
+        added = self.target.insert_subgraphs(self._subgraph(), [START_TICK + 5, START_TICK + 6])
+        self.assertEqual(4, len(added))
+        utils.assert_graph_equal(expected, self.target)
+        self.assertEqual(added[:2], self.target.get_descendant_ticks(START_TICK + 5))
+        
+    def test_insert_subgraphs_properties(self):
+        def properties(supertick, tick, props):
+            return dict(props, path="%s.%s" % (supertick, props['path']))
+        self.target.insert_subgraphs(self._subgraph(), [START_TICK + 5], properties)
+        self.assertEqual({'path':'5.t2'}, self.target.get_task_properties(START_TICK + 2 << START_TICK + 5))
+        
+    def test_insert_subgraphs_existing(self):
+        self.target.add_task(START_TICK + 1 << START_TICK + 6, "task")
+        self.assertRaises(ValueError, self.target.insert_subgraphs, self._subgraph(), [START_TICK + 5, START_TICK + 6])
+        self.assertEqual([START_TICK + 1 << START_TICK + 6], self.target.get_all_ticks())
+        
+    def test_observer_bulk(self):
+        self.target.add_task(START_TICK + 100, "task1")
+        self.target.subscribe(self.observer)
+        added = self.target.insert_subgraphs(self._subgraph(), [START_TICK + 101])
+        conn = (graph.Endpoint(START_TICK + 100, 'out'), graph.Endpoint(added[0], 'x'))
+        self.target.connect_all([conn])
+        self.assertEquals([("bulk_inserted", added, [(graph.Endpoint(added[0], 'y'), graph.Endpoint(added[1], 'z'))]),
+                           ("bulk_inserted", [], [conn])], self.observer.calls)
+        
+    def test_observer_bulk_connections(self):
+        self.target.add_task(START_TICK + 100, "task1")
+        self.target.subscribe(self.observer)
+        conn = (graph.Endpoint(START_TICK + 100, 'out'), graph.Endpoint(START_TICK + 1 << START_TICK + 101, 'x'))
+        added = self.target.insert_subgraphs(self._subgraph(), [START_TICK + 101], connections=[conn])
+        self.assertEquals([("bulk_inserted", added, [(graph.Endpoint(added[0], 'y'), graph.Endpoint(added[1], 'z')), conn])],
+                          self.observer.calls)
+        self.assertEqual([conn], list(self.target.get_in_connections(added[0])))
+        
 class MockObserver(object):
     
     def __init__(self):
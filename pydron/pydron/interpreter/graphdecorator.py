@@ -1,5 +1,6 @@
 # Copyright (C) 2015 Stefan C. Mueller
 
+import collections
 from sortedcontainers import SortedSet
 from pydron.dataflow import graph
 
@@ -21,6 +22,12 @@ class AbstractGraphDecorator(object):
     
     def disconnect(self, source, dest):
         return self.g.disconnect(source, dest)
+    
+    def connect_all(self, connections):
+        return self.g.connect_all(connections)
+    
+    def insert_subgraphs(self, subgraph, superticks, properties=None, connections=()):
+        return self.g.insert_subgraphs(subgraph, superticks, properties, connections)
 
     def get_all_ticks(self):
         return self.g.get_all_ticks()
@@ -34,6 +41,9 @@ class AbstractGraphDecorator(object):
     def set_task_property(self, tick, key, value):
         return self.g.set_task_property(tick, key, value)
         
+    def set_task_properties(self, changes):
+        return self.g.set_task_properties(changes)
+        
     def get_in_connections(self, tick):
         return self.g.get_in_connections(tick)
                 
@@ -82,7 +92,8 @@ class DataGraphDecorator(AbstractGraphDecorator):
             
     def get_data(self, out_endpoint):
         """
-        Returns the data reference for the specified output port.
+        Returns the data reference for the specified output port - or
+        the element of it if the endpoint has an index.
         
         If the data reference was not set, an error is raised.
         If the data reference was set but was returned by :meth:`gc` in
@@ -91,6 +102,8 @@ class DataGraphDecorator(AbstractGraphDecorator):
         props = self.get_task_properties(out_endpoint.tick)
         try:
             data = props["out_data"][out_endpoint.port]
+            if out_endpoint.index is not None:
+                return data[out_endpoint.index]
             return data
         except KeyError:
             raise KeyError("Data is not available.")
@@ -100,6 +113,14 @@ class DataGraphDecorator(AbstractGraphDecorator):
     def add_task(self, tick, task, properties={}):
         properties["out_data"] = {}
         self.g.add_task(tick, task, properties=properties)
+        
+    def insert_subgraphs(self, subgraph, superticks, properties=None, connections=()):
+        def props(supertick, tick, p):
+            if properties is not None:
+                p = properties(supertick, tick, p)
+            p["out_data"] = {}
+            return p
+        return self.g.insert_subgraphs(subgraph, superticks, props, connections)
     
         
 class AbstractReadyDecorator(AbstractGraphDecorator):
@@ -148,16 +169,16 @@ class AbstractReadyDecorator(AbstractGraphDecorator):
         #: ticks of all tasks that have data for all inputs.
         #: That is, if every output port connected to each input port
         #: had data set with `set_output_data`.
-        self._queue = SortedSet()
+        self._queue = SortedSet(key=graph.tick_key)
         
         #: ticks of all tasks with
         #: * `properties["syncpoint"] == True`
         #: * `set_output_data` not yet called.
-        self._pending_syncpoints = SortedSet()
+        self._pending_syncpoints = SortedSet(key=graph.tick_key)
         
         #: ticks of all tasks with
         #: * `set_output_data` not yet called.
-        self._pending_ticks = SortedSet()
+        self._pending_ticks = SortedSet(key=graph.tick_key)
         
         self._collected_prop = self._prefix + "_collected"
         self._count_prop = self._prefix + "_count"
@@ -248,6 +269,51 @@ class AbstractReadyDecorator(AbstractGraphDecorator):
             self._pending_syncpoints.add(tick)
         
         
+    def insert_subgraphs(self, subgraph, superticks, properties=None, connections=()):
+        # The inputs connected within the subgraph are counted once per task of
+        # the subgraph - the port filter is applied to the subgraph itself.
+        template = subgraph.get_all_ticks()
+        counts = {}
+        for tick in template:
+            counts[tick] = sum(1 for source, dest in subgraph.get_in_connections(tick)
+                               if source.tick != graph.START_TICK and self._port_filter(subgraph, tick, dest.port))
+        
+        # The further connections are counted before the tasks are inserted: each
+        # copy is inserted with its final counters and considered once - instead of
+        # changing the counters of every copy once it is connected.
+        origins = {}
+        for supertick in superticks:
+            for tick in template:
+                origins[tick << supertick] = (supertick, tick)
+        connections = list(connections)
+        inserted_counters = collections.defaultdict(lambda: [0, 0])
+        counters = self._count_connections(connections, origins, subgraph, inserted_counters)
+        
+        # only the tasks with all inputs counted ready may be ready right away
+        to_consider = []
+        syncpoints = []
+        
+        def props(supertick, tick, p):
+            if properties is not None:
+                p = properties(supertick, tick, p)
+            count, ready = inserted_counters.get((supertick, tick), (0, 0))
+            p[self._count_prop] = counts[tick] + count
+            p[self._ready_prop] = ready
+            p[self._collected_prop] = False
+            if counts[tick] + count == ready:
+                to_consider.append(tick << supertick)
+            if p.get("syncpoint", False):
+                syncpoints.append(tick << supertick)
+            return p
+        
+        added = self.g.insert_subgraphs(subgraph, superticks, props, connections)
+        self._pending_ticks.update(added)
+        self._pending_syncpoints.update(syncpoints)
+        for tick in to_consider:
+            self._consider(tick)
+        self._add_counters(counters)
+        return added
+        
     def remove_task(self, tick):
         self.g.remove_task(tick)
         
@@ -274,6 +340,58 @@ class AbstractReadyDecorator(AbstractGraphDecorator):
             self.g.set_task_property(dest.tick, self._ready_prop, dest_props[self._ready_prop] + 1)
 
         self._consider(dest.tick)
+        
+    def connect_all(self, connections):
+        connections = list(connections)
+        self.g.connect_all(connections)
+        self._add_counters(self._count_connections(connections))
+        
+    def _count_connections(self, connections, origins=None, subgraph=None, inserted_counters=None):
+        """
+        Counts the inputs and the inputs with data per destination task of the
+        given connections. The destinations about to be inserted as copies of
+        tasks in `subgraph` are looked up in `origins` (tick of the copy to
+        `(supertick, tick)`) and counted in `inserted_counters`.
+        
+        :returns: `tick -> [count, ready]` for the other destinations.
+        """
+        origins = origins or {}
+        counters = collections.defaultdict(lambda: [0, 0])
+        out_data = {}
+        for source, dest in connections:
+            origin = origins.get(dest.tick)
+            if origin is None:
+                if not self._port_filter(self, dest.tick, dest.port):
+                    continue
+                counter = counters[dest.tick]
+            else:
+                if not self._port_filter(subgraph, origin[1], dest.port):
+                    continue
+                counter = inserted_counters[origin]
+            counter[0] += 1
+            if source.tick in origins:
+                # inserted tasks have no data yet
+                continue
+            if source.tick not in out_data:
+                out_data[source.tick] = self.g.get_task_properties(source.tick)["out_data"]
+            if source.port in out_data[source.tick]:
+                counter[1] += 1
+        return counters
+        
+    def _add_counters(self, counters):
+        """
+        Adds the counts of inputs and inputs with data to the counters of the
+        tasks - changing the properties of all tasks at once.
+        """
+        changes = {}
+        for tick, (count, ready) in counters.iteritems():
+            props = self.g.get_task_properties(tick)
+            changes[tick] = {self._count_prop: props[self._count_prop] + count,
+                             self._ready_prop: props[self._ready_prop] + ready}
+        if changes:
+            self.g.set_task_properties(changes)
+        for tick in changes:
+            self._consider(tick)
             
     def disconnect(self, source, dest):
         self.g.disconnect(source, dest)
@@ -294,12 +412,23 @@ class AbstractReadyDecorator(AbstractGraphDecorator):
     def set_task_property(self, tick, key, value):
         retval = AbstractGraphDecorator.set_task_property(self, tick, key, value)
         if key == "syncpoint":
-            if not value and tick in self._pending_syncpoints:
-                self._pending_syncpoints.remove(tick)
-            if value:
-                self._pending_syncpoints.add(tick)
+            self._syncpoint_changed(tick, value)
         self._consider(tick)
         return retval
+        
+    def set_task_properties(self, changes):
+        retval = AbstractGraphDecorator.set_task_properties(self, changes)
+        for tick, properties in changes.iteritems():
+            if "syncpoint" in properties:
+                self._syncpoint_changed(tick, properties["syncpoint"])
+            self._consider(tick)
+        return retval
+        
+    def _syncpoint_changed(self, tick, value):
+        if not value and tick in self._pending_syncpoints:
+            self._pending_syncpoints.remove(tick)
+        if value:
+            self._pending_syncpoints.add(tick)
             
     def set_output_data(self, tick, outputs):
         self.g.set_output_data(tick, outputs)
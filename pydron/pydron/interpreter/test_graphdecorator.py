@@ -24,6 +24,12 @@ class TestDataDecorator(unittest.TestCase):
         actual = self.target.get_data(graph.Endpoint(graph.START_TICK + 1, "out1"))
         self.assertEqual("data1", actual)
         
+    def test_get_data_element(self):
+        self.target.add_task(graph.START_TICK + 1, "task1")
+        self.target.set_output_data(graph.START_TICK + 1, {"out1": ["data0", "data1"]})
+        actual = self.target.get_data(graph.Endpoint(graph.START_TICK + 1, "out1", 1))
+        self.assertEqual("data1", actual)
+        
     def test_get_nonexistent_data(self):        
         self.target.add_task(graph.START_TICK + 1, "task1")
         self.target.set_output_data(graph.START_TICK + 1, {"out1": "data1", "out2":"data2"})
@@ -214,6 +220,54 @@ class TestReadyDecorator(unittest.TestCase):
         self.target.connect(graph.Endpoint(TICK1, "out"), graph.Endpoint(TICK2, "in"))
         self.assertFalse(self.target.was_ready_collected(TICK2))
         
+    def test_insert_subgraphs(self):
+        subgraph = graph.G(
+            graph.C(graph.START_TICK, "a", 1, "in"),
+            graph.T(1, "task1"),
+            graph.C(1, "out", 2, "in"),
+            graph.T(2, "task2"),
+            graph.T(3, "task3")
+        )
+        self.target.add_task(TICK1, "task")
+        self.target.collect_ready_tasks()
+        added = self.target.insert_subgraphs(subgraph, [TICK2, TICK3])
+        self.target.connect_all([(graph.Endpoint(TICK1, "out"), graph.Endpoint(added[i], "in")) for i in (0, 3)])
+        self.assertEqual({added[2], added[5]}, self.target.collect_ready_tasks())
+        self.target.set_output_data(TICK1, {"out":"data"})
+        self.assertEqual({added[0], added[3]}, self.target.collect_ready_tasks())
+        self.target.set_output_data(added[0], {"out":"data"})
+        self.assertEqual({added[1]}, self.target.collect_ready_tasks())
+        
+    def test_insert_subgraphs_connections(self):
+        subgraph = graph.G(
+            graph.C(graph.START_TICK, "a", 1, "in"),
+            graph.T(1, "task1"),
+            graph.C(1, "out", 2, "in"),
+            graph.T(2, "task2"),
+        )
+        self.target.add_task(TICK1, "task1")
+        self.target.add_task(TICK2, "task2")
+        self.target.collect_ready_tasks()
+        self.target.add_task(TICK5, "task5")
+        self.target.set_output_data(TICK1, {"out":"data"})
+        inserted1 = graph.START_TICK + 1 << TICK3
+        inserted2 = graph.START_TICK + 2 << TICK4
+        connections = [(graph.Endpoint(TICK1, "out"), graph.Endpoint(inserted1, "in")),
+                       (graph.Endpoint(TICK2, "out"), graph.Endpoint(graph.START_TICK + 1 << TICK4, "in")),
+                       (graph.Endpoint(inserted2, "out"), graph.Endpoint(TICK5, "in"))]
+        added = self.target.insert_subgraphs(subgraph, [TICK3, TICK4], connections=connections)
+        self.assertEqual({inserted1}, self.target.collect_ready_tasks())
+        self.target.set_output_data(TICK2, {"out":"data"})
+        self.assertEqual({added[2]}, self.target.collect_ready_tasks())
+        
+    def test_connect_all_with_data(self):
+        self.target.add_task(TICK1, "task1")
+        self.target.add_task(TICK2, "task2")
+        self.target.collect_ready_tasks()
+        self.target.set_output_data(TICK1, {"out":"data"})
+        self.target.connect_all([(graph.Endpoint(TICK1, "out"), graph.Endpoint(TICK2, "in"))])
+        self.assertEqual(set(), self.target.collect_ready_tasks())
+        
 class TestRefineDecorator(unittest.TestCase):
     
     
@@ -295,6 +349,19 @@ class TestRefineDecorator(unittest.TestCase):
         self.target.add_task(TICK1, "task")
         self.assertFalse(self.target.will_be_refined(TICK1))
         
+    def test_insert_subgraphs(self):
+        subgraph = graph.G(
+            graph.T(1, "task1"),
+            graph.C(1, "out", 2, "in"),
+            graph.T(2, MockTask("in"))
+        )
+        added = self.target.insert_subgraphs(subgraph, [TICK1, TICK2])
+        self.assertTrue(self.target.will_be_refined(added[1]))
+        self.assertFalse(self.target.will_be_refined(added[0]))
+        self.assertEquals(set(), self.target.collect_refine_tasks())
+        self.target.set_output_data(added[2], {"out":"data"})
+        self.assertEquals({added[3]}, self.target.collect_refine_tasks())
+        
 class MockTask(object):
     def __init__(self, *refiner_ports):
         self.refiner_ports = set(refiner_ports)
\ No newline at end of file
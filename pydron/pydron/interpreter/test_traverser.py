@@ -120,6 +120,18 @@ class TestTraverser(unittest.TestCase):
         self.next_ready()[-1].callback(traverser.EvalResult({"value":"Hello"}))
         self.assertEqual((TICK2, "task", {"in":"Hello"}), self.next_ready()[1:-1])
         
+    def test_vector_ports(self):
+        g = G(
+            T(1, tasks.ConstTask(None)),
+            T(2, "task"),
+            C(2, "out", FINAL_TICK, "retval")
+        )
+        for index in range(2):
+            g.connect(Endpoint(TICK1, "values", index), Endpoint(TICK2, "in", 1 - index))
+        self.target.execute(g, {})
+        self.next_ready()[-1].callback(traverser.EvalResult({"values":["a", "b"]}))
+        self.assertEqual((TICK2, "task", {"in":["b", "a"]}), self.next_ready()[1:-1])
+        
     def test_finish(self):
         g = G(
             T(1, tasks.ConstTask(None)),
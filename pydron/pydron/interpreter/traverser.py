@@ -254,14 +254,14 @@ class Traverser(object):
         # outputs and can finish traversing.
         if graph.FINAL_TICK in ready_for_execution:
             self._finished = True
-            graph_outputs = {dest.port : self._graph.get_data(source) for source, dest in self._graph.get_in_connections(graph.FINAL_TICK)}
+            graph_outputs = graph.gather_inputs((dest, self._graph.get_data(source)) for source, dest in self._graph.get_in_connections(graph.FINAL_TICK))
             self._result.callback(graph_outputs)
             return
         
         # Pass the refine jobs to the scheduler.
         for tick in ready_for_refine:
             task = self._graph.get_task(tick)
-            inputs = {dest.port : self._graph.get_data(source) for source, dest in self._graph.get_in_connections(tick) if dest.port in task.refiner_ports}
+            inputs = graph.gather_inputs((dest, self._graph.get_data(source)) for source, dest in self._graph.get_in_connections(tick) if dest.port in task.refiner_ports)
             
             # We add a property to the task so that we can later check if the refine operation
             # removed the task and replaced it with a different one.
@@ -304,7 +304,7 @@ class Traverser(object):
         # Pass the evaluation jobs to the scheduler.
         for tick in ready_for_execution:
             task = self._graph.get_task(tick)
-            inputs = {dest.port : self._graph.get_data(source) for source, dest in self._graph.get_in_connections(tick)}
+            inputs = graph.gather_inputs((dest, self._graph.get_data(source)) for source, dest in self._graph.get_in_connections(tick))
             
             self._pending_ready_deferreds[tick] = None
             d = self._ready_task_callback(self._graph, tick, task, inputs)